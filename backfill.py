@@ -0,0 +1,146 @@
+"""
+Rebuilding the streak and contributions from the log channel's message history.
+
+sk.backfill pages through the channel oldest first (discord.py fetches 100 messages per request)
+and feeds every message to a Backfill. A Backfill keeps running totals instead of the messages:
+the current streak run, the longest finished one, and each month's contributions per user.
+Years of history therefore take as much memory as one month's roster per month, plus a day
+bitmap per user (see days.py), however many messages there are.
+
+The bot's answers decide what counted, not the logs themselves: a day counts towards the streak
+when the bot posted "✅ Entry logged!" on it, and the author of an `sk.log` gets a contribution
+for that date only if the bot accepted it (with that confirmation, or a thanks when the streak
+was already logged). Logs it turned away (no image, a reused photo, a second log that day) don't
+count. Messages don't say which log they answer, so each answer goes to the oldest `sk.log` still
+waiting for one; a log left unanswered for ANSWER_WINDOW (the bot was down, say) is given up on.
+Everyone who reacted ➕ to a confirmation message also gets one contribution for its date.
+"""
+
+import re
+from collections import deque
+from datetime import timedelta
+
+from days import DayBitmap
+
+LOG_COMMAND = re.compile(r"^[Ss]k\.log(\s|$)")
+CONFIRMATION_PREFIX = "✅ Entry logged!"
+# the bot's answers to sk.log that mean the log counted, and those that mean it didn't
+ACCEPTED_PREFIXES = (CONFIRMATION_PREFIX, "Thanks for contributing!")
+REJECTED_PREFIXES = ("Did it even happen", "📸 This photo looks just like", "You've already contributed today",
+                     "⏳ StreakKeeper is still connecting", "⏳ Storage is taking too long")
+ANSWER_WINDOW = timedelta(minutes=5)  # how long after a log its answer can come
+
+
+class Backfill:
+    """Running totals rebuilt from messages fed oldest first."""
+
+    def __init__(self, timezone, bot_user_id):
+        self.timezone = timezone
+        self.bot_user_id = bot_user_id
+        self.messages = 0
+        self.last_message_id = None  # where a catch-up pass should continue from
+
+        # the streak: the run of consecutive logged days that's still going, and the longest one before it
+        self.days_logged = 0
+        self.run_start = None
+        self.run_end = None
+        self.longest = 0
+        self.longest_end = None
+
+        # "YYYY-MM" -> {User ID: user record}
+        self.months = {}
+        # User ID -> the days they contributed on, which also stops a day counting twice
+        self.days = {}
+        # (message ID, date) of the latest two confirmation messages, the ones ➕ reactions count on
+        self.log_messages = []
+        # sk.log messages the bot hasn't answered yet, oldest first
+        self.unanswered = deque()
+
+    async def feed(self, message):
+        """Take one message into account. Messages must come oldest first."""
+        self.messages += 1
+        self.last_message_id = message.id
+        day = message.created_at.astimezone(self.timezone).date()
+
+        if not message.author.bot and LOG_COMMAND.match(message.content.strip()):
+            self.unanswered.append(message)
+            return
+        if message.author.id != self.bot_user_id:
+            return
+
+        if message.content.startswith(ACCEPTED_PREFIXES + REJECTED_PREFIXES):
+            log = self._answered_log(message)
+            if log is not None and message.content.startswith(ACCEPTED_PREFIXES):
+                self._count(log.author, self._day_of(log))
+            if message.content.startswith(CONFIRMATION_PREFIX):
+                # the day the bot logged: the log's, or the confirmation's if the log was deleted since
+                self._log_day(self._day_of(log) if log is not None else day)
+        if message.content.startswith(CONFIRMATION_PREFIX):
+            self.log_messages = (self.log_messages + [(message.id, day)])[-2:]
+            for reaction in message.reactions:
+                # the bot's own ➕ is on every confirmation message, so only ask for the reactors if someone else added one
+                if str(reaction.emoji) == "➕" and reaction.count > (1 if reaction.me else 0):
+                    async for user in reaction.users():
+                        if not user.bot:
+                            self._count(user, day)
+
+    def _day_of(self, message):
+        return message.created_at.astimezone(self.timezone).date()
+
+    def _answered_log(self, answer):
+        """The log an answer from the bot is for: the oldest one still waiting, unless it has waited too long."""
+        while self.unanswered and answer.created_at - self.unanswered[0].created_at > ANSWER_WINDOW:
+            self.unanswered.popleft()
+        return self.unanswered.popleft() if self.unanswered else None
+
+    def _log_day(self, day):
+        if self.run_end == day:
+            return
+        self.days_logged += 1
+        if self.run_end is not None and day - self.run_end == timedelta(days=1):
+            self.run_end = day
+            return
+        # a day was missed, so the previous run is over
+        if self.run_end is not None and self._run_length() > self.longest:
+            self.longest = self._run_length()
+            self.longest_end = self.run_end
+        self.run_start = self.run_end = day
+
+    def _run_length(self):
+        return (self.run_end - self.run_start).days + 1
+
+    def _count(self, user, day):
+        """One contribution per user per date, however many logs and ➕s they posted for it."""
+        user_id = str(user.id)
+        days = self.days.setdefault(user_id, DayBitmap())
+        if day in days:
+            return
+        days.add(day)
+
+        users = self.months.setdefault(day.strftime("%Y-%m"), {})
+        record = users.setdefault(user_id, {"user_id": user_id, "username": user.display_name, "contributions": 0, "last_log": ""})
+        record["contributions"] += 1
+        record["username"] = user.display_name  # the latest name they used
+        record["last_log"] = max(record["last_log"], str(day))
+
+    def streak(self, current):
+        """The streak record as the bot would have kept it, keeping current's reminder settings."""
+        data = dict(current)
+        if self.run_end is None:
+            data.update(streak_count=0, start_date="N/A", last_logged_date="N/A")
+        else:
+            data.update(streak_count=self._run_length(), start_date=str(self.run_start), last_logged_date=str(self.run_end))
+        data.update(longest_streak=self.longest, longest_streak_end_date=str(self.longest_end) if self.longest_end else "N/A")
+
+        messages = [(None, "N/A")] * (2 - len(self.log_messages)) + self.log_messages
+        data.update(log_message_id_yesterday=messages[0][0], log_message_date_yesterday=str(messages[0][1]),
+                    log_message_id_today=messages[1][0], log_message_date_today=str(messages[1][1]))
+        return data
+
+    def contributions(self):
+        """The latest month's user records (the live leaderboard) and every earlier month's as {"YYYY-MM": records}."""
+        if not self.months:
+            return [], {}
+        latest = max(self.months)
+        history = {month: list(users.values()) for month, users in self.months.items() if month != latest}
+        return list(self.months[latest].values()), history
@@ -0,0 +1,207 @@
+"""
+Offline benchmarks for the command and event handlers.
+
+Runs the real handlers from main.py against FakeSpreadsheet (or a throwaway SQLite database) and
+fake discord objects, and reports wall-clock latency and storage calls per operation for several
+roster sizes. Nothing touches the network.
+
+    python -m benchmarks.bench                          # 10, 1k and 100k users on both backends
+    python -m benchmarks.bench --sizes 10 1000 --backend sheets --latency 80
+    python -m benchmarks.bench --sizes 1000 --backend sheets --latency 80 --journal
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import timedelta
+
+# batch reactions until the benchmark flushes them explicitly
+os.environ.setdefault("REACTION_FLUSH_DELAY", "3600")
+# measure the handlers, not the quota pacing (set these to 60 to see how pacing shapes a burst)
+os.environ.setdefault("SHEETS_READS_PER_MINUTE", "0")
+os.environ.setdefault("SHEETS_WRITES_PER_MINUTE", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+import proofs  # noqa: E402
+from benchmarks.fakes import FakeContext, FakeGuild, FakeReactionPayload, FakeSpreadsheet, FakeUser  # noqa: E402
+from guilds import GuildConfig  # noqa: E402
+from journal import JournaledBackend  # noqa: E402
+from storage import SheetsBackend, SQLiteBackend, copy_data  # noqa: E402
+
+
+class CountingBackend:
+    """Wraps a backend and counts calls to each of its methods."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.calls = Counter()
+
+    def __getattr__(self, name):
+        method = getattr(self.backend, name)
+
+        def counted(*args):
+            self.calls[name] += 1
+            return method(*args)
+        return counted
+
+
+class Scenario:
+    """One guild with a pre-filled roster on the chosen backend."""
+
+    _next_guild_id = 1
+
+    def __init__(self, users, backend, latency, tmpdir, journal=False):
+        self.guild_id = Scenario._next_guild_id
+        Scenario._next_guild_id += 1
+        self.discord_guild = FakeGuild(self.guild_id)
+        self.state = main.register_guild(GuildConfig(self.guild_id, 1))
+        yesterday = str(self.state.today() - timedelta(days=1))  # so the first log extends the streak
+        self.spreadsheet = FakeSpreadsheet(users, last_logged=yesterday, latency=latency)
+        store = SheetsBackend(self.spreadsheet)
+        if backend == "sqlite":
+            store = SQLiteBackend(os.path.join(tmpdir, f"bench-{self.guild_id}.db"))
+            copy_data(SheetsBackend(FakeSpreadsheet(users, last_logged=yesterday)), store)
+        if journal:
+            store = JournaledBackend(store, os.path.join(tmpdir, f"journal-{self.guild_id}.jsonl"))
+        self.store = store
+        self.backend = CountingBackend(store)
+        self.state.backend = self.backend
+        self.state.ready.set()
+        self._next_user = 10 ** 9
+
+    def new_user(self):
+        self._next_user += 1
+        return FakeUser(self._next_user, f"bench{self._next_user}")
+
+    def ctx(self, user=None):
+        return FakeContext(self.discord_guild, user or self.new_user())
+
+    def snapshot(self):
+        return Counter(self.backend.calls), Counter(self.spreadsheet.calls)
+
+
+async def measure(scenario, name, op, repeat):
+    """Run op() `repeat` times and return a result row."""
+    before_backend, before_sheets = scenario.snapshot()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await op()
+        timings.append((time.perf_counter() - start) * 1000)
+    after_backend, after_sheets = scenario.snapshot()
+    backend_calls = sum((after_backend - before_backend).values()) / repeat
+    sheets_calls = after_sheets - before_sheets
+    return {
+        "operation": name,
+        "p50": statistics.median(timings),
+        "p95": sorted(timings)[max(int(len(timings) * 0.95) - 1, 0)],
+        "backend_calls": backend_calls,
+        "sheets_calls": sum(sheets_calls.values()) / repeat,
+        "sheets_methods": ", ".join(f"{method}×{count / repeat:g}" for method, count in sorted(sheets_calls.items()))
+    }
+
+
+async def run_size(users, backend, latency, repeat, burst, tmpdir, journal):
+    scenario = Scenario(users, backend, latency, tmpdir, journal)
+    guild = scenario.state
+    rows = []
+
+    async def cold_load():
+        await main.load_streak_data(guild, force_refresh=True)
+        await main.load_user_index(guild, force_refresh=True)
+    rows.append(await measure(scenario, "cold load", cold_load, 1))
+
+    async def log_new():
+        await main.log(scenario.ctx())
+    rows.append(await measure(scenario, "sk.log (new contributor)", log_new, repeat))
+
+    regular = scenario.new_user()
+    await main.log(scenario.ctx(regular))
+
+    async def log_again():
+        await main.log(scenario.ctx(regular))
+    rows.append(await measure(scenario, "sk.log (already logged)", log_again, repeat))
+
+    streak = await main.load_streak_data(guild)
+    message_id = int(streak["log_message_id_today"])
+
+    async def reaction_burst():
+        for _ in range(burst):
+            await main.on_raw_reaction_add(FakeReactionPayload(scenario.guild_id, message_id, scenario.new_user()))
+        await main.flush_contributions(guild)
+    rows.append(await measure(scenario, f"➕ burst of {burst} + flush", reaction_burst, max(repeat // 10, 1)))
+
+    async def untracked_reaction():
+        await main.on_raw_reaction_add(FakeReactionPayload(scenario.guild_id, message_id + 1, scenario.new_user()))
+    rows.append(await measure(scenario, "➕ on an untracked message", untracked_reaction, repeat))
+
+    async def add_and_remove():
+        user = scenario.new_user()
+        await main.on_raw_reaction_add(FakeReactionPayload(scenario.guild_id, message_id, user))
+        await main.on_raw_reaction_remove(FakeReactionPayload(scenario.guild_id, message_id, user, added=False))
+        await main.flush_contributions(guild)
+    rows.append(await measure(scenario, "➕ added then removed", add_and_remove, repeat))
+
+    async def leaderboard():
+        await main.leaderboard(scenario.ctx(regular))
+    rows.append(await measure(scenario, "sk.leaderboard", leaderboard, repeat))
+
+    async def stats():
+        await main.user_stats(scenario.ctx(regular))
+    rows.append(await measure(scenario, "sk.stats", stats, repeat))
+
+    async def view_streak():
+        await main.view_streak(scenario.ctx(regular))
+    rows.append(await measure(scenario, "sk.streak", view_streak, repeat))
+
+    if journal:
+        await asyncio.to_thread(scenario.store.close, None)  # let the replay catch up before the next roster
+    return rows
+
+
+def print_table(users, backend, rows):
+    print(f"\n{backend} backend, {users:,} users")
+    print(f"{'operation':<28} {'p50 ms':>9} {'p95 ms':>9} {'backend/op':>11} {'sheets/op':>10}  sheets calls")
+    for row in rows:
+        print(f"{row['operation']:<28} {row['p50']:>9.3f} {row['p95']:>9.3f} {row['backend_calls']:>11.2f} "
+              f"{row['sheets_calls']:>10.2f}  {row['sheets_methods'] if backend == 'sheets' else '-'}")
+
+
+async def run(args):
+    pool = proofs.start_pool()
+    if pool:
+        await asyncio.get_running_loop().run_in_executor(pool, int)  # wait for the hashing workers, as the bot does while connecting
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for backend in args.backend:
+            for users in args.sizes:
+                rows = await run_size(users, backend, args.latency / 1000, args.repeat, args.burst, tmpdir, args.journal)
+                print_table(users, backend, rows)
+                main.guilds.clear()
+    proofs.stop_pool()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark StreakKeeper's handlers offline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000], help="roster sizes to test")
+    parser.add_argument("--backend", nargs="+", choices=["sheets", "sqlite"], default=["sheets", "sqlite"])
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated Sheets round trip per call, in ms")
+    parser.add_argument("--repeat", type=int, default=50, help="iterations per operation")
+    parser.add_argument("--burst", type=int, default=50, help="reactions per burst")
+    parser.add_argument("--journal", action="store_true", help="journal writes locally and replay them in the background (see journal.py)")
+    parser.add_argument("--verbose", action="store_true", help="show the bot's log lines (INFO and up) between the tables")
+    args = parser.parse_args()
+    # the handlers log through logging; by default only problems are shown, so the tables stay readable
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,274 @@
+"""
+In-memory stand-ins for the gspread worksheets and the discord.py objects the handlers touch.
+
+FakeWorksheet implements the handful of gspread calls the Sheets backend makes, counts every
+call by method name, and can add a fixed delay per call to model the round trip to Google.
+"""
+
+import io
+import itertools
+import os
+import re
+import time
+from collections import Counter
+
+from gspread.utils import a1_to_rowcol
+
+
+###### FAKE GOOGLE SHEETS ##################
+
+_sheet_ids = itertools.count(1)
+
+class FakeWorksheet:
+    def __init__(self, title, rows, latency=0.0):
+        self.id = next(_sheet_ids)
+        self.title = title
+        self.rows = [[str(value) for value in row] for row in rows]
+        self.latency = latency
+        self.calls = Counter()
+        self.row_count = max(len(self.rows), 1000)
+
+    def _call(self, method):
+        self.calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)  # the backend runs on a worker thread, like the real blocking call
+
+    def _set(self, row, col, value):
+        while len(self.rows) < row:
+            self.rows.append([])
+        cells = self.rows[row - 1]
+        while len(cells) < col:
+            cells.append("")
+        cells[col - 1] = "" if value is None else str(value)
+
+    def _write(self, range_name, values):
+        row, col = a1_to_rowcol(range_name.split(":")[0])
+        for i, values_row in enumerate(values):
+            for j, value in enumerate(values_row):
+                self._set(row + i, col + j, value)
+
+    def row_values(self, row):
+        self._call("row_values")
+        values = list(self.rows[row - 1]) if row <= len(self.rows) else []
+        while values and values[-1] == "":
+            values.pop()
+        return values
+
+    def get_all_values(self):
+        self._call("get_all_values")
+        return [list(row) for row in self.rows if any(row)]
+
+    def add_rows(self, rows):
+        self._call("add_rows")
+        self.row_count += rows
+
+    def get_all_records(self):
+        self._call("get_all_records")
+        headers = self.rows[0]
+        records = []
+        for row in self.rows[1:]:
+            if not any(row):
+                continue
+            row = row + [""] * (len(headers) - len(row))
+            # like gspread, numeric-looking cells come back as numbers
+            records.append({header: int(value) if value.isdigit() else value for header, value in zip(headers, row)})
+        return records
+
+    def update(self, values, range_name=None, **kwargs):
+        self._call("update")
+        self._write(range_name, values)
+        return {}
+
+    def batch_update(self, data, **kwargs):
+        self._call("batch_update")
+        for item in data:
+            self._write(item["range"], item["values"])
+        return {}
+
+    def append_row(self, values, **kwargs):
+        return self._append("append_row", [values])
+
+    def append_rows(self, values, **kwargs):
+        return self._append("append_rows", values)
+
+    def _append(self, method, values):
+        self._call(method)
+        last = len(self.rows)
+        while last > 1 and not any(self.rows[last - 1]):
+            last -= 1
+        start = last + 1
+        for i, row in enumerate(values):
+            self._write(f"A{start + i}", [row])
+        return {"updates": {"updatedRange": f"{self.title}!A{start}:D{start + len(values) - 1}"}}
+
+    def batch_clear(self, ranges):
+        self._call("batch_clear")
+        for range_name in ranges:
+            match = re.match(r"[A-Z]+(\d+):[A-Z]+(\d*)", range_name)
+            first = int(match.group(1))
+            last = int(match.group(2)) if match.group(2) else len(self.rows)
+            for row in range(first, min(last, len(self.rows)) + 1):
+                self.rows[row - 1] = []
+        return {}
+
+
+class FakeSpreadsheet:
+    """Sheet1 (streak summary) and Sheet2 (one row per user), pre-filled with `users` contributors."""
+
+    def __init__(self, users=0, last_logged="2025-01-14", latency=0.0):
+        streak = [["Streak Count", "Start Date", "Last Logged Date", "Reminder Time", "Log Message ID Today",
+                   "Log Message Date Today", "Log Message ID Yesterday", "Log Message Date Yesterday",
+                   "Longest Streak", "Longest Streak End Date", "Last Reminder Sent"],
+                  ["10", "2025-01-05", last_logged, "19:00", "", "", "", "", "30", "2024-12-01", ""]]
+        contributions = [["User ID", "Username", "Contributions", "Last Log"]]
+        contributions += [[str(1000 + i), f"player{i}", str(i % 25 + 1), last_logged] for i in range(users)]
+        self.latency = latency
+        self.spreadsheet_calls = Counter()  # spreadsheet-level calls (metadata, copies, batch reads)
+        self.sheets = {
+            "Sheet1": FakeWorksheet("Sheet1", streak, latency),
+            "Sheet2": FakeWorksheet("Sheet2", contributions, latency)
+        }
+
+    def worksheet(self, title):
+        return self.sheets[title]
+
+    def worksheets(self):
+        self._call("worksheets")
+        return list(self.sheets.values())
+
+    def duplicate_sheet(self, source_sheet_id, insert_sheet_index=None, new_sheet_id=None, new_sheet_name=None):
+        self._call("duplicate_sheet")
+        source = next(sheet for sheet in self.sheets.values() if sheet.id == source_sheet_id)
+        copy = FakeWorksheet(new_sheet_name, source.rows, self.latency)
+        self.sheets[new_sheet_name] = copy
+        return copy
+
+    def add_worksheet(self, title, rows, cols, index=None):
+        self._call("add_worksheet")
+        sheet = self.sheets[title] = FakeWorksheet(title, [], self.latency)
+        sheet.row_count = rows
+        return sheet
+
+    def values_batch_get(self, ranges, params=None):
+        self._call("values_batch_get")
+        value_ranges = []
+        for range_name in ranges:
+            sheet, cells = self._sheet_and_cells(range_name)
+            first_row = a1_to_rowcol(cells.split(":")[0])[0]
+            rows = sheet.rows[first_row - 1:]
+            value_ranges.append({"range": range_name, "values": [row for row in rows if any(row)]})
+        return {"valueRanges": value_ranges}
+
+    def batch_update(self, body):
+        self._call("batch_update")
+        for request in body["requests"]:
+            if "addSheet" in request:
+                properties = request["addSheet"]["properties"]
+                sheet = self.sheets[properties["title"]] = FakeWorksheet(properties["title"], [], self.latency)
+                sheet.row_count = properties["gridProperties"]["rowCount"]
+            elif "updateSheetProperties" in request:
+                properties = request["updateSheetProperties"]["properties"]
+                sheet = next(sheet for sheet in self.sheets.values() if sheet.id == properties["sheetId"])
+                sheet.row_count = properties["gridProperties"]["rowCount"]
+        return {}
+
+    def _sheet_and_cells(self, range_name):
+        title, cells = range_name.rsplit("!", 1)
+        return self.sheets[title.strip("'")], cells
+
+    def values_batch_clear(self, params=None, body=None):
+        self._call("values_batch_clear")
+        for range_name in body["ranges"]:
+            sheet, cells = self._sheet_and_cells(range_name)
+            first_row = a1_to_rowcol(cells.split(":")[0])[0]
+            for row in range(first_row, len(sheet.rows) + 1):
+                sheet.rows[row - 1] = []
+        return {}
+
+    def values_batch_update(self, body=None):
+        self._call("values_batch_update")
+        for item in body["data"]:
+            sheet, cells = self._sheet_and_cells(item["range"])
+            if len(item["values"]) + a1_to_rowcol(cells.split(":")[0])[0] - 1 > sheet.row_count:
+                raise ValueError(f"{item['range']} exceeds grid limits")  # as the real API does
+            sheet._write(cells, item["values"])
+        return {}
+
+    def _call(self, method):
+        self.spreadsheet_calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @property
+    def calls(self):
+        total = Counter(self.spreadsheet_calls)
+        for sheet in self.sheets.values():
+            total.update(sheet.calls)
+        return total
+
+
+###### FAKE DISCORD ##################
+
+_ids = itertools.count(900000000000000000)
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+
+class FakeUser:
+    def __init__(self, user_id, name):
+        self.id = user_id
+        self.display_name = name
+        self.bot = False
+        self.avatar = None
+
+class FakeMessage:
+    def __init__(self, guild, content="", attachments=()):
+        self.id = next(_ids)
+        self.guild = guild
+        self.content = content
+        self.attachments = list(attachments)
+
+    async def add_reaction(self, emoji):
+        pass
+
+class FakeAttachment:
+    """A photo attachment. Unless given its bytes, it's a new random image, made when it's read (the "download")."""
+
+    def __init__(self, data=None, filename="proof.jpg"):
+        self.filename = filename
+        self.content_type = "image/jpeg"
+        self.data = data
+        self.size = len(data) if data else 200_000
+
+    async def read(self):
+        if self.data is None:
+            from PIL import Image
+            noise = Image.frombytes("L", (32, 24), os.urandom(32 * 24)).resize((640, 480))
+            buffer = io.BytesIO()
+            noise.convert("RGB").save(buffer, "JPEG", quality=85)
+            self.data = buffer.getvalue()
+        return self.data
+
+class FakeContext:
+    """Enough of commands.Context for the command callbacks: author, guild, message and send()."""
+
+    def __init__(self, guild, author, attachments=None):
+        self.guild = guild
+        self.author = author
+        self.message = FakeMessage(guild, "sk.log", [FakeAttachment()] if attachments is None else attachments)
+        self.sent = []
+
+    async def send(self, content=None, embed=None):
+        self.sent.append(content if embed is None else embed)
+        return FakeMessage(self.guild, content or "")
+
+class FakeReactionPayload:
+    """Stands in for discord.RawReactionActionEvent (member is only set for additions, as in discord.py)."""
+
+    def __init__(self, guild_id, message_id, user, emoji="➕", added=True):
+        self.guild_id = guild_id
+        self.message_id = message_id
+        self.user_id = user.id
+        self.member = user if added else None
+        self.emoji = emoji
@@ -0,0 +1,298 @@
+"""
+Load test: storms of ➕ reactions, logs and leaderboard calls against a local Sheets stand-in.
+
+Runs the real handlers from main.py, with the real SheetsBackend, SheetsClient pacing and gspread
+client, against SheetsStandIn (benchmarks/sheets_server.py) over HTTP. The stand-in adds Google's
+latency, per-minute quota and errors. Events arrive at random (Poisson) times at a fixed offered
+rate, whether or not earlier ones have finished, the way Discord delivers them. Each synthetic
+user acts once, so what every user's contributions should end up as is known exactly:
+
+- react: ➕ on today's log message, taken back `--undo` of the time a few seconds later,
+- log: sk.log with a new photo, followed half the time by a ➕ that mustn't count again,
+- leaderboard: sk.leaderboard, which writes out any queued reactions first.
+
+When the storm is over, the queues are drained and the sheet is read back through a fresh client.
+The report gives throughput, tail latency per event, the 429s and errors the stand-in returned,
+and how many contributions were lost or counted twice in the sheet, the day bitmaps and the
+bot's own cache. Run several rates to find where the bot stops keeping up:
+
+    python -m benchmarks.loadtest                                   # 20 events/s for 30 s
+    python -m benchmarks.loadtest --rates 10 50 100 --duration 20
+    python -m benchmarks.loadtest --error-rate 0.05 --lost-response-rate 0.02 --journal
+
+Pacing uses SHEETS_READS_PER_MINUTE / SHEETS_WRITES_PER_MINUTE, as in the bot.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+import metrics  # noqa: E402
+import proofs  # noqa: E402
+import sheets_client  # noqa: E402
+from benchmarks.fakes import FakeContext, FakeGuild, FakeReactionPayload, FakeSpreadsheet, FakeUser  # noqa: E402
+from benchmarks.sheets_server import SheetsStandIn  # noqa: E402
+from days import DayBitmap  # noqa: E402
+from guilds import GuildConfig  # noqa: E402
+from journal import JournaledBackend  # noqa: E402
+from storage import DAYS_SHEET, SheetsBackend  # noqa: E402
+
+DRAIN_TIMEOUT = 300  # seconds to wait for queued writes once the storm is over
+
+
+###### STORM ##################
+
+class Storm:
+    """One guild, its stand-in spreadsheet, and the ledger of what each synthetic user should end up with."""
+
+    _next_guild_id = 1000
+
+    def __init__(self, args, server, tmpdir):
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.guild_id = Storm._next_guild_id
+        Storm._next_guild_id += 1
+        self.discord_guild = FakeGuild(self.guild_id)
+        self.state = main.register_guild(GuildConfig(self.guild_id, 1))
+        self.today = self.state.today()
+
+        # a roster that last logged yesterday, so today's first log extends the streak
+        roster = FakeSpreadsheet(args.users, last_logged=str(self.today - timedelta(days=1)))
+        self.key = f"loadtest-{self.guild_id}"
+        self.server = server
+        server.add_spreadsheet(self.key, {title: sheet.rows for title, sheet in roster.sheets.items()})
+        self.initial = {row[0]: int(row[2]) for row in roster.sheets["Sheet2"].rows[1:]}
+        self.streak_before = int(roster.sheets["Sheet1"].rows[1][0])
+        self.journal_path = os.path.join(tmpdir, f"journal-{self.guild_id}.jsonl") if args.journal else None
+
+        self.unused = [FakeUser(int(user_id), f"player{i}") for i, user_id in enumerate(self.initial)]
+        self.random.shuffle(self.unused)
+        self._next_new_user = 10 ** 9
+        self.expected = {}  # User ID -> contributions they gained today: 0, 1, or None if a handler failed partway
+
+        self.latencies = defaultdict(list)  # event -> seconds from its arrival until its handler finished
+        self.errors = Counter()  # (event, exception type)
+        self.message_id = None
+
+    def user(self):
+        """A user who hasn't acted yet: existing roster members first, then new ones."""
+        if self.unused and self.random.random() < 0.8:
+            return self.unused.pop()
+        self._next_new_user += 1
+        return FakeUser(self._next_new_user, f"new{self._next_new_user}")
+
+    def ctx(self, user):
+        return FakeContext(self.discord_guild, user)
+
+    async def connect(self):
+        backend = await asyncio.to_thread(lambda: SheetsBackend(self.server.client().open_by_key(self.key)))
+        if self.journal_path:
+            backend = JournaledBackend(backend, self.journal_path)
+        self.state.backend = backend
+        await main.load_streak_data(self.state, force_refresh=True)
+        await main.load_user_index(self.state, force_refresh=True)
+        await main.load_day_bitmaps(self.state)
+        self.state.ready.set()
+
+        # today's first log posts the message everyone reacts to
+        opener = self.user()
+        await main.log(self.ctx(opener))
+        self.expected[str(opener.id)] = 1
+        streak = await main.load_streak_data(self.state)
+        self.message_id = int(streak["log_message_id_today"])
+
+    async def timed(self, event, arrived, handler, *args):
+        try:
+            await handler(*args)
+        except Exception as e:
+            self.errors[(event, type(e).__name__)] += 1
+            return False
+        finally:
+            self.latencies[event].append(time.perf_counter() - arrived)
+        return True
+
+    async def react(self, arrived):
+        user = self.user()
+        added = await self.timed("➕ add", arrived, main.on_raw_reaction_add, FakeReactionPayload(self.guild_id, self.message_id, user))
+        self.expected[str(user.id)] = 1 if added else None
+        if added and self.random.random() < self.args.undo:
+            await asyncio.sleep(self.random.uniform(0.5, 3))
+            removed = await self.timed("➕ remove", time.perf_counter(), main.on_raw_reaction_remove,
+                                       FakeReactionPayload(self.guild_id, self.message_id, user, added=False))
+            self.expected[str(user.id)] = 0 if removed else None
+
+    async def log(self, arrived):
+        user = self.user()
+        logged = await self.timed("sk.log", arrived, main.log, self.ctx(user))
+        self.expected[str(user.id)] = 1 if logged else None
+        if logged and self.random.random() < 0.5:
+            # already counted today, so this ➕ must not add a second contribution
+            await self.timed("➕ add", time.perf_counter(), main.on_raw_reaction_add, FakeReactionPayload(self.guild_id, self.message_id, user))
+
+    async def leaderboard(self, arrived):
+        await self.timed("sk.leaderboard", arrived, main.leaderboard, self.ctx(FakeUser(1, "viewer")))
+
+    async def run(self, rate, duration):
+        """Offer `rate` events per second for `duration` seconds; returns the seconds until every handler finished."""
+        events = [(self.react, self.args.mix[0]), (self.log, self.args.mix[1]), (self.leaderboard, self.args.mix[2])]
+        kinds, weights = zip(*events)
+        tasks = []
+        start = time.perf_counter()
+        next_at = start
+        while next_at - start < duration:
+            await asyncio.sleep(max(next_at - time.perf_counter(), 0))
+            event = self.random.choices(kinds, weights)[0]
+            tasks.append(asyncio.create_task(event(next_at)))
+            next_at += self.random.expovariate(rate)
+        await asyncio.gather(*tasks)
+        self.events = len(tasks)
+        return time.perf_counter() - start
+
+    async def drain(self):
+        """Write out everything still queued: reactions, changes on the writer and the journal."""
+        deadline = time.perf_counter() + DRAIN_TIMEOUT
+        while time.perf_counter() < deadline:
+            try:
+                await main.flush_contributions(self.state)
+            except Exception as e:
+                self.errors[("drain", type(e).__name__)] += 1
+                await asyncio.sleep(1)
+                continue
+            if self.state.pending_contributions or self.state.writer.pending or getattr(self.state.backend, "unreplayed", 0):
+                await asyncio.sleep(0.2)
+                continue
+            return True
+        return False
+
+    def check(self):
+        """Compare the sheet (read back through a fresh client), the day bitmaps and the bot's cache with the ledger."""
+        stored = SheetsBackend(self.server.client().open_by_key(self.key))
+        users = {record["user_id"]: record for record in stored.load_users()}
+        rows = Counter(row[0] for row in self.server.spreadsheets[self.key].sheet("Sheet2").rows[1:] if row and row[0])
+        days = stored.load_days() if self.server.spreadsheets[self.key].sheet(DAYS_SHEET, missing_ok=True) else {}
+        streak = stored.load_streak()
+
+        result = Counter()
+        for user_id, gained in self.expected.items():
+            initial = self.initial.get(user_id, 0)
+            have = users[user_id]["contributions"] if user_id in users else 0
+            logged_today = str(self.today) in DayBitmap.from_hex(days.get(user_id, ""))
+            if gained is None:
+                # the handler raised, so either outcome is fine, as long as the sheet and bitmap agree
+                gained = min(max(have - initial, 0), 1)
+                result["uncertain"] += 1
+            want = initial + gained
+            if have < want:
+                result["lost"] += want - have
+            elif have > want:
+                result["duplicated"] += have - want
+            if logged_today != bool(gained):
+                result["day bitmap mismatches"] += 1
+            cached = self.state.user_index.get(user_id)
+            if (cached["contributions"] if cached else 0) != have:
+                result["cache mismatches"] += 1
+        result["duplicate rows"] = sum(count - 1 for count in rows.values() if count > 1)
+        result["streak off by"] = streak["streak_count"] - (self.streak_before + 1)
+        result["users"] = len(self.expected)
+        result["counted"] = sum(1 for gained in self.expected.values() if gained)
+        return result
+
+
+###### REPORT ##################
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else 0.0
+
+def print_run(rate, storm, elapsed, stats, retries, result, drained):
+    print(f"\n{rate:g} events/s offered, {storm.events} events in {elapsed:.1f}s ({storm.events / elapsed:.1f}/s handled)")
+    print(f"{'event':<16} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}  errors")
+    for event, latencies in sorted(storm.latencies.items()):
+        errors = ", ".join(f"{error}×{count}" for (name, error), count in storm.errors.items() if name == event) or "-"
+        print(f"{event:<16} {len(latencies):>6} {percentile(latencies, 0.5) * 1000:>9.1f} {percentile(latencies, 0.95) * 1000:>9.1f} "
+              f"{percentile(latencies, 0.99) * 1000:>9.1f} {max(latencies) * 1000:>9.1f}  {errors}")
+    print(f"Sheets stand-in: {stats['read']} reads, {stats['write']} writes, {stats['429']} × 429, "
+          f"{stats['500'] + stats['503']} × 5xx, {stats['lost_response']} lost responses; {retries} client retries")
+    verdict = "consistent" if drained and not any(result[key] for key in ("lost", "duplicated", "duplicate rows", "day bitmap mismatches", "cache mismatches", "streak off by")) else "INCONSISTENT"
+    print(f"Final data ({'drained' if drained else 'NOT drained'}): {result['counted']} of {result['users']} users should have gained a contribution "
+          f"({result['uncertain']} more hit an error, so may or may not have); "
+          f"{result['lost']} lost, {result['duplicated']} duplicated, {result['duplicate rows']} duplicate rows, "
+          f"{result['day bitmap mismatches']} day bitmap and {result['cache mismatches']} cache mismatches, streak off by {result['streak off by']} -> {verdict}")
+    return verdict
+
+async def run_rate(args, rate, tmpdir):
+    # faults are switched on once the guild is set up, so only the storm sees them
+    server = SheetsStandIn(args.latency / 1000, reads_per_minute=args.quota, writes_per_minute=args.quota, seed=args.seed)
+    server.start()
+    # fresh token buckets, so one run's pacing doesn't carry over into the next
+    sheets_client.read_bucket = sheets_client.TokenBucket(sheets_client.SHEETS_READS_PER_MINUTE, sheets_client.SHEETS_BURST)
+    sheets_client.write_bucket = sheets_client.TokenBucket(sheets_client.SHEETS_WRITES_PER_MINUTE, sheets_client.SHEETS_BURST)
+    retries_before = sum(metrics.RETRIES.totals().values())
+    try:
+        storm = Storm(args, server, tmpdir)
+        await storm.connect()
+        server.error_rate, server.lost_response_rate = args.error_rate, args.lost_response_rate
+        server.stats.clear()  # count the storm, not the setup
+        elapsed = await storm.run(rate, args.duration)
+        server.error_rate = server.lost_response_rate = 0  # let the drain finish
+        drained = await storm.drain()
+        stats = Counter(server.stats)
+        result = await asyncio.to_thread(storm.check)
+        verdict = print_run(rate, storm, elapsed, stats, sum(metrics.RETRIES.totals().values()) - retries_before, result, drained)
+        if isinstance(storm.state.backend, JournaledBackend):
+            await asyncio.to_thread(storm.state.backend.close)
+        storm.state.writer.stop()
+        return {"rate": rate, "handled": storm.events / elapsed, "p99": percentile([x for values in storm.latencies.values() for x in values], 0.99),
+                "429": stats["429"], "lost": result["lost"], "duplicated": result["duplicated"] + result["duplicate rows"], "verdict": verdict}
+    finally:
+        main.guilds.clear()
+        server.stop()
+
+async def run(args):
+    pool = proofs.start_pool()
+    if pool:
+        await asyncio.get_running_loop().run_in_executor(pool, int)
+    summary = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for rate in args.rates:
+            summary.append(await run_rate(args, rate, tmpdir))
+    proofs.stop_pool()
+
+    if len(summary) > 1:
+        print(f"\n{'offered/s':>9} {'handled/s':>9} {'p99 ms':>9} {'429s':>6} {'lost':>6} {'dup':>6}  data")
+        for row in summary:
+            print(f"{row['rate']:>9g} {row['handled']:>9.1f} {row['p99'] * 1000:>9.1f} {row['429']:>6} {row['lost']:>6} {row['duplicated']:>6}  {row['verdict']}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Load-test StreakKeeper's handlers against a local Google Sheets stand-in.")
+    parser.add_argument("--rates", type=float, nargs="+", default=[20], help="offered events per second, one run each")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of storm per run")
+    parser.add_argument("--users", type=int, default=5000, help="synthetic users already on the leaderboard")
+    parser.add_argument("--mix", type=float, nargs=3, default=[0.9, 0.05, 0.05], metavar=("REACT", "LOG", "LEADERBOARD"),
+                        help="relative weights of ➕ reactions, sk.log and sk.leaderboard")
+    parser.add_argument("--undo", type=float, default=0.1, help="fraction of ➕ reactions taken back")
+    parser.add_argument("--latency", type=float, default=80, help="stand-in response time, in ms (±50%%)")
+    parser.add_argument("--quota", type=int, default=60, help="stand-in reads and writes allowed per minute, like Google's per-user quota (0: unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failing with a 500 or 503")
+    parser.add_argument("--lost-response-rate", type=float, default=0.0, help="fraction of writes applied but answered with a 500")
+    parser.add_argument("--journal", action="store_true", help="journal writes locally and replay them in the background (see journal.py)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true", help="show the bot's warnings (retries, failed flushes)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING if args.verbose else logging.CRITICAL, format="%(levelname)s %(name)s: %(message)s")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main_cli()
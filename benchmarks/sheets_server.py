@@ -0,0 +1,342 @@
+"""
+A local HTTP stand-in for the Google Sheets v4 API.
+
+Serves the handful of endpoints gspread calls for the Sheets backend (spreadsheet metadata,
+values get/update/append/clear and their batch versions, and batchUpdate for adding, copying
+and resizing sheets), so the real gspread client, SheetsClient and SheetsBackend run unchanged
+over real HTTP. Like Google, it can be slow, enforce a per-minute quota with 429s, and fail:
+
+- latency: every response waits `latency` seconds, give or take `jitter` (a fraction of it),
+- quotas: reads (GETs) and writes (everything else) each get `reads_per_minute` and
+  `writes_per_minute` requests in any sliding 60 seconds; the rest get a 429,
+- errors: `error_rate` of requests fail with a 500 or 503 without doing anything, and
+  `lost_response_rate` of writes are applied but still answer 500, as when a response is lost
+  on the way back (the case that makes a retried append write a row twice).
+
+    server = SheetsStandIn(latency=0.08, writes_per_minute=60)
+    server.add_spreadsheet("bench", {"Sheet1": rows, "Sheet2": rows})
+    server.start()
+    spreadsheet = server.client().open_by_key("bench")
+"""
+
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from urllib.parse import unquote
+
+import gspread
+import requests
+from aiohttp import web
+from gspread.utils import a1_to_rowcol
+
+GOOGLE_SHEETS_URL = "https://sheets.googleapis.com"
+QUOTA_WINDOW = 60.0  # seconds
+
+
+###### SPREADSHEET STATE ##################
+
+class Sheet:
+    def __init__(self, sheet_id, title, index, rows, row_count=1000, col_count=26):
+        self.id = sheet_id
+        self.title = title
+        self.index = index
+        self.rows = [[cell(value) for value in row] for row in rows]
+        self.row_count = max(row_count, len(self.rows))
+        self.col_count = col_count
+
+    def properties(self):
+        return {"sheetId": self.id, "title": self.title, "index": self.index, "sheetType": "GRID",
+                "gridProperties": {"rowCount": self.row_count, "columnCount": self.col_count}}
+
+    def last_row(self):
+        """The last row with anything in it (0 if the sheet is empty)."""
+        last = len(self.rows)
+        while last and not any(self.rows[last - 1]):
+            last -= 1
+        return last
+
+    def read(self, first_row, first_col, last_row, last_col):
+        values = []
+        for row in self.rows[first_row - 1:min(last_row, len(self.rows))]:
+            values.append(row[first_col - 1:last_col])
+        # like Google: no trailing empty cells or rows
+        values = [trim(row) for row in values]
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def write(self, first_row, first_col, values):
+        if first_row + len(values) - 1 > self.row_count:
+            raise BadRequest(f"Range ('{self.title}'!A{first_row}) exceeds grid limits. Max rows: {self.row_count}")
+        for i, values_row in enumerate(values):
+            row = first_row + i
+            while len(self.rows) < row:
+                self.rows.append([])
+            cells = self.rows[row - 1]
+            for j, value in enumerate(values_row):
+                col = first_col + j
+                while len(cells) < col:
+                    cells.append("")
+                cells[col - 1] = cell(value)
+
+    def clear(self, first_row, first_col, last_row, last_col):
+        for row in self.rows[first_row - 1:min(last_row, len(self.rows))]:
+            for col in range(first_col, min(last_col, len(row)) + 1):
+                row[col - 1] = ""
+
+
+def cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    return str(value)
+
+def trim(row):
+    row = list(row)
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+
+class BadRequest(Exception):
+    pass
+
+
+class Spreadsheet:
+    def __init__(self, key, title):
+        self.key = key
+        self.title = title
+        self.sheets = []
+        self._ids = iter(range(0, 10 ** 9, 7))  # sheet IDs as arbitrary as Google's
+
+    def add(self, title, rows=(), row_count=1000, col_count=26, index=None):
+        if self.sheet(title, missing_ok=True):
+            raise BadRequest(f'A sheet with the name "{title}" already exists.')
+        sheet = Sheet(next(self._ids), title, len(self.sheets) if index is None else index, rows, row_count, col_count)
+        self.sheets.insert(sheet.index, sheet)
+        for index, each in enumerate(self.sheets):
+            each.index = index
+        return sheet
+
+    def sheet(self, title=None, sheet_id=None, missing_ok=False):
+        for sheet in self.sheets:
+            if (title is not None and sheet.title == title) or (sheet_id is not None and sheet.id == sheet_id):
+                return sheet
+        if missing_ok:
+            return None
+        raise BadRequest(f"Unable to parse range: {title}")
+
+    def metadata(self):
+        return {"spreadsheetId": self.key, "properties": {"title": self.title, "locale": "en_US", "timeZone": "America/New_York"},
+                "sheets": [{"properties": sheet.properties()} for sheet in self.sheets]}
+
+    def resolve(self, range_name):
+        """(sheet, first row, first col, last row, last col) for an A1 range like 'Sheet 2'!A2:D, Sheet1!A2:2 or Sheet1."""
+        title, _, cells = range_name.rpartition("!")
+        title = title.strip("'").replace("''", "'")
+        if not title:
+            # either a whole sheet ("'Sheet 2'") or cells on the first sheet ("A1:D")
+            name = cells.strip("'").replace("''", "'")
+            title, cells = (name, "") if self.sheet(name, missing_ok=True) else (self.sheets[0].title, cells)
+        sheet = self.sheet(title)
+        if not cells:
+            return sheet, 1, 1, sheet.row_count, sheet.col_count
+        start, _, end = cells.partition(":")
+        first_row, first_col = parse_cell(start, 1, 1)
+        last_row, last_col = parse_cell(end or start, sheet.row_count, sheet.col_count)
+        return sheet, first_row, first_col, last_row, last_col
+
+
+def parse_cell(ref, default_row, default_col):
+    """A1 reference -> (row, col); a bare column ("D") or row ("2") takes the default for the other."""
+    match = re.fullmatch(r"([A-Za-z]*)(\d*)", ref)
+    if not match:
+        raise BadRequest(f"Unable to parse range: {ref}")
+    letters, digits = match.groups()
+    if letters and digits:
+        return a1_to_rowcol(ref.upper())
+    col = a1_to_rowcol(letters.upper() + "1")[1] if letters else default_col
+    return (int(digits) if digits else default_row), col
+
+
+###### HTTP SERVER ##################
+
+class SheetsStandIn:
+    """The stand-in server, running on its own thread and event loop like a remote service."""
+
+    def __init__(self, latency=0.0, jitter=0.5, reads_per_minute=0, writes_per_minute=0, error_rate=0.0, lost_response_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.quotas = {"read": reads_per_minute, "write": writes_per_minute}  # 0: unlimited
+        self.error_rate = error_rate
+        self.lost_response_rate = lost_response_rate
+        self.random = random.Random(seed)
+        self.spreadsheets = {}
+        self.stats = Counter()  # requests, by "read"/"write", and what was done to them
+        self._windows = {"read": deque(), "write": deque()}
+        self._lock = threading.Lock()  # the spreadsheets are also read directly by the load test
+        self._loop = None
+        self._runner = None
+        self.base_url = None
+
+    def add_spreadsheet(self, key, tables, title=None):
+        """Create a spreadsheet from {worksheet title: rows}."""
+        spreadsheet = self.spreadsheets[key] = Spreadsheet(key, title or key)
+        for title, rows in tables.items():
+            spreadsheet.add(title, rows, row_count=max(len(rows) + 100, 1000))
+        return spreadsheet
+
+    def client(self):
+        """A gspread client whose requests go to this server instead of Google (no credentials needed)."""
+        return gspread.Client(None, session=StandInSession(self.base_url))
+
+    def start(self, host="127.0.0.1", port=0):
+        started = threading.Event()
+        threading.Thread(target=self._serve, args=(host, port, started), name="sheets-stand-in", daemon=True).start()
+        started.wait()
+        return self.base_url
+
+    def _serve(self, host, port, started):
+        self._loop = asyncio.new_event_loop()
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route("*", "/v4/spreadsheets/{path:.*}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        self._loop.run_until_complete(self._runner.setup())
+        site = web.TCPSite(self._runner, host, port)
+        self._loop.run_until_complete(site.start())
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}"
+        started.set()
+        self._loop.run_forever()
+
+    def stop(self):
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+    def _over_quota(self, kind):
+        limit = self.quotas[kind]
+        if not limit:
+            return False
+        now = time.monotonic()
+        window = self._windows[kind]
+        while window and now - window[0] >= QUOTA_WINDOW:
+            window.popleft()
+        if len(window) >= limit:
+            return True
+        window.append(now)
+        return False
+
+    async def _handle(self, request):
+        kind = "read" if request.method == "GET" else "write"
+        self.stats[kind] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency * (1 + self.random.uniform(-self.jitter, self.jitter)))
+
+        if self._over_quota(kind):
+            self.stats["429"] += 1
+            return error(429, "Quota exceeded for quota metric 'Write requests' and limit 'Write requests per minute per user'.", "RESOURCE_EXHAUSTED")
+        if self.random.random() < self.error_rate:
+            status = self.random.choice((500, 503))
+            self.stats[str(status)] += 1
+            return error(status, "The service is currently unavailable.", "UNAVAILABLE")
+
+        body = await request.json() if request.can_read_body else None
+        try:
+            with self._lock:
+                result = self._dispatch(request.method, unquote(request.match_info["path"]), request.query, body)
+        except BadRequest as e:
+            self.stats["400"] += 1
+            return error(400, str(e), "INVALID_ARGUMENT")
+        except KeyError as e:
+            self.stats["404"] += 1
+            return error(404, f"Requested entity was not found: {e}", "NOT_FOUND")
+
+        if kind == "write" and self.random.random() < self.lost_response_rate:
+            self.stats["lost_response"] += 1
+            return error(500, "Internal error encountered.", "INTERNAL")
+        return web.json_response(result)
+
+    def _dispatch(self, method, path, query, body):
+        key, _, rest = path.partition("/")
+        key, _, action = key.partition(":")
+        spreadsheet = self.spreadsheets[key]
+        if not rest:
+            if method == "GET":
+                return spreadsheet.metadata()
+            if action == "batchUpdate":
+                return {"spreadsheetId": key, "replies": [self._batch_request(spreadsheet, item) for item in body["requests"]]}
+        elif rest == "values:batchGet":
+            value_ranges = []
+            for range_name in query.getall("ranges", []):
+                sheet, *bounds = spreadsheet.resolve(range_name)
+                value_ranges.append({"range": range_name, "majorDimension": "ROWS", "values": sheet.read(*bounds)})
+            return {"spreadsheetId": key, "valueRanges": value_ranges}
+        elif rest == "values:batchUpdate":
+            for item in body["data"]:
+                sheet, first_row, first_col, *_ = spreadsheet.resolve(item["range"])
+                sheet.write(first_row, first_col, item["values"])
+            return {"spreadsheetId": key, "totalUpdatedRows": sum(len(item["values"]) for item in body["data"])}
+        elif rest == "values:batchClear":
+            for range_name in body["ranges"]:
+                sheet, *bounds = spreadsheet.resolve(range_name)
+                sheet.clear(*bounds)
+            return {"spreadsheetId": key, "clearedRanges": body["ranges"]}
+        elif rest.startswith("values/"):
+            range_name, _, action = rest[len("values/"):].rpartition(":") if rest.endswith((":append", ":clear")) else (rest[len("values/"):], "", "")
+            sheet, first_row, first_col, last_row, last_col = spreadsheet.resolve(range_name)
+            if method == "GET":
+                return {"range": range_name, "majorDimension": "ROWS", "values": sheet.read(first_row, first_col, last_row, last_col)}
+            if method == "PUT":
+                sheet.write(first_row, first_col, body["values"])
+                return {"spreadsheetId": key, "updatedRange": range_name, "updatedRows": len(body["values"])}
+            if action == "append":
+                start = sheet.last_row() + 1
+                sheet.row_count = max(sheet.row_count, start + len(body["values"]) - 1)  # appends grow the grid
+                sheet.write(start, first_col, body["values"])
+                end = start + len(body["values"]) - 1
+                return {"spreadsheetId": key, "updates": {"updatedRange": f"{sheet.title}!A{start}:D{end}", "updatedRows": len(body["values"])}}
+            if action == "clear":
+                sheet.clear(first_row, first_col, last_row, last_col)
+                return {"spreadsheetId": key, "clearedRange": range_name}
+        raise KeyError(path)
+
+    def _batch_request(self, spreadsheet, item):
+        if "addSheet" in item:
+            properties = item["addSheet"]["properties"]
+            grid = properties.get("gridProperties", {})
+            sheet = spreadsheet.add(properties["title"], row_count=grid.get("rowCount", 1000), col_count=grid.get("columnCount", 26), index=properties.get("index"))
+            return {"addSheet": {"properties": sheet.properties()}}
+        if "duplicateSheet" in item:
+            request = item["duplicateSheet"]
+            source = spreadsheet.sheet(sheet_id=request["sourceSheetId"])
+            sheet = spreadsheet.add(request["newSheetName"], source.rows, source.row_count, source.col_count, request.get("insertSheetIndex"))
+            return {"duplicateSheet": {"properties": sheet.properties()}}
+        if "updateSheetProperties" in item:
+            properties = item["updateSheetProperties"]["properties"]
+            sheet = spreadsheet.sheet(sheet_id=properties["sheetId"])
+            grid = properties.get("gridProperties", {})
+            sheet.row_count = grid.get("rowCount", sheet.row_count)
+            sheet.col_count = grid.get("columnCount", sheet.col_count)
+            return {}
+        raise BadRequest(f"Unsupported request: {json.dumps(item)[:100]}")
+
+
+def error(status, message, reason):
+    return web.json_response({"error": {"code": status, "message": message, "status": reason}}, status=status)
+
+
+class StandInSession(requests.Session):
+    """A requests session that sends Google Sheets API calls to the stand-in."""
+
+    def __init__(self, base_url):
+        super().__init__()
+        self.base_url = base_url
+
+    def request(self, method, url, **kwargs):
+        return super().request(method, url.replace(GOOGLE_SHEETS_URL, self.base_url, 1), **kwargs)
@@ -0,0 +1,97 @@
+"""
+Per-user contribution history as day bitmaps.
+
+Each user's contributions are one integer used as a bitmap: bit n is set if they contributed on
+the day n days after EPOCH. Checking a date is a single bit test, counting days is a popcount,
+and streaks come from a few whole-bitmap shifts, so none of it scans rows. Bitmaps are stored as
+hex in the Days sheet or table: every year since EPOCH adds about 92 characters per user.
+"""
+
+import calendar
+from datetime import date, timedelta
+
+EPOCH = date(2020, 1, 1)  # bit 0; contributions before this date can't be recorded
+
+
+def day_offset(day):
+    """The bit for a date (a date or an ISO "YYYY-MM-DD" string)."""
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    offset = (day - EPOCH).days
+    if offset < 0:
+        raise ValueError(f"{day} is before the day bitmap epoch {EPOCH}")
+    return offset
+
+
+class DayBitmap:
+    """The days one user contributed on."""
+
+    __slots__ = ("bits",)
+
+    def __init__(self, bits=0):
+        self.bits = bits
+
+    @classmethod
+    def from_hex(cls, value):
+        return cls(int(value, 16) if value else 0)
+
+    def to_hex(self):
+        return format(self.bits, "x")
+
+    def __contains__(self, day):
+        return bool(self.bits >> day_offset(day) & 1)
+
+    def __len__(self):
+        """Days contributed, ever."""
+        return self.bits.bit_count()
+
+    def __eq__(self, other):
+        return isinstance(other, DayBitmap) and self.bits == other.bits
+
+    def add(self, day):
+        self.bits |= 1 << day_offset(day)
+
+    def remove(self, day):
+        self.bits &= ~(1 << day_offset(day))
+
+    def last_day(self):
+        """The latest day contributed, or None."""
+        return EPOCH + timedelta(days=self.bits.bit_length() - 1) if self.bits else None
+
+    def current_streak(self, today):
+        """(length, start date) of the run of days ending today, or yesterday if today isn't logged yet (0, None if neither is)."""
+        end = day_offset(today)
+        if not self.bits >> end & 1:
+            end -= 1
+            if end < 0 or not self.bits >> end & 1:
+                return 0, None
+        # the highest unset bit at or below end is where the run starts
+        gaps = ~self.bits & ((1 << (end + 1)) - 1)
+        start = gaps.bit_length()
+        return end - start + 1, EPOCH + timedelta(days=start)
+
+    def longest_streak(self):
+        """(length, end date) of the longest run of consecutive days (the latest one if tied), or (0, None).
+
+        Each `runs & (runs >> 1)` keeps only the days followed by another logged day, so every run
+        shrinks by one; the number of steps until nothing is left is the longest run's length.
+        """
+        runs, length, starts = self.bits, 0, 0
+        while runs:
+            starts = runs
+            runs &= runs >> 1
+            length += 1
+        if not length:
+            return 0, None
+        # after length - 1 steps, the bits left are the first days of the longest runs
+        start = starts.bit_length() - 1
+        return length, EPOCH + timedelta(days=start + length - 1)
+
+    def month(self, year, month):
+        """Days contributed in a month, as a set of day-of-month numbers."""
+        first = date(year, month, 1)
+        days = calendar.monthrange(year, month)[1]
+        if first < EPOCH:
+            return set()
+        bits = self.bits >> day_offset(first) & ((1 << days) - 1)
+        return {day + 1 for day in range(days) if bits >> day & 1}
@@ -0,0 +1,75 @@
+"""
+Per-server (guild) configuration.
+
+Each server gets its own reminder channel, time zone, admin set and storage. Configure servers
+with a JSON object keyed by guild ID, either in the GUILDS environment variable or in the file
+named by GUILDS_FILE (default guilds.json):
+
+    {
+        "123456789012345678": {
+            "channel_id": 1313197151739842596,
+            "timezone": "America/New_York",
+            "admins": [722664432433627209],
+            "storage": "sheets",
+            "sheet_key": "1AbCdEfGhIjKlMnOpQrStUvWxYz0123456789abcdefg"
+        },
+        "234567890123456789": {
+            "channel_id": 2345678901234567890,
+            "timezone": "America/Los_Angeles",
+            "admins": [111111111111111111],
+            "storage": "sqlite",
+            "sqlite_path": "streak-234567890123456789.db"
+        }
+    }
+
+Only channel_id is required. Give Sheets servers a sheet_key (the ID in the spreadsheet's URL)
+rather than a sheet_name where possible: opening by key skips a Drive search at startup.
+Without any configuration, the bot serves the single server that owns the default channel,
+exactly as before.
+"""
+
+import json
+import os
+
+import pytz
+
+
+class GuildConfig:
+    """Settings for one server. guild_id may be None until the default channel's server is known."""
+
+    def __init__(self, guild_id, channel_id, timezone="America/New_York", admins=(), storage=None, sheet_name=None, sqlite_path=None, sheet_key=None):
+        self.guild_id = int(guild_id) if guild_id is not None else None
+        self.channel_id = int(channel_id)
+        self.timezone = pytz.timezone(timezone)
+        self.admins = {int(admin) for admin in admins}
+        self.storage = storage or os.getenv("STORAGE_BACKEND", "sheets")
+        self.sheet_name = sheet_name
+        self.sheet_key = sheet_key
+        # each server gets its own database file so servers never contend for one connection
+        self.sqlite_path = sqlite_path or (f"streak-{self.guild_id}.db" if self.guild_id else None)
+
+    @classmethod
+    def from_dict(cls, guild_id, data):
+        return cls(
+            guild_id,
+            data["channel_id"],
+            timezone=data.get("timezone", "America/New_York"),
+            admins=data.get("admins", ()),
+            storage=data.get("storage"),
+            sheet_name=data.get("sheet_name"),
+            sqlite_path=data.get("sqlite_path"),
+            sheet_key=data.get("sheet_key")
+        )
+
+
+def load_guild_configs(default):
+    """Read server configs from GUILDS or GUILDS_FILE, falling back to [default] if neither is set."""
+    raw = os.getenv("GUILDS")
+    path = os.getenv("GUILDS_FILE", "guilds.json")
+    if not raw and os.path.exists(path):
+        with open(path) as f:
+            raw = f.read()
+    if not raw:
+        return [default]
+
+    return [GuildConfig.from_dict(guild_id, data) for guild_id, data in json.loads(raw).items()]
@@ -0,0 +1,337 @@
+"""
+Write-ahead journal for storage writes.
+
+With JOURNAL_DIR set, every write a server makes (streak record, contributions, resets, proofs)
+is appended to a local journal file and fsynced before the command carries on. A background
+thread then replays the journal to the real backend in order, retrying each write until it
+lands. A failed or slow Google request no longer loses a change the bot already confirmed in
+Discord, and commands wait for the disk instead of for Google.
+
+The journal is one JSON object per line: {"seq", "method", "args"} for a write and {"done": seq}
+once it has been replayed. It's compacted by rewriting it as a snapshot of the writes still
+waiting (a streak record overwritten by a later one, for example, is left out), so it stays
+small however long the bot runs, and however long storage stays down. It needs a persistent disk: on Heroku's ephemeral filesystem
+anything not yet replayed when the dyno restarts is lost.
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+from collections import deque
+
+from metrics import ERRORS, RETRIES
+from storage import StorageBackend, normalize_streak
+
+logger = logging.getLogger("streakkeeper.journal")
+
+JOURNAL_DIR = os.getenv("JOURNAL_DIR")  # unset: writes go straight to storage, as before
+JOURNAL_COMPACT_AT = int(os.getenv("JOURNAL_COMPACT_AT", "1000"))  # lines in the file before it's compacted
+JOURNAL_READ_WAIT = float(os.getenv("JOURNAL_READ_WAIT", "10"))  # seconds a read waits for earlier writes to be replayed
+REPLAY_MAX_DELAY = 60.0  # seconds between replay attempts while storage keeps failing
+
+# writes that replace what an earlier one of the same kind wrote, and the writes they can't be merged across
+STREAK_BARRIERS = {"restore"}
+USERS_BARRIERS = {"clear_users", "archive_users", "restore"}
+DAYS_BARRIERS = {"restore"}
+CONTRIBUTIONS_BARRIERS = USERS_BARRIERS | {"save_users", "save_days"}  # a save_contributions writes both tables
+
+
+def journal_path(guild_id):
+    return os.path.join(JOURNAL_DIR, f"journal-{guild_id}.jsonl")
+
+
+###### JOURNAL FILE ##################
+
+def collapse(entries):
+    """Drop the writes a later one makes redundant, keeping the rest in order.
+
+    Only the latest streak record needs writing, and consecutive contribution batches (and day
+    bitmaps) merge into the last of them, as long as no reset or restore (or a write of the
+    same table of another kind) comes in between. The kept entries keep their
+    places and sequence numbers, so replaying the snapshot ends in the same state as replaying them all.
+    """
+    kept = []
+    streak = users = days = contributions = None  # index in kept of the latest entry that can still absorb an earlier one
+    for entry in entries:
+        method = entry["method"]
+        if method == "save_streak":
+            if streak is not None:
+                kept[streak] = None
+            streak = len(kept)
+        elif method == "save_users":
+            if users is not None:
+                merged = {record["user_id"]: record for record in kept[users]["args"][0]}
+                merged.update((record["user_id"], record) for record in entry["args"][0])
+                entry = dict(entry, args=[list(merged.values())])
+                kept[users] = None
+            users = len(kept)
+        elif method == "save_days":
+            if days is not None:
+                entry = dict(entry, args=[{**kept[days]["args"][0], **entry["args"][0]}])
+                kept[days] = None
+            days = len(kept)
+        elif method == "save_contributions":
+            if contributions is not None:
+                records, days_hex = kept[contributions]["args"]
+                merged = {record["user_id"]: record for record in records}
+                merged.update((record["user_id"], record) for record in entry["args"][0])
+                entry = dict(entry, args=[list(merged.values()), {**days_hex, **entry["args"][1]}])
+                kept[contributions] = None
+            contributions = len(kept)
+            users = days = None  # save_users and save_days can't merge across it either
+        if method in STREAK_BARRIERS:
+            streak = None
+        if method in USERS_BARRIERS:
+            users = None
+        if method in DAYS_BARRIERS:
+            days = None
+        if method in CONTRIBUTIONS_BARRIERS:
+            contributions = None
+        kept.append(entry)
+    return [entry for entry in kept if entry is not None]
+
+
+class Journal:
+    """An append-only file of writes. Not thread-safe on its own; JournaledBackend holds a lock around it."""
+
+    def __init__(self, path):
+        self.path = path
+        self.seq = 0
+        self.lines = 0  # lines in the file, replay markers included
+        self.snapshot_lines = 0  # lines the last compaction left
+        self.file = None
+        pending = self._read()
+        self.pending = deque(collapse(pending))
+        # start from a compacted file, so a journal that was never compacted (e.g. after a crash) doesn't grow forever
+        self.compact()
+
+    def _read(self):
+        """Writes in the file that were never replayed. A torn last line (a crash mid-append) was never acknowledged, so it's skipped."""
+        if not os.path.exists(self.path):
+            return []
+        entries, done = [], 0
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning("[JOURNAL] Skipping an incomplete entry in %s", self.path)
+                    continue
+                if "done" in entry:
+                    done = max(done, entry["done"])
+                else:
+                    entries.append(entry)
+                    self.seq = max(self.seq, entry["seq"])
+        return [entry for entry in entries if entry["seq"] > done]
+
+    def _write_line(self, entry, sync):
+        self.file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self.file.flush()
+        if sync:
+            os.fsync(self.file.fileno())
+        self.lines += 1
+
+    def _should_compact(self):
+        # past the threshold, and at least twice as long as the last snapshot, so a long outage
+        # whose writes can't be merged doesn't rewrite the whole file on every append
+        return self.lines >= max(JOURNAL_COMPACT_AT, 2 * self.snapshot_lines)
+
+    def append(self, method, args):
+        """Durably record a write (it's on disk when this returns) and queue it for replay."""
+        self.seq += 1
+        entry = {"seq": self.seq, "method": method, "args": args}
+        self._write_line(entry, sync=True)
+        self.pending.append(entry)
+        if self._should_compact():
+            # while storage is down nothing is confirmed, so this is what keeps the file from growing
+            self.compact(keep_head=True)
+        return entry
+
+    def confirm(self, entry):
+        """Mark the oldest pending write as replayed."""
+        assert self.pending[0] is entry
+        self.pending.popleft()
+        # no fsync: if the marker is lost in a crash, the write is just replayed again, and every write can be
+        self._write_line({"done": entry["seq"]}, sync=False)
+        if self._should_compact():
+            self.compact()
+
+    def compact(self, keep_head=False):
+        """Rewrite the file as a snapshot of the writes still pending, replacing the old one atomically.
+
+        With keep_head, the oldest pending write is kept as it is: the replay may be sending it right now.
+        """
+        if self.file is not None:
+            self.file.close()
+        if keep_head and self.pending:
+            head = self.pending.popleft()
+            self.pending = deque([head] + collapse(self.pending))
+        else:
+            self.pending = deque(collapse(self.pending))
+        directory = os.path.dirname(os.path.abspath(self.path))
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for entry in self.pending:
+                f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        # the rename itself only survives a power cut once the directory is synced
+        if hasattr(os, "O_DIRECTORY"):
+            fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.lines = self.snapshot_lines = len(self.pending)
+
+    def close(self):
+        self.file.close()
+
+
+###### JOURNALED BACKEND ##################
+
+class JournaledBackend(StorageBackend):
+    """Writes are journaled and acknowledged at once, then replayed to the wrapped backend on a background thread.
+
+    The streak record is read back from the journal while a newer one is waiting to be replayed.
+    Other reads wait (up to JOURNAL_READ_WAIT seconds) until every earlier write has been
+    replayed, so they never miss a change the bot has acknowledged.
+    """
+
+    def __init__(self, backend, path):
+        self.backend = backend
+        self.name = f"{backend.name}+journal"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.journal = Journal(path)
+        self._lock = threading.Condition()
+        self._stopping = False
+
+        # the latest journaled streak record until it's been replayed, and its sequence number
+        self._streak = self._streak_seq = None
+        for entry in self.journal.pending:
+            self._track_streak(entry)
+        if self.journal.pending:
+            logger.info("[JOURNAL] Replaying %d write(s) left in %s", len(self.journal.pending), path)
+
+        self._thread = threading.Thread(target=self._replay, name="journal", daemon=True)
+        self._thread.start()
+
+    @property
+    def unreplayed(self):
+        """Journaled writes the backend hasn't confirmed yet."""
+        return len(self.journal.pending)
+
+    @property
+    def pending(self):
+        return getattr(self.backend, "pending", 0)  # the wrapped backend's own queue (e.g. mirror writes)
+
+    def _track_streak(self, entry):
+        if entry["method"] in ("save_streak", "restore"):
+            self._streak = entry["args"][0]
+            self._streak_seq = entry["seq"]
+
+    def _write(self, method, *args):
+        # the JSON round trip also copies the arguments, so later changes by the caller can't leak into the journal
+        args = json.loads(json.dumps(list(args)))
+        with self._lock:
+            entry = self.journal.append(method, args)
+            self._track_streak(entry)
+            self._lock.notify_all()
+
+    def _replay(self):
+        attempt = 0
+        while True:
+            with self._lock:
+                while not self.journal.pending and not self._stopping:
+                    self._lock.wait()
+                if self._stopping:
+                    return
+                entry = self.journal.pending[0]
+            try:
+                getattr(self.backend, entry["method"])(*entry["args"])
+            except Exception as e:
+                ERRORS.inc(source="journal", error=type(e).__name__)
+                RETRIES.inc(operation="journal_replay")
+                delay = random.uniform(0.5, 1) * min(REPLAY_MAX_DELAY, 2 ** attempt)
+                logger.warning("[JOURNAL] Replaying %s failed (%r), retrying in %.1fs (%d write(s) waiting)",
+                               entry["method"], e, delay, self.unreplayed)
+                attempt += 1
+                with self._lock:
+                    self._lock.wait_for(lambda: self._stopping, delay)
+                continue
+
+            attempt = 0
+            with self._lock:
+                self.journal.confirm(entry)
+                if self._streak_seq is not None and entry["seq"] >= self._streak_seq:
+                    self._streak = self._streak_seq = None  # the backend has it now
+                self._lock.notify_all()
+
+    def _wait_replayed(self):
+        with self._lock:
+            if not self._lock.wait_for(lambda: not self.journal.pending, JOURNAL_READ_WAIT):
+                raise TimeoutError(f"{self.unreplayed} journaled write(s) still waiting to be replayed")
+
+    def load_streak(self):
+        with self._lock:
+            if self._streak is not None:
+                return normalize_streak(self._streak)
+        return self.backend.load_streak()
+
+    def save_streak(self, data):
+        self._write("save_streak", data)
+
+    def load_users(self):
+        self._wait_replayed()
+        return self.backend.load_users()
+
+    def save_users(self, records):
+        self._write("save_users", records)
+
+    def clear_users(self):
+        self._write("clear_users")
+
+    def archive_users(self, month):
+        self._write("archive_users", month)
+
+    def load_history(self):
+        self._wait_replayed()
+        return self.backend.load_history()
+
+    def save_history(self, month, records):
+        self._write("save_history", month, records)
+
+    def load_proofs(self, limit):
+        self._wait_replayed()
+        return self.backend.load_proofs(limit)
+
+    def save_proof(self, record):
+        self._write("save_proof", record)
+
+    def load_days(self):
+        self._wait_replayed()
+        return self.backend.load_days()
+
+    def save_days(self, days):
+        self._write("save_days", days)
+
+    def save_contributions(self, records, days):
+        self._write("save_contributions", records, days)
+
+    def restore(self, streak, users, history, days=None):
+        self._write("restore", streak, users, history, days)
+
+    def close(self, timeout=5.0):
+        """Give the replay up to timeout seconds to catch up, then stop it. Whatever is left is replayed on the next start."""
+        with self._lock:
+            self._lock.wait_for(lambda: not self.journal.pending, timeout)
+            self._stopping = True
+            self._lock.notify_all()
+        self._thread.join(timeout)
+        with self._lock:
+            self.journal.close()
+        self.backend.close()
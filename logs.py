@@ -0,0 +1,51 @@
+"""
+Logging setup.
+
+LOG_LEVEL picks how much is logged (DEBUG shows every reaction and save, INFO the notable events,
+WARNING only problems). LOG_FORMAT=json writes one JSON object per line for log collectors;
+the default is plain text.
+"""
+
+import json
+import logging
+import os
+import sys
+
+# attributes every LogRecord has; anything else was passed through extra= and is logged as a field
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, any extra= fields and the traceback."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S%z"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level=None, fmt=None):
+    """Send all logs (ours and discord.py's) to stderr at LOG_LEVEL in LOG_FORMAT."""
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    fmt = fmt or os.getenv("LOG_FORMAT", "text")
+
+    handler = logging.StreamHandler(sys.stderr)
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-8s %(name)s: %(message)s"))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    # discord.py's gateway chatter stays at INFO even when we debug the bot
+    logging.getLogger("discord").setLevel(max(logging.INFO, root.level))
@@ -1,474 +1,1327 @@
+import time
+STARTED_AT = time.monotonic()  # for the startup time measurement, see on_ready
+
+import asyncio
+import calendar
+import contextlib
+import functools
+import logging
 import os
-import re
-from datetime import date, datetime
+import random
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 import pytz  # for time zone handling
 
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from dotenv import load_dotenv
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 
-# load environment variables
+# load environment variables (before the modules below, which read their settings on import)
 load_dotenv()
+
+import metrics  # noqa: E402
+import proofs  # noqa: E402
+from backfill import Backfill  # noqa: E402
+from days import DayBitmap  # noqa: E402
+from guilds import GuildConfig, load_guild_configs  # noqa: E402
+from journal import JOURNAL_DIR, JournaledBackend, journal_path  # noqa: E402
+from logs import configure_logging  # noqa: E402
+from proofs import ProofIndex, format_hash  # noqa: E402
+from ranking import Leaderboard  # noqa: E402
+from scheduler import TIME_FORMAT, ReminderScheduler, format_reminder_times, parse_reminder_times  # noqa: E402
+from storage import SHEET_NAME, normalize_streak, open_backend  # noqa: E402
+from streak_calendar import StreakCalendar, plural  # noqa: E402
+from writer import SingleWriter  # noqa: E402
+
 BOT_PREFIXES = ["sk.", "Sk."]
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
-# specify the channel ID for reminders
+# specify the channel ID for reminders (default server, used when no GUILDS config is given)
 CHANNEL_ID = 1313197151739842596
-# specify local time zone
+# specify local time zone (default server)
 LOCAL_TIMEZONE = pytz.timezone("America/New_York")
+# users allowed to run admin commands (default server)
+ALLOWED_USERS = {722664432433627209}  # currently: Y
+
+# Prometheus metrics are served on this port when it's set (see sk.metrics for a summary in Discord)
+METRICS_PORT = os.getenv("METRICS_PORT")
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")  # local only unless told otherwise
+
+logger = logging.getLogger("streakkeeper")
+
+# discord bot setup (sharded, so one process can serve many servers)
+class StreakBot(commands.AutoShardedBot):
+    metrics_runner = None
+    loop_watcher = None
+
+    async def setup_hook(self):
+        # Heroku stops dynos with SIGTERM, so treat it like Ctrl+C and shut down cleanly
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(self.close()))
+        except NotImplementedError:
+            pass  # signal handlers aren't available on Windows
+
+        self.loop_watcher = asyncio.create_task(metrics.watch_event_loop())
+        proofs.start_pool()  # the hashing processes start while Discord connects
+        if METRICS_PORT:
+            self.metrics_runner = await metrics.start_http_server(METRICS_HOST, int(METRICS_PORT))
+            logger.info("[METRICS] Serving http://%s:%s/metrics", METRICS_HOST, METRICS_PORT)
+
+    async def close(self):
+        """Write any queued reaction contributions before disconnecting."""
+        for guild in guilds.values():
+            try:
+                await flush_contributions(guild)
+            except Exception as e:
+                logger.error("[FLUSH] Could not write queued contributions for guild %s: %r", guild.config.guild_id, e)
+            guild.writer.stop()
+            if isinstance(guild.backend, JournaledBackend):
+                # a last chance to replay the journal; anything left is replayed on the next start
+                await asyncio.to_thread(guild.backend.close)
+        if self.loop_watcher:
+            self.loop_watcher.cancel()
+        proofs.stop_pool()
+        if self.metrics_runner:
+            await self.metrics_runner.cleanup()
+        await super().close()
 
-# discord bot setup
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix=commands.when_mentioned_or(*BOT_PREFIXES), intents=intents)
+bot = StreakBot(command_prefix=commands.when_mentioned_or(*BOT_PREFIXES), intents=intents)
+
+
+###### STORAGE SETUP ##################
+
+# storage calls are blocking, so they run on a shared thread pool instead of the event loop
+STORAGE_MAX_WORKERS = int(os.getenv("STORAGE_MAX_WORKERS", "16"))
+# the most threads one server may use at once, so a server with slow storage can't starve the rest
+GUILD_STORAGE_SLOTS = int(os.getenv("GUILD_STORAGE_SLOTS", "2"))
+STORAGE_TIMEOUT = float(os.getenv("STORAGE_TIMEOUT", "15"))  # seconds, including time spent queued
+storage_executor = ThreadPoolExecutor(max_workers=STORAGE_MAX_WORKERS, thread_name_prefix="storage")
+
+def _storage_done(guild, future):
+    guild.storage_slots.release()  # only once the thread has really finished
+    metrics.QUEUE_DEPTH.dec(queue="storage_calls")
+    if not future.cancelled():
+        future.exception()  # mark it retrieved, even if the caller already gave up waiting
+
+async def _run_storage(guild, func):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + STORAGE_TIMEOUT
+    await asyncio.wait_for(guild.storage_slots.acquire(), STORAGE_TIMEOUT)
+    metrics.QUEUE_DEPTH.inc(queue="storage_calls")
+    future = loop.run_in_executor(storage_executor, func)
+    future.add_done_callback(functools.partial(_storage_done, guild))
+    return await asyncio.wait_for(asyncio.shield(future), max(deadline - loop.time(), 0))
+
+async def get_backend(guild):
+    """Return the server's storage backend, opening it on first use."""
+    if guild.backend is None:
+        async with guild.backend_lock:
+            if guild.backend is None:
+                config = guild.config
+                backend = await _run_storage(guild, functools.partial(
+                    open_backend, config.storage, sheet_name=config.sheet_name, sqlite_path=config.sqlite_path, sheet_key=config.sheet_key
+                ))
+                if JOURNAL_DIR:
+                    # writes are acknowledged once they're on local disk and replayed to storage in the background
+                    backend = await _run_storage(guild, functools.partial(JournaledBackend, backend, journal_path(config.guild_id)))
+                guild.backend = backend
+    return guild.backend
+
+async def storage_call(guild, method, *args):
+    """Run a blocking backend method for one server on the storage thread pool.
+
+    Raises asyncio.TimeoutError after STORAGE_TIMEOUT.
+    """
+    with metrics.STORAGE_LATENCY.time(method=method):
+        try:
+            backend = await get_backend(guild)
+            return await _run_storage(guild, functools.partial(getattr(backend, method), *args))
+        except Exception as e:
+            metrics.ERRORS.inc(source="storage", error=type(e).__name__)
+            raise
+
+
+###### GUILD STATE ##################
+
+# seconds a cached copy of the streak record is trusted before storage is read again (0 disables the cache)
+STREAK_CACHE_TTL = float(os.getenv("STREAK_CACHE_TTL", "300"))
+# seconds to collect ➕ reactions before writing them to storage in one batch
+REACTION_FLUSH_DELAY = float(os.getenv("REACTION_FLUSH_DELAY", "5"))
+# a reminder missed while the bot was down is still sent if it's at most this many minutes late
+REMINDER_CATCHUP_MINUTES = int(os.getenv("REMINDER_CATCHUP_MINUTES", "120"))
+# seconds a command waits for a server's storage to finish connecting before asking the user to retry
+READY_WAIT = float(os.getenv("READY_WAIT", "10"))
+
+class GuildState:
+    """Everything the bot keeps for one server: its storage, caches, locks, write queue and reminders.
+
+    Nothing here is shared between servers, so one server's traffic or slow storage never holds up another.
+    Every change to the streak record runs on the server's writer, one at a time, see SingleWriter. Logs and
+    ➕s only touch memory and are written in batches by one flush at a time, so they never wait on storage.
+    """
 
+    def __init__(self, config):
+        self.config = config
+        self.timezone = config.timezone
+        self.backend = None  # opened on first use, see get_backend
+        self.backend_lock = asyncio.Lock()
+        self.storage_slots = asyncio.Semaphore(GUILD_STORAGE_SLOTS)
+
+        # process-local copy of the streak record, kept in sync by save_streak_data
+        self.streak_cache = {"data": None, "loaded_at": 0.0}
+        self.streak_unsaved = False  # the cached record has a change storage doesn't have yet, see update_streak
+        self.streak_generation = 0  # bumped on every change cached by the writer, so a read that overlapped one is dropped
+
+        # in-memory index of user contributions keyed by User ID, loaded once and kept in sync by writes
+        self.user_index = {}
+        self.user_index_loaded = False
+        self.user_index_lock = asyncio.Lock()  # so concurrent first calls share a single read
+        self.ranking = Leaderboard()  # contributions ordered for sk.leaderboard and sk.stats, updated with the index
+        self.latest_log = ""  # the most recent Last Log in the index, which tells which month the contributions are from
+        # bumped whenever the index or history changes; rendered embeds are reused while it stays the same
+        self.data_version = 0
+        self.render_cache = {}  # key -> (data version, embed), see render_cached
+
+        # applies every streak record change (and archive, reload and rebuild) in order
+        self.writer = SingleWriter()
+        # User ID -> the days they contributed on (loaded by warm_up); a set bit is the idempotency key, see contribute
+        self.days = {}
+        self.dirty_days = set()  # User IDs whose bitmap changed since the last flush
+
+        # contributions waiting to be written, keyed by User ID: {"username", "contributions", "last_log"}
+        self.pending_contributions = {}
+        self.flushing = {}  # the batch being written right now, same shape
+        self.flush_task = None
+        # held by the flush writing a batch, so batches land one at a time and in order (see flush_contributions)
+        self.flush_lock = asyncio.Lock()
+        # cleared while storage is reloaded or rebuilt, so no log or ➕ lands halfway (see contributions_paused)
+        self.contributions_open = asyncio.Event()
+        self.contributions_open.set()
+
+        # log message ID -> date, for the (at most two) messages that take ➕ reactions; see track_log_messages
+        self.tracked_messages = {}
+        # (User ID, date) -> (their Last Log before the ➕ counted, username), so removing the reaction can undo it
+        self.reaction_contributions = {}
+
+        # hashes of the latest logged photos, to spot one being reused (loaded by warm_up)
+        self.proofs = ProofIndex()
+
+        # archived months, loaded on first use: "YYYY-MM" -> {"users": {User ID: record}, "ranking": Leaderboard}
+        self.history = None
+        self.history_lock = asyncio.Lock()
+        self.archived_totals = {}  # User ID -> {"username", "contributions"} summed over every archived month
+        self.all_time = None  # Leaderboard of archived + current contributions, built on first use and kept in sync by index_user
+
+        self.reminders = ReminderScheduler(
+            functools.partial(send_reminder, self), self.timezone, timedelta(minutes=REMINDER_CATCHUP_MINUTES)
+        )
+        # today's boundaries and the streak's milestones and expiry, kept in sync with the streak record by load/save_streak_data
+        self.calendar = StreakCalendar(self.timezone, functools.partial(warn_streak_expiry, self))
 
-###### GOOGLE SHEETS SETUP ##################
+        # set once storage is connected and the streak record and index are loaded, see warm_up
+        self.ready = asyncio.Event()
+        self.warm_up_task = None
 
-# set up Google Sheets API credentials
-SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-SHEET_NAME = "UMD Womxn's Club Ultimate Throwing Streak"
+    def today(self):
+        """Today's date in this server's time zone."""
+        return self.calendar.day().date
 
-# load Google credentials from environment variable
-import json
-google_credentials = os.getenv("GOOGLE_CREDENTIALS")
-if not google_credentials:
-    raise ValueError("Google credentials not set in environment variables.")
+# the default server, matching the constants above; its guild ID is looked up from the channel on startup
+DEFAULT_GUILD = GuildConfig(None, CHANNEL_ID, LOCAL_TIMEZONE.zone, ALLOWED_USERS, sheet_name=SHEET_NAME, sheet_key=os.getenv("SHEET_KEY"))
 
-# parse the credentials and authenticate
-creds_dict = json.loads(google_credentials)
-creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, SCOPE)
-client = gspread.authorize(creds)
+# guild ID -> GuildState, for every configured server
+guilds = {}
 
-# open the google sheet by its name
-spreadsheet = client.open(SHEET_NAME)
+def register_guild(config):
+    """Create the state for a configured server (once) and return it."""
+    if config.guild_id not in guilds:
+        guilds[config.guild_id] = GuildState(config)
+    return guilds[config.guild_id]
 
-# access specific worksheets
-sheet1 = spreadsheet.worksheet("Sheet1")  # streak summary
-sheet2 = spreadsheet.worksheet("Sheet2")  # user contributions
+def guild_for(ctx):
+    """The state of the server a command was sent in."""
+    return guilds[ctx.guild.id]
 
+def queue_depths():
+    """Work waiting right now, for the queue depth gauge: queued reactions, changes, journaled writes and background Sheets mirror writes."""
+    states = list(guilds.values())
+    return {
+        ("pending_contributions",): sum(len(guild.pending_contributions) for guild in states),
+        ("writer",): sum(guild.writer.pending for guild in states),
+        ("journal_writes",): sum(getattr(guild.backend, "unreplayed", 0) for guild in states),
+        ("mirror_writes",): sum(getattr(guild.backend, "pending", 0) for guild in states)
+    }
 
-###### GOOGLE SHEETS HELPER FUNCTIONS ##################
+metrics.QUEUE_DEPTH.collect = queue_depths
+
+@bot.check
+async def guild_is_configured(ctx):
+    """Commands only run in servers that have been set up."""
+    if ctx.guild is not None and ctx.guild.id in guilds:
+        return True
+    await ctx.send("StreakKeeper isn't set up for this server yet. Ask the bot owner to add it to the GUILDS config!")
+    return False
+
+class StorageNotReady(commands.CheckFailure):
+    pass
+
+@bot.check
+async def storage_is_ready(ctx):
+    """Hold commands until the server's storage has connected, for up to READY_WAIT seconds."""
+    guild = guild_for(ctx)
+    if guild.ready.is_set():
+        return True
+    try:
+        await asyncio.wait_for(guild.ready.wait(), READY_WAIT)
+        return True
+    except asyncio.TimeoutError:
+        await ctx.send("⏳ StreakKeeper is still connecting to storage. Please try again in a moment!")
+        raise StorageNotReady()
+
+
+###### STORAGE HELPER FUNCTIONS ##################
+
+"""Remember to set Reminder Time in the streak record to a value (HH:MM format) first!"""
+
+async def load_streak_data(guild, force_refresh=False):
+    """Load streak data, served from the in-memory cache unless it is stale or force_refresh is set."""
+    cache = guild.streak_cache
+    fresh = time.monotonic() - cache["loaded_at"] < STREAK_CACHE_TTL or guild.streak_unsaved  # storage is behind the cache until it's saved
+    if not force_refresh and cache["data"] is not None and fresh:
+        return dict(cache["data"])  # copy so callers can modify it freely
+
+    # reads can run beside the writer: if it cached a change while this one was out (or has one
+    # still unsaved), what storage returned is older than the cache, so the cache is kept
+    generation = guild.streak_generation
+    data = await storage_call(guild, "load_streak")
+    if guild.streak_generation != generation or guild.streak_unsaved:
+        return dict(cache["data"])
+    cache["data"] = data
+    cache["loaded_at"] = time.monotonic()
+    track_log_messages(guild, cache["data"])
+    guild.calendar.update(cache["data"])
+    # a Reminder Time edited by hand takes effect with the next read (TTL expiry or sk.refresh)
+    times = parse_reminder_times(data["reminder_time"])
+    if guild.ready.is_set() and times != guild.reminders.times:
+        logger.info("[REMINDER] Reminder time for guild %s changed in storage, now %s", guild.config.guild_id, format_reminder_times(times))
+        guild.reminders.reschedule(times)
+    return dict(cache["data"])
+
+async def update_streak(guild, change, save=True):
+    """Apply change(streak_data) on the writer, saving the record if it changed. Returns (change's result, the data after).
+
+    With save=False the change is only cached, and goes to storage with the next update_streak that saves
+    (e.g. sk.log extends the streak, then saves it once together with its message ID).
+    """
+    return await guild.writer.submit(_update_streak, guild, change, save)
+
+async def _update_streak(guild, change, save):
+    data = await load_streak_data(guild)
+    before = dict(data)
+    result = change(data)
+    if not save:
+        if data != before:
+            cache_streak_data(guild, data)
+            guild.streak_unsaved = True
+    elif data != before or guild.streak_unsaved:
+        await save_streak_data(guild, data)
+    return result, data
+
+async def save_streak_data(guild, data):
+    """Save streak data and write it through to the cache (runs on the writer, see update_streak)."""
+    logger.debug("[SAVE_STREAK] Saving streak for guild %s - Count: %s, Last: %s", guild.config.guild_id, data["streak_count"], data["last_logged_date"])
+    await storage_call(guild, "save_streak", dict(data))
+    cache_streak_data(guild, data)
+    guild.streak_unsaved = False
+    logger.debug("[SAVE_STREAK] Streak update completed")
+
+def cache_streak_data(guild, data):
+    # cache exactly what a fresh read of the record would return
+    guild.streak_cache["data"] = normalize_streak(data)
+    guild.streak_cache["loaded_at"] = time.monotonic()
+    guild.streak_generation += 1
+    track_log_messages(guild, guild.streak_cache["data"])
+    guild.calendar.update(guild.streak_cache["data"])
+
+def track_log_messages(guild, data):
+    """Remember today's and yesterday's log messages from the streak record, so reactions are matched without I/O."""
+    tracked = {}
+    for id_field, date_field in (("log_message_id_today", "log_message_date_today"), ("log_message_id_yesterday", "log_message_date_yesterday")):
+        message_id = str(data.get(id_field) or "")
+        message_date = data.get(date_field)
+        if message_id.isdigit() and message_date and message_date != "N/A":
+            tracked[int(message_id)] = message_date
+    guild.tracked_messages = tracked
+
+    # a reaction on a message that's no longer tracked can't be taken back, so stop remembering it
+    dates = set(tracked.values())
+    guild.reaction_contributions = {key: undo for key, undo in guild.reaction_contributions.items() if key[1] in dates}
+
+async def load_user_index(guild, force_refresh=False):
+    """Build the User ID index from storage on first use (or when forced) and return it."""
+    if guild.user_index_loaded and not force_refresh:
+        return guild.user_index
+
+    async with guild.user_index_lock:
+        if guild.user_index_loaded and not force_refresh:
+            return guild.user_index  # another caller finished loading while we waited
+        records = await storage_call(guild, "load_users")
+        guild.user_index.clear()
+        guild.ranking.clear()
+        guild.latest_log = ""
+        guild.data_version += 1
+        for record in records:
+            index_user(guild, record)
+        for user_id in set(guild.pending_contributions) - set(guild.user_index):
+            rank_user(guild, user_id)  # queued before the reload, and not written yet
+        guild.user_index_loaded = True
+    return guild.user_index
+
+def index_user(guild, record):
+    """Put a user's latest stored record in the index and move them to their new place in the rankings."""
+    guild.user_index[record["user_id"]] = record
+    if record["last_log"] > guild.latest_log and record["last_log"][:4].isdigit():
+        guild.latest_log = record["last_log"]
+    rank_user(guild, record["user_id"])
+
+def current_record(guild, user_id):
+    """A user's record as shown to users: the stored one plus the contributions still queued or being written (None if they have neither)."""
+    record = guild.user_index.get(user_id)
+    contributions = record["contributions"] if record else 0
+    for batch in (guild.flushing, guild.pending_contributions):
+        pending = batch.get(user_id)
+        if pending:
+            contributions += pending["contributions"]
+            record = pending
+    if record is None:
+        return None
+    return {"user_id": user_id, "username": record["username"], "contributions": contributions, "last_log": record["last_log"]}
+
+def rank_user(guild, user_id):
+    """Move a user to their current place in the ranking (and the all-time ranking), queued contributions included."""
+    guild.data_version += 1
+    record = current_record(guild, user_id)
+    if record and record["contributions"] > 0:
+        guild.ranking.update(user_id, record["username"], record["contributions"])
+    else:
+        guild.ranking.remove(user_id)  # e.g. their only contribution was a ➕ they took back
+    if guild.all_time is not None:
+        _update_all_time(guild, user_id)
+
+async def load_user_data(guild):
+    """Load all user contributions (from the index, reading storage only the first time)."""
+    return list((await load_user_index(guild)).values())
+
+async def clear_user_data(guild, month=None):
+    """Archive the leaderboard as month's history ("YYYY-MM", by default the month it's from), then reset it in storage and empty the index."""
+    await guild.writer.submit(_clear_user_data, guild, month)
+
+async def _clear_user_data(guild, month):
+    async with guild.flush_lock:
+        await _flush_contributions(guild)  # queued reactions still count towards the outgoing leaderboard
+        await _archive_user_data(guild, month)
+
+async def _archive_user_data(guild, month):
+    # the caller holds flush_lock, so no batch can land between the flush and the reset
+    users = await load_user_index(guild)
+    month = month or contributions_month(guild)
+    await storage_call(guild, "archive_users", month)
+    if guild.history is not None:
+        add_history(guild, month, list(users.values()))
+    guild.user_index.clear()
+    guild.ranking.clear()
+    guild.latest_log = ""
+    guild.data_version += 1
+    guild.user_index_loaded = True
+    for user_id in guild.pending_contributions:
+        rank_user(guild, user_id)  # ➕s queued since the flush go on the new leaderboard
+    # all-time totals don't change: this month's contributions just moved into the archive
+
+async def roll_over_month(guild):
+    """Archive the contributions if they're from an earlier month than today.
+
+    Returns the archived month and its leaderboard embed (None if nobody contributed), or None if nothing was archived.
+    """
+    return await guild.writer.submit(_roll_over_month, guild)
+
+async def _roll_over_month(guild):
+    async with guild.flush_lock:
+        await _flush_contributions(guild)
+        await load_user_index(guild)
+        month = contributions_month(guild)
+        if month >= guild.today().strftime("%Y-%m"):
+            return None  # still this month's (or another log already rolled it over)
+        # rendered from the ranking before it's reset, so showing it doesn't wait on the archive being read back
+        title = f"Top 10 Contributors in {datetime.strptime(month, '%Y-%m').strftime('%B %Y')}"
+        embed = leaderboard_embed(title, guild.ranking, lambda user_id: current_record(guild, user_id)["username"])
+        await _archive_user_data(guild, month)
+    return month, embed
+
+def contributions_month(guild):
+    """The month ("YYYY-MM") the current contributions belong to: that of the latest Last Log, or this month."""
+    try:
+        return date.fromisoformat(guild.latest_log).strftime("%Y-%m")
+    except ValueError:
+        return guild.today().strftime("%Y-%m")
+
+###### HISTORY ##################
+
+async def load_history(guild):
+    """Load every archived month on first use (a single storage read) and return {"YYYY-MM": {"users", "ranking"}}."""
+    if guild.history is None:
+        async with guild.history_lock:
+            if guild.history is None:
+                months = await storage_call(guild, "load_history")
+                guild.history = {}
+                guild.archived_totals = {}
+                for month, records in sorted(months.items()):
+                    add_history(guild, month, records)
+    return guild.history
+
+def add_history(guild, month, records):
+    """Fold an archived month's records into the history, its ranking and the archived totals."""
+    guild.data_version += 1
+    entry = guild.history.setdefault(month, {"users": {}, "ranking": Leaderboard()})
+    for record in records:
+        user_id = record["user_id"]
+        user = entry["users"].get(user_id)
+        contributions = record["contributions"] + (user["contributions"] if user else 0)
+        entry["users"][user_id] = dict(record, contributions=contributions)
+        if contributions > 0:
+            entry["ranking"].update(user_id, record["username"], contributions)
+
+        total = guild.archived_totals.setdefault(user_id, {"username": record["username"], "contributions": 0})
+        total["contributions"] += record["contributions"]
+        total["username"] = record["username"]  # months are added oldest first, so this ends as the latest name
+
+async def load_all_time(guild):
+    """Return the all-time ranking (every archived month plus this one), building it on first use."""
+    if guild.all_time is None:
+        await load_history(guild)
+        users = await load_user_index(guild)
+        guild.all_time = Leaderboard()
+        for user_id in set(guild.archived_totals) | set(users) | set(guild.pending_contributions):
+            _update_all_time(guild, user_id)
+    return guild.all_time
+
+def _update_all_time(guild, user_id):
+    archived = guild.archived_totals.get(user_id)
+    current = current_record(guild, user_id)
+    total = (archived["contributions"] if archived else 0) + (current["contributions"] if current else 0)
+    if total > 0:
+        guild.all_time.update(user_id, current["username"] if current else archived["username"], total)
+    else:
+        guild.all_time.remove(user_id)
 
-"""Remember to set Reminder Time in the google sheet to a value (HH:MM format) first!"""
+def all_time_username(guild, user_id):
+    current = current_record(guild, user_id)
+    return current["username"] if current else guild.archived_totals[user_id]["username"]
 
-def load_streak_data():
-    """Load streak data from Sheet1, handling empty values."""
-    data = sheet1.row_values(2) # load row 2
 
-    # treat message IDs as strings
-    log_message_id_today = data[4] if len(data) > 4 and data[4] else None
-    log_message_id_today = str(log_message_id_today) if log_message_id_today else None
-    
-    log_message_id_yesterday = data[6] if len(data) > 6 and data[6] else None
-    log_message_id_yesterday = str(log_message_id_yesterday) if log_message_id_yesterday else None
+async def load_day_bitmaps(guild):
+    """Load every user's day bitmap from storage (replacing the ones in memory)."""
+    guild.days = {user_id: DayBitmap.from_hex(value) for user_id, value in (await storage_call(guild, "load_days")).items()}
+    guild.dirty_days.clear()
 
-    # safeguard for empty cells
-    return {
-        "streak_count": int(data[0]) if data[0].isdigit() else 0,
-        "start_date": data[1] if len(data) > 1 and data[1] else "N/A",
-        "last_logged_date": data[2] if len(data) > 2 and data[2] else "N/A",
-        "reminder_time": data[3] if len(data) > 3 and data[3] else "N/A",
-        "log_message_id_today": log_message_id_today,
-        "log_message_date_today": data[5] if len(data) > 5 and data[5] else "N/A",
-        "log_message_id_yesterday": log_message_id_yesterday,
-        "log_message_date_yesterday": data[7] if len(data) > 7 and data[7] else "N/A",
-        "longest_streak": int(data[8]) if len(data) > 8 and data[8].isdigit() else 0,
-        "longest_streak_end_date": data[9] if len(data) > 9 and data[9] else "N/A"
-    }
+async def check_user_log_on_date(guild, user_id, date_str):
+    """Check if a user has already logged on a specific date (including contributions still queued)."""
+    await load_user_index(guild)
+    return logged_on(guild, str(user_id).strip(), date_str)
 
-def save_streak_data(data):
-    """Save streak data to Sheet1."""
-    print(f"[SAVE_STREAK] Saving to Sheet1 - Count: {data['streak_count']}, Last: {data['last_logged_date']}")
-    sheet1.update([[
-        data["streak_count"],
-        data["start_date"],
-        data["last_logged_date"],
-        data["reminder_time"],
-        str(data["log_message_id_today"]) if data.get("log_message_id_today") else "",
-        data.get("log_message_date_today", ""),
-        str(data["log_message_id_yesterday"]) if data.get("log_message_id_yesterday") else "",
-        data.get("log_message_date_yesterday", ""),
-        data["longest_streak"],
-        data["longest_streak_end_date"]
-    ]], 'A2:J2')
-    print(f"[SAVE_STREAK] Sheet1 update completed")
-
-def load_user_data():
-    """Load all user contributions from Sheet2."""
-    return sheet2.get_all_records()
-
-def save_user_data(user_id, username, contributions, last_log):
-    """Save or update a user's contribution data. If user already exists, update their row. Else, append a new row."""
-    users = load_user_data()
-    print(f"[SAVE_USER] Attempting to save: {username} (ID: {user_id}), +{contributions}, date: {last_log}")
-
-    # check if the user already exists
-    for i, user in enumerate(users, start=2):  # row 2 onwards (after headers)
-        if str(user["User ID"]).strip() == str(user_id).strip():
-            # update existing user data
-            old_contributions = int(user["Contributions"])
-            new_contributions = old_contributions + contributions
-            print(f"[SAVE_USER] Found user at row {i}, updating: {old_contributions} -> {new_contributions}")
-            sheet2.update([[username, new_contributions, last_log]], f"B{i}:D{i}")
-            print(f"[SAVE_USER] Update completed for {username}")
-            return
+def logged_on(guild, user_id, date_str):
+    """check_user_log_on_date, once the index is loaded: in memory only."""
+    days = guild.days.get(user_id)
+    if days is not None and date_str in days:
+        return True
+    # users whose history predates the bitmaps only have their Last Log
+    user = guild.pending_contributions.get(user_id) or guild.flushing.get(user_id) or guild.user_index.get(user_id)
+    return bool(user) and user["last_log"] == date_str
 
-    # if user doesn't exist, append a new row
-    print(f"[SAVE_USER] User not found, appending new row for {username}")
-    sheet2.append_row([user_id, username, contributions, last_log])
-    print(f"[SAVE_USER] Append completed for {username}")
 
-def check_user_log_today(user_id):
-    """Check if a user has already logged today."""
-    today = str(datetime.now(LOCAL_TIMEZONE).date())
-    return check_user_log_on_date(user_id, today)
+###### REACTION WRITE-BEHIND ##################
 
-def check_user_log_on_date(user_id, date_str):
-    """Check if a user has already logged on a specific date."""
-    users = load_user_data()  # load all user records
+def queue_contribution(guild, user_id, username, last_log, delta=1):
+    """Queue a contribution (or with delta=-1, taking one back) to be written with the next batch instead of hitting storage right away."""
+    user_id = str(user_id).strip()
+    pending = guild.pending_contributions.setdefault(user_id, {"contributions": 0})
+    pending.update(username=username, contributions=pending["contributions"] + delta, last_log=last_log)
 
-    # loop through each user in the data
-    for user in users:
-        recorded_user_id = str(user["User ID"]).strip()
-        last_log = str(user["Last Log"]).strip()
+    stored = guild.user_index.get(user_id)
+    if pending["contributions"] == 0 and pending["last_log"] == (stored["last_log"] if stored else ""):
+        del guild.pending_contributions[user_id]  # added and taken back before the flush: nothing to write
+        rank_user(guild, user_id)
+        return
+    rank_user(guild, user_id)  # the leaderboard shows it right away; storage catches up with the flush
+
+    # the first reaction of a burst schedules the flush; the rest just join the batch
+    if guild.flush_task is None:
+        guild.flush_task = asyncio.create_task(_delayed_flush(guild))
 
-        if recorded_user_id == str(user_id).strip() and last_log == date_str:
-            return True  # user already contributed on this date
+async def contribute(guild, user_id, username, date_str, reaction=False):
+    """Queue one contribution for date_str unless the user already has one for that date. Returns whether it counted.
 
-    return False  # user has not contributed on this date
+    (User ID, date) is the idempotency key: however close together the logs and ➕s arrive, each counts once.
+    The check and the change happen without awaiting anything in between, so no other log or ➕ can slip
+    between them, and nothing waits on storage.
+    """
+    await load_user_index(guild)
+    await guild.contributions_open.wait()
+    return _contribute(guild, str(user_id).strip(), username, date_str, reaction)
+
+def _contribute(guild, user_id, username, date_str, reaction):
+    if logged_on(guild, user_id, date_str):
+        return False
+    current = guild.pending_contributions.get(user_id) or guild.flushing.get(user_id) or guild.user_index.get(user_id)
+    previous_log = current["last_log"] if current else ""
+    guild.days.setdefault(user_id, DayBitmap()).add(date_str)
+    guild.dirty_days.add(user_id)
+    if reaction:
+        guild.reaction_contributions[(user_id, date_str)] = (previous_log, username)  # enough to undo it
+    # a ➕ on yesterday's message doesn't move Last Log back from today
+    last_log = max(date_str, previous_log) if previous_log[:4].isdigit() else date_str
+    queue_contribution(guild, user_id, username, last_log)
+    return True
+
+async def undo_reaction_contribution(guild, user_id, date_str):
+    """Take back the contribution a ➕ reaction earned for date_str. Returns False if that reaction didn't earn one."""
+    await guild.contributions_open.wait()
+    return _undo_reaction_contribution(guild, user_id, date_str)
+
+def _undo_reaction_contribution(guild, user_id, date_str):
+    undo = guild.reaction_contributions.pop((user_id, date_str), None)
+    if undo is None:
+        return False  # e.g. they had already logged that day, so the reaction didn't count
+    guild.days[user_id].remove(date_str)
+    guild.dirty_days.add(user_id)
+    previous_log, username = undo
+    current = guild.pending_contributions.get(user_id) or guild.flushing.get(user_id) or guild.user_index.get(user_id) or {"last_log": date_str, "username": username}
+    # only roll Last Log back if nothing newer has been logged since
+    last_log = previous_log if current["last_log"] == date_str else current["last_log"]
+    queue_contribution(guild, user_id, current["username"], last_log, delta=-1)
+    return True
+
+async def _delayed_flush(guild):
+    await asyncio.sleep(REACTION_FLUSH_DELAY)
+    guild.flush_task = None
+    try:
+        await flush_contributions(guild)
+    except Exception as e:
+        logger.warning("[FLUSH] Batch write failed, will retry: %r", e)
+        metrics.RETRIES.inc(operation="flush")
+        if guild.pending_contributions and guild.flush_task is None:
+            guild.flush_task = asyncio.create_task(_delayed_flush(guild))
+
+def _requeue_contributions(guild, batch):
+    """Put a failed batch back in the queue, ahead of anything queued since, and schedule a flush to retry it."""
+    for user_id, pending in batch.items():
+        newer = guild.pending_contributions.get(user_id)
+        if newer:
+            pending.update(username=newer["username"], contributions=pending["contributions"] + newer["contributions"], last_log=newer["last_log"])
+        guild.pending_contributions[user_id] = pending
+    if guild.flush_task is None:
+        guild.flush_task = asyncio.create_task(_delayed_flush(guild))
+
+async def flush_contributions(guild):
+    """Write all queued contributions to storage in a single batch (one batch_update and one append on Sheets).
+
+    Flushes run one at a time, but apart from the writer: the batch is taken out of the queue in one go,
+    so logs and ➕s keep queueing the next batch while this one is being written. A batch another flush
+    is writing is waited for too, so everything queued before the call is in storage when it returns.
+    """
+    if guild.pending_contributions or guild.dirty_days or guild.flush_lock.locked():
+        async with guild.flush_lock:
+            await _flush_contributions(guild)
+
+@metrics.timed(metrics.EVENT_LATENCY, event="flush")
+async def _flush_contributions(guild):
+    # the caller holds flush_lock
+    if not guild.pending_contributions and not guild.dirty_days:
+        return  # an earlier flush already wrote them
+
+    users = await load_user_index(guild)
+    batch = dict(guild.pending_contributions)
+    guild.pending_contributions.clear()
+    guild.flushing = batch  # still counted by logged_on and the undo of a ➕ until the index has it
+    logger.info("[FLUSH] Writing %d queued contribution(s) for guild %s", len(batch), guild.config.guild_id)
+
+    records = []
+    for user_id, pending in batch.items():
+        old_contributions = users[user_id]["contributions"] if user_id in users else 0
+        records.append({"user_id": user_id, "username": pending["username"], "contributions": old_contributions + pending["contributions"], "last_log": pending["last_log"]})
+    changed_days = guild.dirty_days
+    guild.dirty_days = set()
+
+    try:
+        # both tables in one request (one transaction on SQLite); if it fails, both are retried
+        await storage_call(guild, "save_contributions", records, {user_id: guild.days[user_id].to_hex() for user_id in changed_days})
+    except Exception:
+        guild.flushing = {}
+        _requeue_contributions(guild, batch)
+        guild.dirty_days |= changed_days
+        raise
+
+    # the write landed, so bring the index up to date
+    guild.flushing = {}
+    for record in records:
+        index_user(guild, record)
+    logger.debug("[FLUSH] Batch write completed")
 
 
 ###### SEND REMINDER ##################
 
-@tasks.loop(minutes=1)  # check every minute
-async def check_reminder(): 
-    """Background task to check and send reminders."""
-    streak_data = load_streak_data()
-    reminder_time = streak_data.get("reminder_time", "N/A")
+@metrics.timed(metrics.EVENT_LATENCY, event="reminder")
+async def send_reminder(guild, scheduled_time):
+    """Send the reminder scheduled for scheduled_time, unless someone has already logged today."""
+    streak_data = await load_streak_data(guild)
+    today = str(guild.today())
+    last_logged_date = streak_data.get("last_logged_date", "N/A")
+
+    # check if no contributions have been made today
+    if last_logged_date != today:
+        channel = bot.get_channel(guild.config.channel_id)
+        if channel:
+            await channel.send(
+                "🌟 **Reminder:** Don't forget to log a contribution today!"
+            )
+            # remember it went out so a restart doesn't send it again as a catch-up
+            await update_streak(guild, lambda data: data.update(last_reminder_sent=scheduled_time.isoformat()))
+
+async def start_reminders(guild):
+    """Load the reminder times and last sent reminder, then start the server's scheduler."""
+    streak_data = await load_streak_data(guild)
+    try:
+        last_sent = datetime.fromisoformat(streak_data["last_reminder_sent"])
+    except ValueError:
+        last_sent = None  # never sent (or "N/A")
+    guild.reminders.start(parse_reminder_times(streak_data["reminder_time"]), last_sent)
+    logger.info("[REMINDER] Next reminder for guild %s: %s", guild.config.guild_id, guild.reminders.next_run())
+    guild.calendar.start_warnings()
+
+@metrics.timed(metrics.EVENT_LATENCY, event="streak_warning")
+async def warn_streak_expiry(guild, expires_at):
+    """Warn that the streak breaks at expires_at, unless someone has logged since (see StreakCalendar)."""
+    streak_data = await load_streak_data(guild)
+    if guild.calendar.day().status(streak_data["last_logged_date"]) != "due":
+        return
+    channel = bot.get_channel(guild.config.channel_id)
+    if channel:
+        hours = guild.calendar.hours_left()
+        await channel.send(
+            f"⏳ **Heads up:** the {streak_data['streak_count']} day streak breaks in {plural(hours, 'hour')}! Log with `sk.log` to keep it going."
+        )
 
-    if reminder_time == "N/A":
-        return  # no reminder time set
-    
-    # get current local time in HH:MM format
-    now = datetime.now(LOCAL_TIMEZONE).strftime("%H:%M")
 
-    # if the current time matches the reminder time
-    if now == reminder_time:
-        today = str(datetime.now(LOCAL_TIMEZONE).date())
-        last_logged_date = streak_data.get("last_logged_date", "N/A")
+###### STARTUP ##################
 
-        # check if no contributions have been made today
-        if last_logged_date != today:
-            channel = bot.get_channel(CHANNEL_ID)
-            if channel:
-                await channel.send(
-                    "🌟 **Reminder:** Don't forget to log a contribution today!"
-                )
+# how long (seconds from process start) connecting to Discord should take; slower starts are logged as warnings
+STARTUP_TARGET = float(os.getenv("STARTUP_TARGET", "10"))
+WARM_UP_MAX_DELAY = 300  # seconds between connection attempts while storage is down
+
+STARTUP_TIME = metrics.Gauge("streakkeeper_startup_seconds", "Seconds from process start until each startup phase finished.", ["phase"])
+
+def record_startup(phase):
+    elapsed = time.monotonic() - STARTED_AT
+    STARTUP_TIME.set(round(elapsed, 3), phase=phase)
+    return elapsed
+
+async def warm_up(guild):
+    """Connect a server's storage in the background, load its data and start its reminders.
+
+    Keeps retrying with backoff while storage is unreachable, so a Google outage at boot delays
+    this server's commands instead of crashing the bot.
+    """
+    attempt = 0
+    while True:
+        try:
+            await load_streak_data(guild, force_refresh=True)
+            await load_user_index(guild, force_refresh=True)
+            await load_day_bitmaps(guild)
+            if proofs.PROOF_CHECK != "off":
+                for record in await storage_call(guild, "load_proofs", proofs.PROOF_INDEX_SIZE):
+                    guild.proofs.add(record)
+            break
+        except Exception as e:
+            delay = random.uniform(0.5, 1) * min(WARM_UP_MAX_DELAY, 5 * 2 ** attempt)
+            logger.warning("[STARTUP] Storage for guild %s isn't reachable (%r), retrying in %.0fs", guild.config.guild_id, e, delay)
+            metrics.RETRIES.inc(operation="warm_up")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    guild.ready.set()
+    if all(state.ready.is_set() for state in guilds.values()):
+        logger.info("[STARTUP] Storage ready for every server after %.2fs", record_startup("storage_ready"))
+    try:
+        await start_reminders(guild)
+    except Exception as e:
+        logger.error("[REMINDER] Could not start reminders for guild %s: %r", guild.config.guild_id, e)
 
 
 ###### BOT EVENT ##################
 
 @bot.event
 async def on_ready():
-    print("StreakKeeper is ready!")
-    #channel validation and reminder check start
-    channel = bot.get_channel(CHANNEL_ID)
-    if channel is None:
-        print(f"Error: Channel ID {CHANNEL_ID} not found or bot lacks access.")
-    else:
-        if not check_reminder.is_running():
-            check_reminder.start()
+    elapsed = record_startup("discord_ready")
+    logger.info("StreakKeeper is ready! (%d shard(s), %d server(s), %.2fs after start)", bot.shard_count or 1, len(bot.guilds), elapsed)
+    if elapsed > STARTUP_TARGET:
+        logger.warning("[STARTUP] Took %.2fs to connect to Discord, over the %.0fs target", elapsed, STARTUP_TARGET)
+
+    for config in load_guild_configs(DEFAULT_GUILD):
+        #channel validation and storage warm-up
+        channel = bot.get_channel(config.channel_id)
+        if channel is None:
+            logger.error("Channel ID %s not found or bot lacks access.", config.channel_id)
+            continue
+        if config.guild_id is None:
+            config.guild_id = channel.guild.id  # the default server, found through its channel
+        guild = register_guild(config)
+        # storage connects in the background; on_ready also runs again after reconnects, so only once
+        if guild.warm_up_task is None:
+            guild.warm_up_task = asyncio.create_task(warm_up(guild))
+
+
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.started_at = time.perf_counter()
+
+@bot.after_invoke
+async def record_command_latency(ctx):
+    """Runs after every command that passed its checks, whether it succeeded or raised."""
+    metrics.COMMAND_LATENCY.observe(
+        time.perf_counter() - ctx.started_at,
+        command=ctx.command.qualified_name, status="error" if ctx.command_failed else "ok"
+    )
+
+@bot.event
+async def on_command_error(ctx, error):
+    """Tell the user when storage is too slow instead of failing silently."""
+    if isinstance(error, commands.CheckFailure) and not (ctx.guild and ctx.guild.id in guilds):
+        return  # guild_is_configured already replied
+    if isinstance(error, StorageNotReady):
+        return  # storage_is_ready already replied
+    original = getattr(error, "original", error)
+    metrics.ERRORS.inc(source=f"command:{ctx.command.qualified_name if ctx.command else 'unknown'}", error=type(original).__name__)
+    if isinstance(error, commands.CommandInvokeError) and isinstance(error.original, asyncio.TimeoutError):
+        logger.warning("[ERROR] Storage request timed out during %s", ctx.command)
+        await ctx.send("⏳ Storage is taking too long to respond. Please try again in a moment!")
+        return
+    await commands.Bot.on_command_error(bot, ctx, error)  # fall back to the default handler
 
 
 ###### REACTION TRACKING ##################
 
+async def tracked_message_date(guild_id, message_id):
+    """The date a ➕ on this message counts for, or None if it isn't one of the server's tracked log messages."""
+    guild = guilds.get(guild_id)
+    if guild is None:
+        return None, None
+    await guild.ready.wait()  # hold early reactions until storage is up rather than dropping them
+    return guild, guild.tracked_messages.get(message_id)
+
 @bot.event
-async def on_reaction_add(reaction, user):
+@metrics.timed(metrics.EVENT_LATENCY, event="reaction_add")
+async def on_raw_reaction_add(payload):
     """
     Track reactions on the streak log message.
     Users can react with ➕ to gain a contribution for the message's date.
+    Raw events fire even for messages that aren't in discord.py's cache (e.g. posted before a restart).
     """
-    # step 1: ignore bot reactions
-    if user.bot:
+    # step 1: verify emoji and ignore bot reactions (and DMs, which have no member)
+    user = payload.member
+    if str(payload.emoji) != "➕" or user is None or user.bot:
         return
 
-    # step 2: verify emoji
-    if reaction.emoji != "➕":
-        return
+    # step 2: check if reacting to today's or yesterday's log message (in memory, so other reactions cost no I/O)
+    guild, message_date = await tracked_message_date(payload.guild_id, payload.message_id)
+    if not message_date:
+        return # not a tracked log message
+    logger.debug("[REACTION] User: %s (ID: %s) reacted to the log message for %s", user.display_name, user.id, message_date)
 
-    # step 3: check if reacting to today's or yesterday's log message
-    streak_data = load_streak_data()
-    reaction_message_id = str(reaction.message.id)
-    message_date = None
-    
-    print(f"[REACTION] User: {user.display_name} (ID: {user.id}), Msg ID: {reaction_message_id}")
-    print(f"[REACTION] Sheet - Today: {streak_data.get('log_message_id_today')}, Yesterday: {streak_data.get('log_message_id_yesterday')}")
-    
-    if streak_data.get("log_message_id_today") and reaction_message_id == streak_data["log_message_id_today"]:
-        message_date = streak_data.get("log_message_date_today")
-        print(f"[REACTION] Matched TODAY's message, date: {message_date}")
-    elif streak_data.get("log_message_id_yesterday") and reaction_message_id == streak_data["log_message_id_yesterday"]:
-        message_date = streak_data.get("log_message_date_yesterday")
-        print(f"[REACTION] Matched YESTERDAY's message, date: {message_date}")
+    # step 3: queue the contribution for the message's date (written to storage in the next batch),
+    # unless the user has already contributed on that date
+    if await contribute(guild, user.id, user.display_name, message_date, reaction=True):
+        logger.debug("[REACTION] Queued contribution for %s on %s", user.display_name, message_date)
     else:
-        print(f"[REACTION] NO MATCH - message not tracked")
-    
-    if not message_date or message_date == "N/A":
-        print(f"[REACTION] Invalid date ({message_date}), exiting")
-        return # not a valid log message or no date stored
+        logger.debug("[REACTION] User already logged on %s, skipping", message_date)
 
-    # step 4: check if the user has already contributed on that date
-    user_id = str(user.id)
-    if check_user_log_on_date(user_id, message_date):
-        print(f"[REACTION] User already logged on {message_date}, skipping")
-        return # user already contributed on this date
+@bot.event
+@metrics.timed(metrics.EVENT_LATENCY, event="reaction_remove")
+async def on_raw_reaction_remove(payload):
+    """Removing a ➕ takes back the contribution it earned, for when someone reacted by accident."""
+    if str(payload.emoji) != "➕":
+        return
+    guild, message_date = await tracked_message_date(payload.guild_id, payload.message_id)
+    if not message_date:
+        return
 
-    # step 5: update user contributions with the message's date
-    print(f"[REACTION] Saving contribution for {user.display_name} on {message_date}")
-    save_user_data(user_id, user.display_name, 1, message_date)
-    print(f"[REACTION] Save completed for {user.display_name}")
-    # await reaction.message.channel.send(f"🎉 **{user.display_name}** has contributed for {message_date}!")
+    user_id = str(payload.user_id)
+    if await undo_reaction_contribution(guild, user_id, message_date):
+        logger.debug("[REACTION] User %s removed their ➕, contribution for %s taken back", user_id, message_date)
 
 
 ###### LOG STREAK ##################
 
-def check_milestone(streak_count, start_date):
-    """Check milestones and return formatted milestone message."""
-    milestones = []
-
-    # day-based milestones (1, 7, and multiples of 50)
-    if streak_count in [1, 7] or streak_count % 50 == 0:
-        milestones.append(f"🎯 **Day {streak_count}!**")
+def extend_streak(day, streak_data):
+    """Count day (a streak_calendar.Day) towards the streak unless it already is. Returns "logged", "extended" or "broken" (restarted today)."""
+    status = day.status(streak_data["last_logged_date"])
+    if status == "logged":
+        return "logged"
 
-    # month and year milestones
-    if start_date != "N/A":
-        start_date_obj = date.fromisoformat(start_date)
-        today = datetime.now(LOCAL_TIMEZONE).date()
-
-        # calculate the number of months and years passed
-        total_months = (today.year - start_date_obj.year) * 12 + (today.month - start_date_obj.month)
-        years_passed = today.year - start_date_obj.year
+    # check if the streak is broken
+    if status == "broken":
+        # check if current streak is the longest
+        current_streak = streak_data["streak_count"]
+        if current_streak > streak_data["longest_streak"]:
+            streak_data["longest_streak"] = current_streak
+            streak_data["longest_streak_end_date"] = streak_data["last_logged_date"]
+
+        streak_data["streak_count"] = 1
+        streak_data["start_date"] = day.iso  # reset the streak start date
+        streak_data["last_logged_date"] = day.iso
+        return "broken"
+
+    # the first log of the day extends the streak
+    streak_data["streak_count"] += 1
+    streak_data["last_logged_date"] = day.iso
+    if streak_data["start_date"] == "N/A" or not streak_data["start_date"]:
+        streak_data["start_date"] = day.iso  # set start date if missing
+    return "extended"
+
+def set_log_message(message_id, today_str, streak_data):
+    """Shift today's log message to yesterday and make message_id today's (the one ➕ reactions count on)."""
+    streak_data["log_message_id_yesterday"] = streak_data.get("log_message_id_today")
+    streak_data["log_message_date_yesterday"] = streak_data.get("log_message_date_today")
+    streak_data["log_message_id_today"] = message_id
+    streak_data["log_message_date_today"] = today_str
 
-        # check for exact year milestone (accounting for leap years)
-        if today.month == start_date_obj.month and today.day == start_date_obj.day and years_passed > 0:
-            milestones.append(f"🏆 **{years_passed} year{'s' if years_passed > 1 else ''} streak!**")
-            return milestones
+async def check_proof(guild, message):
+    """Hash the log's photo and look for it among the recent proofs. Returns (hash, the matching earlier proof), or Nones.
 
-        # check for exact month milestone
-        if today.day == start_date_obj.day and total_months > 0:
-            milestones.append(f"📅 **{total_months} month{'s' if total_months > 1 else ''} streak!**")
-        
-    return milestones
+    A photo that can't be checked within PROOF_CHECK_TIMEOUT seconds is let through unchecked, so a slow download never holds up a log.
+    """
+    attachment = next((attachment for attachment in message.attachments if proofs.is_image(attachment)), None)
+    if attachment is None:
+        return None, None
+    try:
+        with metrics.EVENT_LATENCY.time(event="proof_check"):
+            value = await asyncio.wait_for(proofs.hash_attachment(attachment), proofs.PROOF_CHECK_TIMEOUT)
+    except Exception as e:  # includes timing out
+        logger.warning("[PROOF] Couldn't check %s (%r), accepting it unchecked", attachment.filename, e)
+        metrics.ERRORS.inc(source="proof_check", error=type(e).__name__)
+        return None, None
+    if value is None:
+        return None, None
+    return value, guild.proofs.find(value)
+
+async def remember_proof(guild, value, date_str, user_id, message_id):
+    """Add an accepted log's photo to the recent proofs, in memory and in storage."""
+    record = {"hash": format_hash(value), "date": date_str, "user_id": user_id, "message_id": str(message_id)}
+    guild.proofs.add(record)
+    try:
+        await storage_call(guild, "save_proof", record)
+    except Exception as e:
+        logger.warning("[PROOF] Couldn't save the proof hash for message %s: %r", message_id, e)  # still checked against until restart
 
 @bot.command(name="log")
 async def log(ctx):
     """Log a streak for the day with an image attachment."""
-    print(f"[LOG] User {ctx.author.display_name} (ID: {ctx.author.id}) initiated log command")
+    logger.debug("[LOG] User %s (ID: %s) initiated log command", ctx.author.display_name, ctx.author.id)
     
     # step 1: check if the message contains an image attachment
     if not ctx.message.attachments:
         await ctx.send("Did it even happen if there's no proof? 🤔 Please include an image!")
         return
 
-    # step 2: load current streak data
-    streak_data = load_streak_data()
-    today = datetime.now(LOCAL_TIMEZONE).date()
-    current_month = today.month
-    current_year = today.year
-    today_str = str(today)
-    last_logged_date = streak_data["last_logged_date"]
-    print(f"[LOG] Today: {today_str}, Last logged: {last_logged_date}")
-
-    # error handling in case last logged date is N/A
-    try:
-        last_logged_date_obj = date.fromisoformat(last_logged_date)
-        last_logged_month = last_logged_date_obj.month
-        last_logged_year = last_logged_date_obj.year
-    except ValueError:
-        last_logged_month = None
-        last_logged_year = None
-
-    # step 3: check if a new month has started
-    if last_logged_month and (current_month != last_logged_month or current_year != last_logged_year):
-        # get the previous month's name
-        previous_month_name = today.replace(month=last_logged_month).strftime("%B")  # e.g., "January"
+    guild = guild_for(ctx)
+    day = guild.calendar.day()
+    today = day.date
+    today_str = day.iso
 
-        # print the previous month's leaderboard before reset
+    # step 2: check the photo hasn't been logged before (no need if they've already contributed today)
+    user_id = str(ctx.author.id)
+    username = ctx.author.display_name
+    proof_hash = None
+    if proofs.PROOF_CHECK != "off" and not await check_user_log_on_date(guild, user_id, today_str):
+        proof_hash, earlier = await check_proof(guild, ctx.message)
+        if earlier:
+            earlier_user = guild.user_index.get(earlier["user_id"])
+            who = "you" if earlier["user_id"] == user_id else (earlier_user["username"] if earlier_user else "someone")
+            metrics.DUPLICATE_PROOFS.inc(action=proofs.PROOF_CHECK)
+            logger.info("[PROOF] %s's photo matches the one %s logged on %s", username, earlier["user_id"], earlier["date"])
+            if proofs.PROOF_CHECK == "reject":
+                await ctx.send(f"📸 This photo looks just like the one {who} logged on {earlier['date']}. Please share a new one!")
+                return
+            await ctx.send(f"📸 Heads up: this photo looks just like the one {who} logged on {earlier['date']}.")
+
+    # step 3: check if a new month has started, archiving the previous month's leaderboard if so
+    archived = await roll_over_month(guild)
+    if archived:
+        # print the previous month's leaderboard, now that it's reset
+        archived_month, embed = archived
+        previous_month_name = datetime.strptime(archived_month, "%Y-%m").strftime("%B")  # e.g., "January"
         await ctx.send(f"🏆 **Last Recorded Leaderboard for {previous_month_name}**:")
-        await leaderboard(ctx)  # calls the leaderboard function to print top contributors
-
-        sheet2.batch_clear(["A2:D1000"]) # reset leaderboard in google sheets
+        if embed is None:
+            await ctx.send("No contributions 😢")
+        else:
+            await ctx.send(embed=embed)
         await ctx.send(f"🌟 **New Leaderboard!** All contributions have been reset for {today.strftime('%B')}. This is your chance to make it to the top! 🔥")
 
-    # step 4: check if the user already contributed today
-    user_id = str(ctx.author.id)
-    username = ctx.author.display_name
-    if check_user_log_today(user_id):
-        print(f"[LOG] User {username} already contributed today, skipping")
+    # step 4: count the user's contribution, unless they already contributed today
+    if not await contribute(guild, user_id, username, today_str):
+        logger.debug("[LOG] User %s already contributed today, skipping", username)
         await ctx.send(f"You've already contributed today, {username}! See you tomorrow. 🌟")
         return
-
-    # step 5: update user contributions (first time today)
-    print(f"[LOG] Saving user contribution for {username}")
-    save_user_data(user_id, username, 1, today_str)
-
-    # step 6: prevent updating the streak if it's already logged today
-    if last_logged_date == today_str:
-        print(f"[LOG] Streak already logged today by someone else, not updating streak count")
+    logger.debug("[LOG] Saving user contribution for %s", username)
+    try:
+        await flush_contributions(guild)  # a log is written right away (with any ➕ still queued)
+    except Exception as e:
+        # the contribution is still queued and the flush will be retried, so the log still counts towards the streak
+        logger.warning("[LOG] Couldn't write %s's contribution yet, it stays queued: %r", username, e)
+    if proof_hash is not None:
+        await remember_proof(guild, proof_hash, today_str, user_id, ctx.message.id)
+
+    # step 5: update the streak, unless someone else already logged today
+    # (saved in step 8, together with the confirmation's message ID: one write instead of two)
+    status, streak_data = await update_streak(guild, functools.partial(extend_streak, day), save=False)
+    if status == "logged":
+        logger.debug("[LOG] Streak already logged today by someone else, not updating streak count")
         await ctx.send("Thanks for contributing! The streak's already logged for today. 🌟")
         return
-
-    # step 7: check if the streak is broken
-    streak_was_broken = False
-    if last_logged_date and last_logged_date != "N/A":
-        try:
-            last_logged_date_obj = date.fromisoformat(last_logged_date)
-            days_difference = (date.fromisoformat(today_str) - last_logged_date_obj).days
-
-            if days_difference > 1:  # streak is broken
-                print(f"[LOG] Streak broken! Days difference: {days_difference}")
-                # check if current streak is the longest
-                current_streak = streak_data["streak_count"]
-                if current_streak > streak_data["longest_streak"]:
-                    print(f"[LOG] New record! {current_streak} > {streak_data['longest_streak']}")
-                    streak_data["longest_streak"] = current_streak
-                    streak_data["longest_streak_end_date"] = last_logged_date
-                
-                streak_data["streak_count"] = 1
-                streak_data["start_date"] = today_str  # reset the streak start date
-                streak_data["last_logged_date"] = today_str
-                await ctx.send("😢 The streak was broken! Starting fresh from today.")
-                streak_was_broken = True
-        except ValueError: # handle invalid date formats (e.g., "N/A")
-            streak_data["last_logged_date"] = None
-
-    # step 8: update the streak for the first log of the day
-    if not streak_was_broken: # (skip if already updated due to break)
-        old_count = streak_data["streak_count"]
-        streak_data["streak_count"] += 1
-        streak_data["last_logged_date"] = today_str
-        if streak_data["start_date"] == "N/A" or not streak_data["start_date"]:
-            streak_data["start_date"] = today_str  # set start date if missing
-        print(f"[LOG] Incrementing streak: {old_count} -> {streak_data['streak_count']}")
-
-    # step 9: check for milestones
-    streak_count = streak_data["streak_count"]
-    start_date = streak_data["start_date"]
-
-    milestones = check_milestone(streak_count, start_date)
-    if milestones:
-        milestone_message = "\n".join(milestones)
-        await ctx.send(f"🎉 **Milestone reached!**\n{milestone_message}")
-
-    # step 10: post confirmation message and add emoji reaction
-    print(f"[LOG] Posting confirmation message for streak day {streak_count}")
-    confirmation_message = await ctx.send(
-        f"✅ Entry logged! The streak is now **{streak_count} days** long! React with ➕ to contribute!"
-    )
-    await confirmation_message.add_reaction("➕")
-
-    # shift today's message to yesterday, save new message for today
-    streak_data["log_message_id_yesterday"] = streak_data.get("log_message_id_today")
-    streak_data["log_message_date_yesterday"] = streak_data.get("log_message_date_today")
-    streak_data["log_message_id_today"] = confirmation_message.id
-    streak_data["log_message_date_today"] = today_str
-    print(f"[LOG] Saving streak data - Message ID: {confirmation_message.id}, Date: {today_str}")
-    save_streak_data(streak_data)
-    print(f"[LOG] Streak data saved successfully")
+    logger.info("[LOG] Streak in guild %s %s: now %s days (longest %s)", guild.config.guild_id, status, streak_data["streak_count"], streak_data["longest_streak"])
+    confirmation_message = None
+    try:
+        if status == "broken":
+            await ctx.send("😢 The streak was broken! Starting fresh from today.")
+
+        # step 6: check for milestones (worked out by the calendar when the streak record was cached)
+        streak_count = streak_data["streak_count"]
+        milestones = guild.calendar.milestones()
+        if milestones:
+            milestone_message = "\n".join(milestones)
+            await ctx.send(f"🎉 **Milestone reached!**\n{milestone_message}")
+
+        # step 7: post confirmation message and add emoji reaction
+        logger.debug("[LOG] Posting confirmation message for streak day %s", streak_count)
+        confirmation_message = await ctx.send(
+            f"✅ Entry logged! The streak is now **{streak_count} days** long! React with ➕ to contribute!"
+        )
+        await confirmation_message.add_reaction("➕")
+    finally:
+        # step 8: save the streak with the new message as today's, so ➕ reactions on it count
+        # (if posting failed, the extended streak is still saved, just without a message)
+        if confirmation_message is not None:
+            logger.debug("[LOG] Saving streak data - Message ID: %s, Date: %s", confirmation_message.id, today_str)
+            await update_streak(guild, functools.partial(set_log_message, confirmation_message.id, today_str))
+        else:
+            await update_streak(guild, lambda streak_data: None)
+        logger.debug("[LOG] Streak data saved successfully")
 
 
 ###### MANUALLY RESET LEADERBOARD ##################
 
-ALLOWED_USERS = {722664432433627209}  # currently: Y
-
 @bot.command(name="resetleaderboard")
 async def reset_leaderboard(ctx):
     """Manually resets the leaderboard and posts the last results (Only for approved users)."""
-    if ctx.author.id not in ALLOWED_USERS:
+    guild = guild_for(ctx)
+    if ctx.author.id not in guild.config.admins:
         await ctx.send("🚫 You don’t have permission to reset the leaderboard.")
         return
 
     await ctx.send(f"🏆 **Last Recorded Leaderboard**:")
     await leaderboard(ctx)  # calls the leaderboard function to print top contributors
 
-    sheet2.batch_clear(["A2:D1000"]) # reset leaderboard in google sheets
-    await ctx.send(f"🌟 **New Leaderboard!** All contributions have been reset for {datetime.now(LOCAL_TIMEZONE).date().strftime('%B')}. This is your chance to make it to the top! 🔥")
+    await clear_user_data(guild)  # archive and reset leaderboard in storage
+    await ctx.send(f"🌟 **New Leaderboard!** All contributions have been reset for {guild.today().strftime('%B')}. This is your chance to make it to the top! 🔥")
+
+    logger.info("✅ Leaderboard has been reset manually in guild %s.", guild.config.guild_id)
+
+
+###### REFRESH CACHE ##################
+
+@contextlib.asynccontextmanager
+async def contributions_paused(guild):
+    """Hold new logs and ➕s, and take the flush lock, while the contributions and day bitmaps are replaced wholesale."""
+    guild.contributions_open.clear()
+    try:
+        async with guild.flush_lock:
+            yield
+    finally:
+        guild.contributions_open.set()
+
+async def reload_from_storage(guild):
+    """Re-read the streak record and contributions (on the writer, so no change is in the middle of being written)."""
+    async with contributions_paused(guild):
+        await _flush_contributions(guild)  # queued ➕s would otherwise be missing from the reloaded day bitmaps
+        await load_user_index(guild, force_refresh=True)
+        await load_day_bitmaps(guild)
+    if guild.streak_unsaved:  # a log between extending the streak and saving it
+        await save_streak_data(guild, guild.streak_cache["data"])
+    return await load_streak_data(guild, force_refresh=True)
+
+@bot.command(name="refresh")
+async def refresh_cache(ctx):
+    """Re-read the streak and contributions from storage after manual edits (Only for approved users)."""
+    guild = guild_for(ctx)
+    if ctx.author.id not in guild.config.admins:
+        await ctx.send("🚫 You don’t have permission to refresh the cache.")
+        return
+
+    streak_data = await guild.writer.submit(reload_from_storage, guild)
+    await ctx.send(f"🔄 Reloaded from storage! The streak is **{streak_data['streak_count']} days** long.")
+
+
+###### BACKFILL ##################
+
+# log progress every this many messages while reading the channel history
+BACKFILL_PROGRESS_EVERY = 10000
+
+async def read_history(channel, rebuild, after=None):
+    """Feed the channel's messages (all of them, or those after a message ID) to rebuild, oldest first."""
+    async for message in channel.history(limit=None, after=discord.Object(after) if after else None, oldest_first=True):
+        await rebuild.feed(message)
+        if rebuild.messages % BACKFILL_PROGRESS_EVERY == 0:
+            logger.info("[BACKFILL] Read %d messages from #%s (up to %s)", rebuild.messages, channel, message.created_at.date())
+
+async def restore_from_history(guild, rebuild, channel):
+    """Write what rebuild found to storage in one batch, then reload the caches. Runs on the writer."""
+    async with contributions_paused(guild):
+        # messages posted while the history was being read
+        if rebuild.last_message_id:
+            await read_history(channel, rebuild, after=rebuild.last_message_id)
+
+        streak = rebuild.streak(await load_streak_data(guild))
+        users, history = rebuild.contributions()
+        # every bitmap is rebuilt in the same batch; those of users with nothing in the channel are dropped
+        days = {user_id: bitmap.to_hex() for user_id, bitmap in rebuild.days.items()}
+        await storage_call(guild, "restore", streak, users, history, days)
+
+        # queued ➕s are in the history that was just read, so they're already counted
+        guild.pending_contributions.clear()
+        guild.reaction_contributions.clear()
+        guild.days = rebuild.days
+        guild.dirty_days.clear()
+        guild.history = None
+        guild.all_time = None
+        guild.data_version += 1
+        await load_user_index(guild, force_refresh=True)
+        # the record just written replaces the cached one, along with any change a log hasn't saved yet
+        cache_streak_data(guild, streak)
+        guild.streak_unsaved = False
+    return await load_streak_data(guild)
+
+@bot.command(name="backfill")
+async def backfill(ctx, confirm: str = None):
+    """Rebuild the streak and contributions from the log channel's history (Only for approved users).
+
+    Without `confirm` it only shows what it found; `sk.backfill confirm` overwrites storage with it.
+    """
+    guild = guild_for(ctx)
+    if ctx.author.id not in guild.config.admins:
+        await ctx.send("🚫 You don’t have permission to rebuild the streak.")
+        return
+    channel = bot.get_channel(guild.config.channel_id)
+    if channel is None:
+        await ctx.send("I can't see the log channel, so there's no history to read. 😕")
+        return
+
+    await ctx.send(f"📜 Reading the history of {channel.mention}. This can take a few minutes for a long streak...")
+    rebuild = Backfill(guild.timezone, bot.user.id)
+    await read_history(channel, rebuild)
+    users, history = rebuild.contributions()
+    streak = rebuild.streak(await load_streak_data(guild))
+    summary = (
+        f"Read **{rebuild.messages}** messages: **{rebuild.days_logged}** days logged.\n"
+        f"🔥 **Streak:** {streak['streak_count']} days (since {streak['start_date']}, last logged {streak['last_logged_date']})\n"
+        f"🏆 **Longest Before That:** {streak['longest_streak']} days (ended {streak['longest_streak_end_date']})\n"
+        f"👥 **Contributors:** {len(users)} on the current leaderboard, plus {len(history)} earlier month(s)"
+    )
+
+    if confirm != "confirm":
+        await ctx.send(f"{summary}\n\nNothing has been changed. Run `sk.backfill confirm` to overwrite storage with this.")
+        return
+
+    # on the writer, with logs and ➕s held, so none lands between the last message read and the write
+    streak_data = await guild.writer.submit(restore_from_history, guild, rebuild, channel)
+    logger.info("[BACKFILL] Guild %s rebuilt from %d messages", guild.config.guild_id, rebuild.messages)
+    await ctx.send(f"{summary}\n\n✅ Storage rebuilt! The streak is **{streak_data['streak_count']} days** long.")
+
 
-    print("✅ Leaderboard has been reset manually.")
+###### METRICS ##################
+
+def _latency_lines(histogram, label):
+    return "\n".join(
+        f"`{name}` {count}× · p50 {p50 * 1000:.1f} ms · p95 {p95 * 1000:.1f} ms"
+        for name, (count, p50, p95) in histogram.summary(label).items()
+    ) or "none yet"
+
+def _count_lines(counter, label_index=0):
+    totals = {}
+    for key, count in counter.totals().items():
+        totals[key[label_index]] = totals.get(key[label_index], 0) + count
+    return "\n".join(f"`{name}` {count}" for name, count in sorted(totals.items())) or "none"
+
+@bot.command(name="metrics")
+async def show_metrics(ctx):
+    """Show latency, Sheets usage, errors and queue depths since the bot started (Only for approved users)."""
+    guild = guild_for(ctx)
+    if ctx.author.id not in guild.config.admins:
+        await ctx.send("🚫 You don’t have permission to view metrics.")
+        return
+
+    embed = discord.Embed(title="📈 StreakKeeper Metrics", color=discord.Color.purple())
+    embed.add_field(name="⏱️ Commands", value=_latency_lines(metrics.COMMAND_LATENCY, "command"), inline=False)
+    embed.add_field(name="📨 Events", value=_latency_lines(metrics.EVENT_LATENCY, "event"), inline=False)
+    embed.add_field(name="💾 Storage Calls", value=_latency_lines(metrics.STORAGE_LATENCY, "method"), inline=False)
+    embed.add_field(name="📊 Sheets API Calls", value=_count_lines(metrics.SHEETS_CALLS), inline=True)
+    embed.add_field(name="⚠️ Errors", value=_count_lines(metrics.ERRORS), inline=True)
+    embed.add_field(name="🔁 Retries", value=_count_lines(metrics.RETRIES), inline=True)
+
+    lag = metrics.LOOP_LAG.summary().get(None)
+    embed.add_field(name="🐢 Event Loop Lag", value=f"p50 {lag[1] * 1000:.1f} ms · p95 {lag[2] * 1000:.1f} ms" if lag else "not measured yet", inline=True)
+    queues = metrics.QUEUE_DEPTH.values()
+    embed.add_field(name="📥 Queues", value="\n".join(f"`{key[0]}` {value}" for key, value in sorted(queues.items())) or "empty", inline=True)
+
+    await ctx.send(embed=embed)
 
 
 ###### LEADERBOARD ##################
 
+ALL_TIME = {"alltime", "all-time", "all"}
+MONTH_NAMES = {name.lower(): number for number in range(1, 13)
+               for name in (date(2000, number, 1).strftime("%B"), date(2000, number, 1).strftime("%b"))}
+
+def parse_period(period, guild, archived_months):
+    """Turn sk.leaderboard's argument into "alltime", a "YYYY-MM" month, or None if it isn't one."""
+    period = period.strip().lower()
+    if period in ALL_TIME:
+        return "alltime"
+    try:
+        return datetime.strptime(period, "%Y-%m").strftime("%Y-%m")
+    except ValueError:
+        pass
+
+    # "march", "mar", "march 2025" or "2025 march"
+    parts = period.replace(",", " ").split()
+    names = [part for part in parts if part in MONTH_NAMES]
+    years = [part for part in parts if part.isdigit() and len(part) == 4]
+    if len(names) != 1 or len(names) + len(years) != len(parts):
+        return None
+    month = MONTH_NAMES[names[0]]
+    if years:
+        return f"{years[0]}-{month:02d}"
+
+    # no year: the current month if it's that one, otherwise the latest archived one
+    today = guild.today()
+    if month == today.month:
+        return today.strftime("%Y-%m")
+    matches = [archived for archived in archived_months if int(archived[5:]) == month]
+    return max(matches) if matches else f"{today.year - (month > today.month)}-{month:02d}"
+
+def render_cached(guild, key, render):
+    """Return the embed rendered for key, calling render() only if the data changed since it was last rendered."""
+    cached = guild.render_cache.get(key)
+    if cached and cached[0] == guild.data_version:
+        metrics.RENDER_CACHE.inc(result="hit")
+        return cached[1]
+    metrics.RENDER_CACHE.inc(result="miss")
+    if any(version != guild.data_version for version, _ in guild.render_cache.values()):
+        guild.render_cache.clear()  # everything rendered before the change is stale, so don't keep it around
+    embed = render()
+    guild.render_cache[key] = (guild.data_version, embed)
+    return embed
+
+def leaderboard_embed(title, ranking, username_of):
+    """The top 10 of ranking (ties share a rank), or None if nobody has contributed."""
+    top_contributors = ranking.top(10)
+    if not top_contributors:
+        return None
+    embed = discord.Embed(title=title, color=discord.Color.blue())
+    for rank, user_id, contributions in top_contributors:
+        embed.add_field(name=f"{rank}. {username_of(user_id)}", value=f"{contributions} contributions", inline=False)
+    return embed
+
 @bot.command(name="leaderboard")
-async def leaderboard(ctx):
-    """Display the top 10 contributors from Sheet2."""
+async def leaderboard(ctx, *, period: str = None):
+    """Display the top 10 contributors this month, in an archived month (e.g. 2025-03 or March), or of all time."""
     # step 1: fetch user contribution data
-    users = load_user_data()  # load all user data from sheet2
-    
-    # step 2: sort users by contributions in descending order
-    sorted_users = sorted(users, key=lambda x: int(x["Contributions"]), reverse=True)
-    
-    # step 3: limit to top 10 contributors
-    top_contributors = sorted_users[:10]
-    
-    # step 4: format leaderboard message
-    if not top_contributors:
+    guild = guild_for(ctx)
+    await load_user_index(guild)  # load all user data
+
+    # step 2: pick the ranking to show (this month's and the all-time one already count queued reactions)
+    title = "Top 10 Contributors"
+    ranking = guild.ranking
+    username_of = lambda user_id: current_record(guild, user_id)["username"]
+    if period:
+        history = await load_history(guild)
+        month = parse_period(period, guild, history)
+        if month is None:
+            await ctx.send("🤔 I don't know that period. Try `sk.leaderboard 2025-03`, `sk.leaderboard March` or `sk.leaderboard alltime`.")
+            return
+        if month == "alltime":
+            title = "Top 10 Contributors of All Time"
+            ranking = await load_all_time(guild)
+            username_of = lambda user_id: all_time_username(guild, user_id)
+        elif month in history:
+            title = f"Top 10 Contributors in {datetime.strptime(month, '%Y-%m').strftime('%B %Y')}"
+            ranking = history[month]["ranking"]
+            username_of = lambda user_id: history[month]["users"][user_id]["username"]
+        elif month != contributions_month(guild):
+            await ctx.send(f"📭 There's no archived leaderboard for {datetime.strptime(month, '%Y-%m').strftime('%B %Y')}.")
+            return
+
+    # step 3: read the top 10 contributors straight off the ranking, reusing the last embed if nothing changed since
+    embed = render_cached(guild, ("leaderboard", title), lambda: leaderboard_embed(title, ranking, username_of))
+    if embed is None:
         await ctx.send("No contributions 😢")
         return
 
-    embed = discord.Embed(
-        title="Top 10 Contributors",
-        color=discord.Color.blue()
-    )
-
-    for rank, user in enumerate(top_contributors, start=1):
-        embed.add_field(name=f"{rank}. {user['Username']}", value=f"{user['Contributions']} contributions", inline=False)
-
     await ctx.send(embed=embed)
 
 
 ###### PRINT FUNCTIONS ##################
 
-@bot.command(name="streak")
-async def view_streak(ctx):
-    """View the current streak and check if it is broken."""
-    streak_data = load_streak_data()
-    streak_count = streak_data["streak_count"]
-    start_date = streak_data["start_date"] if streak_data["start_date"] else "N/A"
-    last_logged_date = streak_data["last_logged_date"]
+def reset_broken_streak(day, streak_data):
+    """Reset the streak to 0 if a day was missed since the last log (as of day, a streak_calendar.Day). Returns whether it was broken."""
+    if day.status(streak_data["last_logged_date"]) != "broken":
+        return False
 
-    today = datetime.now(LOCAL_TIMEZONE).date()
+    # check if current streak is the longest
+    if streak_data["streak_count"] > streak_data["longest_streak"]:
+        streak_data["longest_streak"] = streak_data["streak_count"]
+        streak_data["longest_streak_end_date"] = streak_data["last_logged_date"]
 
-    # check if the streak is broken
-    if last_logged_date and last_logged_date != "N/A":
-        try:
-            last_logged_date_obj = date.fromisoformat(last_logged_date)
-            days_difference = (today - last_logged_date_obj).days
-
-            if days_difference > 1:  # streak is broken
-                # check if current streak is the longest
-                if streak_count > streak_data["longest_streak"]:
-                    streak_data["longest_streak"] = streak_count
-                    streak_data["longest_streak_end_date"] = last_logged_date
-                
-                streak_data["streak_count"] = 0
-                streak_data["last_logged_date"] = "N/A"
-                save_streak_data(streak_data)
-                await ctx.send("😢 The streak was broken! It's now reset to 0 days.")
-                return
-        except ValueError:
-            pass  # handle invalid dates (e.g., "N/A")
+    streak_data["streak_count"] = 0
+    streak_data["last_logged_date"] = "N/A"
+    return True
+
+@bot.command(name="streak")
+async def view_streak(ctx):
+    """View the current streak, its next milestones and when it breaks, and check if it is broken."""
+    guild = guild_for(ctx)
+    day = guild.calendar.day()
+    broken, streak_data = await update_streak(guild, functools.partial(reset_broken_streak, day))
+    if broken:
+        await ctx.send("😢 The streak was broken! It's now reset to 0 days.")
+        return
 
     # display the streak
-    await ctx.send(f"🔥 **Current Streak:** {streak_count} days\n📅 **Start Date:** {start_date}")
+    streak_count = streak_data["streak_count"]
+    start_date = streak_data["start_date"] if streak_data["start_date"] else "N/A"
+    lines = [f"🔥 **Current Streak:** {streak_count} days", f"📅 **Start Date:** {start_date}"]
+    upcoming = guild.calendar.upcoming()
+    if upcoming:
+        lines.append("🎯 **Next Milestones:** " + ", ".join(f"{label} on {when}" for when, label in upcoming))
+    if day.status(streak_data["last_logged_date"]) == "due" and guild.calendar.expires_at:
+        hours = guild.calendar.hours_left()
+        lines.append(f"⏳ **Breaks in {plural(hours, 'hour')}** unless someone logs today!")
+    await ctx.send("\n".join(lines))
 
 @bot.command(name="longeststreak")
 async def view_longest_streak(ctx):
     """View the longest streak record."""
-    streak_data = load_streak_data()
+    streak_data = await load_streak_data(guild_for(ctx))
     longest_streak = streak_data["longest_streak"]
     longest_streak_end_date = streak_data["longest_streak_end_date"]
     
@@ -479,42 +1332,136 @@ async def view_longest_streak(ctx):
 
 @bot.command(name="remindertime")
 async def view_reminder_time(ctx):
-    """View the current reminder time."""
-    streak_data = load_streak_data()
-    reminder_time = streak_data["reminder_time"]
-    await ctx.send(f"⏰ **Reminder Time:** {reminder_time}")
+    """View the current reminder time(s) and when the next reminder goes out."""
+    guild = guild_for(ctx)
+    streak_data = await load_streak_data(guild)
+    reminder_time = streak_data["reminder_time"].replace(",", ", ")
+    next_run = guild.reminders.next_run()
+    next_text = f"\n🔔 **Next Reminder:** {next_run.strftime('%a %H:%M')}" if next_run else ""
+    await ctx.send(f"⏰ **Reminder Time:** {reminder_time}{next_text}")
+
+
+###### PERSONAL STREAKS ##################
+
+CALENDAR_COLORS = {"logged": "🟩", "missed": "⬛", "upcoming": "⬜", "outside": "▫️"}
+
+@bot.command(name="mystreak")
+async def my_streak(ctx):
+    """View your own current and longest run of days contributed."""
+    guild = guild_for(ctx)
+    days = guild.days.get(str(ctx.author.id))
+    username = ctx.author.display_name
+    if not days:
+        await ctx.send(f"**{username}**, you haven't contributed yet. Log with `sk.log` or react ➕ to start your streak!")
+        return
+
+    current, since = days.current_streak(guild.today())
+    longest, ended = days.longest_streak()
+    embed = discord.Embed(title="🔥 Personal Streak", color=discord.Color.orange())
+    embed.set_author(name=username, icon_url=ctx.author.avatar.url if ctx.author.avatar else None)
+    embed.add_field(name="🔥 Current Streak", value=f"{current} days" + (f" (since {since})" if since else ""), inline=True)
+    embed.add_field(name="🏆 Longest Streak", value=f"{longest} days (ended {ended})", inline=True)
+    embed.add_field(name="🌟 Days Contributed", value=len(days), inline=False)
+    await ctx.send(embed=embed)
+
+def calendar_text(days, year, month, today):
+    """A month of days as rows of colored squares, Monday to Sunday."""
+    logged = days.month(year, month) if days else set()
+    rows = []
+    for week in calendar.Calendar().monthdayscalendar(year, month):
+        cells = []
+        for day in week:
+            if day == 0:
+                cells.append(CALENDAR_COLORS["outside"])
+            elif day in logged:
+                cells.append(CALENDAR_COLORS["logged"])
+            elif date(year, month, day) > today:
+                cells.append(CALENDAR_COLORS["upcoming"])
+            else:
+                cells.append(CALENDAR_COLORS["missed"])
+        rows.append("".join(cells))
+    return "\n".join(rows), len(logged)
+
+@bot.command(name="calendar")
+async def contribution_calendar(ctx, *, period: str = None):
+    """Show the days you contributed on in a month (this month by default, or e.g. 2025-03 or March)."""
+    guild = guild_for(ctx)
+    today = guild.today()
+    month = parse_period(period, guild, ()) if period else today.strftime("%Y-%m")
+    if month is None or month == "alltime":
+        await ctx.send("🤔 I don't know that month. Try `sk.calendar`, `sk.calendar 2025-03` or `sk.calendar March`.")
+        return
+
+    year, month_number = int(month[:4]), int(month[5:])
+    grid, logged = calendar_text(guild.days.get(str(ctx.author.id)), year, month_number, today)
+    embed = discord.Embed(title=f"📅 {date(year, month_number, 1).strftime('%B %Y')}", description=grid, color=discord.Color.green())
+    embed.set_author(name=ctx.author.display_name, icon_url=ctx.author.avatar.url if ctx.author.avatar else None)
+    embed.set_footer(text=f"{logged} day(s) contributed · Mon to Sun · 🟩 contributed ⬛ missed ⬜ still to come")
+    await ctx.send(embed=embed)
 
 
 ###### SET FUNCTIONS ##################
 
 @bot.command(name="setremindertime")
-async def set_reminder_time(ctx, time: str = None):
-    """Set the reminder time in Sheet1."""
-    if not time:
-        await ctx.send("You need to provide a time! Use the format `HH:MM` in 24-hour format (e.g., 19:00).")
+async def set_reminder_time(ctx, *times: str):
+    """Set one or more daily reminder times in the streak record."""
+    if not times:
+        await ctx.send("You need to provide a time! Use the format `HH:MM` in 24-hour format (e.g., 19:00). List several times for several reminders (e.g., 08:00 19:00).")
         return
 
     # validate time format using regex
-    time_format = r"^([01]?[0-9]|2[0-3]):([0-5][0-9])$"
-    if not re.match(time_format, time):
+    if not all(TIME_FORMAT.match(time) for time in times):
         await ctx.send("Invalid time format! Please use `HH:MM` in 24-hour format (e.g., 19:00).")
         return
 
-    # load current streak data
-    streak_data = load_streak_data()
+    # update the reminder time in storage
+    guild = guild_for(ctx)
+    parsed_times = parse_reminder_times(",".join(times))
+    new_time = format_reminder_times(parsed_times)
+
+    def change(streak_data):
+        previous_time = streak_data["reminder_time"]
+        streak_data["reminder_time"] = new_time
+        return previous_time
+    previous_time, _ = await update_streak(guild, change)
+    guild.reminders.reschedule(parsed_times)  # takes effect right away
 
-    # update the reminder time
-    previous_time = streak_data["reminder_time"]
-    streak_data["reminder_time"] = time
-    save_streak_data(streak_data)  # save to sheet1
+    await ctx.send(f"⏰ Reminder time has been updated from `{previous_time}` to `{new_time}`.")
 
-    await ctx.send(f"⏰ Reminder time has been updated from `{previous_time}` to `{time}`.")
+def stats_embed(guild, user_data, username, avatar_url):
+    # if user has no contributions (or took back the only one they had)
+    if not user_data or not user_data["contributions"]:
+        return discord.Embed(
+            title="📊 User Stats",
+            description=f"**{username}** hasn't contributed yet this month.",
+            color=discord.Color.yellow()
+        )
+
+    # extract stats
+    contributions = user_data["contributions"]
+    last_log = user_data["last_log"]
+
+    # look up user rank
+    rank = guild.ranking.rank(user_data["user_id"]) or "N/A"
+
+    # build the embed
+    embed = discord.Embed(
+        title="📊 User Stats",
+        color=discord.Color.green()
+    )
+    embed.set_author(name=username, icon_url=avatar_url)
+
+    embed.add_field(name="🏆 Rank", value=rank, inline=True)
+    embed.add_field(name="🌟 Contributions", value=contributions, inline=True)
+    embed.add_field(name="📅 Last Log", value=last_log, inline=False)
+    return embed
 
 @bot.command(name="stats")
 async def user_stats(ctx, *, member_input: str = None):
     """View individual stats. Defaults to command caller if input is invalid."""
-    # load user data from google sheets
-    users = load_user_data()
+    # load user data (indexed by User ID)
+    guild = guild_for(ctx)
+    await load_user_index(guild)
 
     # default to command caller initially
     member = ctx.author
@@ -531,39 +1478,15 @@ async def user_stats(ctx, *, member_input: str = None):
     user_id = str(member.id)
     username = member.display_name
 
-    # find user stats
-    user_data = next((user for user in users if str(user["User ID"]).strip() == str(user_id).strip()), None)
-
-    # if user has no contributions
-    if not user_data:
-        embed = discord.Embed(
-            title="📊 User Stats",
-            description=f"**{username}** hasn't contributed yet this month.",
-            color=discord.Color.yellow()
-        )
-        await ctx.send(embed=embed)
-        return
-
-    # extract stats
-    contributions = user_data["Contributions"]
-    last_log = user_data["Last Log"]
-
-    # calculate user rank
-    sorted_users = sorted(users, key=lambda x: int(x["Contributions"]), reverse=True)
-    rank = next((index + 1 for index, user in enumerate(sorted_users) if str(user["User ID"]).strip() == str(user_id).strip()), "N/A")
-
-    # build and send the embed
-    embed = discord.Embed(
-        title="📊 User Stats",
-        color=discord.Color.green()
-    )
-    embed.set_author(name=username, icon_url=member.avatar.url if member.avatar else None)
-
-    embed.add_field(name="🏆 Rank", value=rank, inline=True)
-    embed.add_field(name="🌟 Contributions", value=contributions, inline=True)
-    embed.add_field(name="📅 Last Log", value=last_log, inline=False)
-
+    # build the embed, or reuse the last one if neither their data nor their name and avatar changed since
+    avatar_url = member.avatar.url if member.avatar else None
+    embed = render_cached(guild, ("stats", user_id, username, avatar_url), lambda: stats_embed(guild, current_record(guild, user_id), username, avatar_url))
     await ctx.send(embed=embed)
 
 
-bot.run(os.getenv('BOT_TOKEN'))
+def run():
+    configure_logging()
+    bot.run(os.getenv('BOT_TOKEN'), log_handler=None)  # logging is already set up
+
+if __name__ == "__main__":
+    run()  # run.py does the same without the photo-hashing processes importing all of this
@@ -0,0 +1,258 @@
+"""
+Runtime metrics for StreakKeeper.
+
+Counters, gauges and latency histograms kept in memory and exposed in the Prometheus text
+format, either over HTTP (set METRICS_PORT) or summarised by the admin-only sk.metrics command.
+Everything here is thread-safe, since storage calls are measured on the storage thread pool.
+"""
+
+import asyncio
+import functools
+import threading
+import time
+from bisect import bisect_left
+
+# upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# event loop lag is usually tiny, so it gets finer buckets
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+###### METRIC TYPES ##################
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}  # label values tuple -> value (or histogram state)
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} takes labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _labels(self, key, **extra):
+        return list(zip(self.label_names, key)) + list(extra.items())
+
+    def samples(self):
+        """Yield (name, label pairs, value) for every series."""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in sorted(items):
+            yield self.name, self._labels(key), value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def totals(self):
+        """Return {label values: count} for every series."""
+        with self._lock:
+            return dict(self._values)
+
+class Gauge(Metric):
+    """A value that goes up and down. `collect` can add series that are computed at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=(), collect=None):
+        super().__init__(name, help_text, labels)
+        self.collect = collect  # returns {label values tuple: value}, or None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def values(self):
+        with self._lock:
+            values = dict(self._values)
+        if self.collect:
+            values.update((tuple(str(part) for part in key), value) for key, value in self.collect().items())
+        return values
+
+    def samples(self):
+        for key, value in sorted(self.values().items()):
+            yield self.name, self._labels(key), value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            state["counts"][bisect_left(self.buckets, value)] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def time(self, **labels):
+        """Context manager that observes how long its block took."""
+        return _Timer(self, labels)
+
+    def series(self):
+        """Return {label values: {"counts", "sum", "count"}} for every series (copies)."""
+        with self._lock:
+            return {key: {"counts": list(state["counts"]), "sum": state["sum"], "count": state["count"]}
+                    for key, state in self._values.items()}
+
+    def quantile(self, q, state):
+        """Estimate a quantile from one series' buckets, interpolating within the bucket like Prometheus does."""
+        if not state["count"]:
+            return None
+        target = q * state["count"]
+        seen = 0
+        for i, count in enumerate(state["counts"]):
+            if seen + count >= target and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]  # beyond the last bucket, the best we can say
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (target - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def summary(self, label=None):
+        """Merge the series that share a value of `label` (or all of them) into {value: (count, p50, p95)}."""
+        merged = {}
+        index = self.label_names.index(label) if label else None
+        for key, state in self.series().items():
+            group = key[index] if label else None
+            total = merged.setdefault(group, {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0})
+            total["counts"] = [a + b for a, b in zip(total["counts"], state["counts"])]
+            total["sum"] += state["sum"]
+            total["count"] += state["count"]
+        return {group: (state["count"], self.quantile(0.5, state), self.quantile(0.95, state))
+                for group, state in sorted(merged.items(), key=lambda item: str(item[0]))}
+
+    def samples(self):
+        for key, state in sorted(self.series().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state["counts"]):
+                cumulative += count
+                yield f"{self.name}_bucket", self._labels(key, le=_format_value(bound)), cumulative
+            yield f"{self.name}_sum", self._labels(key), state["sum"]
+            yield f"{self.name}_count", self._labels(key), state["count"]
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+###### STREAKKEEPER METRICS ##################
+
+REGISTRY = []
+
+COMMAND_LATENCY = Histogram("streakkeeper_command_seconds", "Time to run a command, by command and outcome.", ["command", "status"])
+EVENT_LATENCY = Histogram("streakkeeper_event_seconds", "Time to handle a Discord event or background job.", ["event"])
+STORAGE_LATENCY = Histogram("streakkeeper_storage_seconds", "Time for a storage backend call, including time queued for a thread.", ["method"])
+SHEETS_LATENCY = Histogram("streakkeeper_sheets_request_seconds", "Time for one Google Sheets API call.", ["method"])
+SHEETS_CALLS = Counter("streakkeeper_sheets_calls_total", "Google Sheets API calls, by gspread method.", ["method"])
+ERRORS = Counter("streakkeeper_errors_total", "Errors, by where they happened and exception type.", ["source", "error"])
+RETRIES = Counter("streakkeeper_retries_total", "Operations retried after a failure.", ["operation"])
+LOOP_LAG = Histogram("streakkeeper_event_loop_lag_seconds", "How late the event loop woke up a sleeping task.", buckets=LAG_BUCKETS)
+QUEUE_DEPTH = Gauge("streakkeeper_queue_depth", "Work waiting to be done, by queue.", ["queue"])
+DUPLICATE_PROOFS = Counter("streakkeeper_duplicate_proofs_total", "Logs whose photo matched a recent proof, by what was done (reject or flag).", ["action"])
+RENDER_CACHE = Counter("streakkeeper_render_cache_total", "Leaderboard and stats embeds reused from the render cache (hit) or rendered (miss).", ["result"])
+
+
+def render():
+    """The whole registry in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+def timed(histogram, **labels):
+    """Decorator for coroutines: observe their run time and count the exceptions they raise."""
+    source = next(iter(labels.values()), histogram.name)
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                ERRORS.inc(source=source, error=type(e).__name__)
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - start, **labels)
+        return wrapper
+    return decorator
+
+async def watch_event_loop(interval=1.0):
+    """Measure event loop lag forever: how much later than asked a sleep returns."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        LOOP_LAG.observe(max(loop.time() - start - interval, 0.0))
+
+
+###### HTTP ENDPOINT ##################
+
+async def start_http_server(host, port):
+    """Serve GET /metrics on host:port and return the runner (call its cleanup() to stop)."""
+    from aiohttp import web  # installed with discord.py
+
+    async def handle(request):
+        return web.Response(body=render().encode(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
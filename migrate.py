@@ -0,0 +1,43 @@
+"""
+One-shot import/export between storage backends.
+
+    python migrate.py sheets sqlite    # copy the Google Sheet into SQLITE_PATH
+    python migrate.py sqlite sheets    # push the SQLite data back to the Google Sheet
+
+Use --sheet-key (or --sheet-name) and --sqlite-path to pick a particular server's spreadsheet and database.
+The target's streak record and contribution table are overwritten with the source's.
+"""
+
+import argparse
+import os
+
+from dotenv import load_dotenv
+
+from storage import copy_data, open_backend
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy StreakKeeper data from one storage backend to another.")
+    parser.add_argument("source", choices=["sheets", "sqlite"], help="backend to read from")
+    parser.add_argument("target", choices=["sheets", "sqlite"], help="backend to overwrite")
+    parser.add_argument("--sheet-name", help="spreadsheet to use (default: the original club's sheet)")
+    parser.add_argument("--sheet-key", help="spreadsheet key, from its URL (default: SHEET_KEY); faster than --sheet-name")
+    parser.add_argument("--sqlite-path", help="database file to use (default: SQLITE_PATH or streak.db)")
+    args = parser.parse_args()
+    if args.source == args.target:
+        parser.error("source and target must be different backends")
+
+    load_dotenv()
+    sheet_key = args.sheet_key or os.getenv("SHEET_KEY")
+    source = open_backend(args.source, mirror=False, sheet_name=args.sheet_name, sqlite_path=args.sqlite_path, sheet_key=sheet_key)
+    target = open_backend(args.target, mirror=False, sheet_name=args.sheet_name, sqlite_path=args.sqlite_path, sheet_key=sheet_key)
+    try:
+        copied = copy_data(source, target)
+    finally:
+        source.close()
+        target.close()
+    print(f"Copied the streak record and {copied} user(s) from {args.source} to {args.target}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Duplicate proof detection.
+
+Every image logged with sk.log is reduced to a 64-bit perceptual hash (a difference hash: does
+each pixel of a tiny grayscale copy get brighter or darker to its right?). Re-saved, resized or
+recompressed copies of a photo hash to nearly the same bits, so a new proof that's within a few
+bits of a recent one is the same photo posted again.
+
+Hashing decodes the image, which is CPU work, so it runs in a small process pool and the event
+loop never waits on it. The workers start from a fork server that has only imported this module,
+so they don't load Discord, gspread or the bot. Each worker also re-imports the script the bot was
+started with, which is why the Procfile runs the tiny run.py rather than main.py.
+"""
+
+import asyncio
+import io
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# "reject" turns a reused photo away, "flag" accepts it with a warning, "off" skips the check
+PROOF_CHECK = os.getenv("PROOF_CHECK", "reject")
+PROOF_INDEX_SIZE = int(os.getenv("PROOF_INDEX_SIZE", "1000"))  # recent proofs remembered per server
+PROOF_MATCH_DISTANCE = int(os.getenv("PROOF_MATCH_DISTANCE", "6"))  # differing bits (out of 64) that still count as the same photo
+PROOF_CHECK_TIMEOUT = float(os.getenv("PROOF_CHECK_TIMEOUT", "2"))  # seconds for download + hash before the log goes ahead unchecked
+PROOF_MAX_BYTES = int(os.getenv("PROOF_MAX_BYTES", str(10 * 1024 * 1024)))  # bigger attachments aren't downloaded
+PROOF_HASH_WORKERS = int(os.getenv("PROOF_HASH_WORKERS", "1"))
+
+HASH_SIZE = 8  # 8x8 comparisons = 64 bits
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".heic")
+
+
+###### HASHING ##################
+
+def perceptual_hash(data):
+    """The 64-bit difference hash of an image file's bytes (runs in a worker process)."""
+    from PIL import Image  # imported here so only the worker processes load Pillow
+
+    with Image.open(io.BytesIO(data)) as image:
+        # JPEGs can be decoded straight at a fraction of their size, which is most of the speed-up
+        image.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))
+        pixels = list(image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.LANCZOS).getdata())
+
+    value = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            left = pixels[row * (HASH_SIZE + 1) + col]
+            right = pixels[row * (HASH_SIZE + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+_pool = None
+
+def start_pool():
+    """Start the hashing processes now, so the first sk.log doesn't wait for them."""
+    global _pool
+    if _pool is None and PROOF_CHECK != "off":
+        # not a plain fork: forking a process that's running threads can deadlock the child
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["proofs"])
+        else:
+            context = multiprocessing.get_context("spawn")  # Windows
+        _pool = ProcessPoolExecutor(max_workers=PROOF_HASH_WORKERS, mp_context=context)
+        _pool.submit(int)  # starts the workers in the background
+    return _pool
+
+def stop_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+async def hash_attachment(attachment):
+    """Download an attachment and hash it in the process pool. Returns None if it isn't an image we can check."""
+    if not is_image(attachment) or (attachment.size or 0) > PROOF_MAX_BYTES:
+        return None
+    data = await attachment.read()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(start_pool(), perceptual_hash, data)
+    except BrokenProcessPool:
+        stop_pool()  # a worker died (e.g. killed for memory); start fresh ones for the next log
+        raise
+
+def is_image(attachment):
+    content_type = attachment.content_type or ""
+    return content_type.startswith("image/") or attachment.filename.lower().endswith(IMAGE_EXTENSIONS)
+
+
+###### RECENT PROOFS INDEX ##################
+
+class ProofIndex:
+    """The most recent proofs' hashes, searchable for near-duplicates with banded locality-sensitive hashing.
+
+    Each hash is cut into 8 bands of 8 bits. Two hashes that differ in at most 7 bits can't differ in
+    every band, so they share at least one band exactly: only proofs sharing a band with the new one
+    need comparing. At most `size` proofs are kept, and the oldest are forgotten first.
+    """
+
+    BANDS = 8
+    BAND_BITS = 8
+
+    def __init__(self, size=PROOF_INDEX_SIZE, max_distance=PROOF_MATCH_DISTANCE):
+        if max_distance >= self.BANDS:
+            raise ValueError(f"max_distance must be below {self.BANDS} for the bands to find every match")
+        self.size = size
+        self.max_distance = max_distance
+        self.entries = OrderedDict()  # message ID -> proof record, oldest first
+        self.buckets = [{} for _ in range(self.BANDS)]  # per band: band value -> message IDs
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _bands(self, value):
+        mask = (1 << self.BAND_BITS) - 1
+        return [(value >> (band * self.BAND_BITS)) & mask for band in range(self.BANDS)]
+
+    def add(self, record):
+        """Remember a proof: {"hash" (16 hex digits), "date", "user_id", "message_id"}."""
+        key = str(record["message_id"])
+        if key in self.entries:
+            return
+        self.entries[key] = record
+        for band, bucket in zip(self._bands(int(record["hash"], 16)), self.buckets):
+            bucket.setdefault(band, set()).add(key)
+        while len(self.entries) > self.size:
+            self._forget(next(iter(self.entries)))
+
+    def _forget(self, key):
+        record = self.entries.pop(key)
+        for band, bucket in zip(self._bands(int(record["hash"], 16)), self.buckets):
+            keys = bucket[band]
+            keys.discard(key)
+            if not keys:
+                del bucket[band]
+
+    def find(self, value):
+        """The closest remembered proof within max_distance bits of value, or None."""
+        candidates = set()
+        for band, bucket in zip(self._bands(value), self.buckets):
+            candidates |= bucket.get(band, set())
+
+        best, best_distance = None, self.max_distance + 1
+        for key in candidates:
+            record = self.entries[key]
+            distance = (int(record["hash"], 16) ^ value).bit_count()
+            if distance < best_distance:
+                best, best_distance = record, distance
+        return best
+
+
+def format_hash(value):
+    return f"{value:016x}"
@@ -0,0 +1,113 @@
+"""
+Incrementally maintained leaderboard.
+
+Users are grouped by score. A Fenwick tree counts how many users hold each score, so a rank is a
+prefix sum (O(log max score)), and each score's bucket keeps its users in tie order, so the top N
+is read off the highest buckets without sorting anyone.
+
+Ties: users with the same score share a rank (1, 2, 2, 4, ...) and are listed by display name
+(case-insensitive), then by user ID.
+"""
+
+from bisect import bisect_left, insort
+
+
+class Leaderboard:
+    def __init__(self):
+        self._users = {}  # user_id -> (score, tie key)
+        self._buckets = {}  # score -> sorted list of (tie key, user_id)
+        self._scores = []  # distinct scores present, ascending
+        self._tree = [0] * 65  # Fenwick tree of user counts, indexed by score + 1
+        self._total = 0
+
+    def __len__(self):
+        return self._total
+
+    def __contains__(self, user_id):
+        return user_id in self._users
+
+    # Fenwick tree over scores
+
+    def _grow(self, score):
+        size = len(self._tree) - 1
+        if score < size:
+            return
+        while size <= score:
+            size *= 2
+        counts = {s: len(bucket) for s, bucket in self._buckets.items()}
+        self._tree = [0] * (size + 1)
+        for s, count in counts.items():
+            self._add(s, count)
+
+    def _add(self, score, delta):
+        i = score + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _count_at_most(self, score):
+        i = min(score + 1, len(self._tree) - 1)
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    # updates
+
+    def update(self, user_id, username, score):
+        """Set a user's score (adding them if new)."""
+        score = max(int(score), 0)
+        key = (str(username).casefold(), user_id)
+        if self._users.get(user_id) == (score, key):
+            return
+        self.remove(user_id)
+
+        self._grow(score)
+        bucket = self._buckets.get(score)
+        if bucket is None:
+            bucket = self._buckets[score] = []
+            insort(self._scores, score)
+        insort(bucket, key)
+        self._add(score, 1)
+        self._users[user_id] = (score, key)
+        self._total += 1
+
+    def remove(self, user_id):
+        """Drop a user from the leaderboard (no-op if they're not on it)."""
+        entry = self._users.pop(user_id, None)
+        if entry is None:
+            return
+        score, key = entry
+        bucket = self._buckets[score]
+        del bucket[bisect_left(bucket, key)]
+        if not bucket:
+            del self._buckets[score]
+            del self._scores[bisect_left(self._scores, score)]
+        self._add(score, -1)
+        self._total -= 1
+
+    def clear(self):
+        self.__init__()
+
+    # queries
+
+    def rank(self, user_id):
+        """Return the user's rank (1 = top), or None if they're not on the leaderboard."""
+        entry = self._users.get(user_id)
+        if entry is None:
+            return None
+        return self._total - self._count_at_most(entry[0]) + 1
+
+    def top(self, n):
+        """Return up to n entries as (rank, user_id, score), best first, in tie order."""
+        entries = []
+        above = 0  # users with a strictly higher score than the current bucket
+        for score in reversed(self._scores):
+            bucket = self._buckets[score]
+            for _, user_id in bucket:
+                if len(entries) == n:
+                    return entries
+                entries.append((above + 1, user_id, score))
+            above += len(bucket)
+        return entries
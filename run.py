@@ -0,0 +1,12 @@
+"""
+Starts StreakKeeper (the Procfile runs `python3 run.py`).
+
+The photo-hashing worker processes (see proofs.py) re-import the script the bot was started
+with. Started from this file, that's just this docstring: main.py, Discord and gspread are only
+imported in the real process.
+"""
+
+if __name__ == "__main__":
+    import main
+
+    main.run()
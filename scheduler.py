@@ -0,0 +1,123 @@
+"""
+Event-driven reminder scheduling.
+
+Instead of polling every minute, the scheduler works out when the next reminder is due in
+the local time zone, sleeps until then, and starts over whenever the reminder times change.
+"""
+
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta
+
+TIME_FORMAT = re.compile(r"^([01]?[0-9]|2[0-3]):([0-5][0-9])$")
+
+# never sleep longer than this in one go, so clock jumps (suspend, NTP, DST) are picked up
+MAX_SLEEP = 3600
+
+logger = logging.getLogger("streakkeeper.scheduler")
+
+
+def parse_reminder_times(value):
+    """Parse a stored reminder time value ("19:00" or "08:00,19:00") into sorted (hour, minute) pairs."""
+    times = set()
+    for part in (value or "").split(","):
+        match = TIME_FORMAT.match(part.strip())
+        if match:
+            times.add((int(match.group(1)), int(match.group(2))))
+    return sorted(times)
+
+def format_reminder_times(times):
+    """Format (hour, minute) pairs the way they're stored ("08:00,19:00"), or "N/A" if there are none."""
+    return ",".join(f"{hour:02d}:{minute:02d}" for hour, minute in times) or "N/A"
+
+def _localize(tz, day, hour, minute):
+    # normalize() moves times that don't exist (spring forward) to the next valid instant
+    return tz.normalize(tz.localize(datetime(day.year, day.month, day.day, hour, minute)))
+
+def next_fire_time(times, now, tz):
+    """Return the first reminder instant strictly after now (an aware datetime), or None if there are no times."""
+    today = now.astimezone(tz).date()
+    for offset in range(3):
+        day = today + timedelta(days=offset)
+        for hour, minute in times:
+            when = _localize(tz, day, hour, minute)
+            if when > now:
+                return when
+    return None
+
+def missed_fire_time(times, now, tz, last_sent, window):
+    """Return today's most recent reminder instant if it passed less than `window` ago and wasn't sent, else None."""
+    today = now.astimezone(tz).date()
+    passed = [when for when in (_localize(tz, today, hour, minute) for hour, minute in times) if when <= now]
+    if not passed:
+        return None
+    latest = passed[-1]
+    if now - latest > window:
+        return None  # too late to be useful
+    if last_sent and last_sent >= latest:
+        return None  # it went out before the bot stopped
+    return latest
+
+
+class ReminderScheduler:
+    """Sleeps until the next reminder and calls `fire(scheduled_time)`; call reschedule() when the times change."""
+
+    def __init__(self, fire, tz, catchup_window):
+        self.fire = fire
+        self.tz = tz
+        self.catchup_window = catchup_window
+        self.times = []
+        self._task = None
+
+    def start(self, times, last_sent=None):
+        """Start scheduling the given times, first catching up on a reminder missed while the bot was down."""
+        self.times = list(times)
+        missed = missed_fire_time(self.times, datetime.now(self.tz), self.tz, last_sent, self.catchup_window)
+        self._restart(catch_up=missed)
+
+    def reschedule(self, times):
+        """Switch to new reminder times right away."""
+        self.times = list(times)
+        self._restart()
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def next_run(self):
+        return next_fire_time(self.times, datetime.now(self.tz), self.tz)
+
+    def _restart(self, catch_up=None):
+        self.stop()
+        self._task = asyncio.create_task(self._run(catch_up))
+
+    async def _run(self, catch_up):
+        if catch_up:
+            await self._fire(catch_up)
+
+        last_fired = catch_up
+        while self.times:
+            now = datetime.now(self.tz)
+            # never count from before the last reminder, in case the sleep woke up a little early
+            when = next_fire_time(self.times, max(now, last_fired) if last_fired else now, self.tz)
+            delay = (when - now).total_seconds()
+            if delay > MAX_SLEEP:
+                await asyncio.sleep(MAX_SLEEP)
+                continue  # recompute, in case the clock moved
+            await asyncio.sleep(max(delay, 0))
+            await self._fire(when)
+            last_fired = when
+
+    async def _fire(self, when):
+        try:
+            await self.fire(when)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("[REMINDER] Reminder for %02d:%02d failed: %r", when.hour, when.minute, e)
@@ -0,0 +1,172 @@
+"""
+Google Sheets access that behaves well under bursts.
+
+Every worksheet call the Sheets backend makes goes through SheetsClient, which:
+
+- shares one in-flight read among concurrent callers asking for the same thing (single flight),
+- paces requests with token buckets sized to the Sheets per-minute quota,
+- retries 429 and 5xx responses with jittered exponential backoff,
+- counts and times every call for the metrics.
+
+A burst of reactions therefore turns into slightly slower responses instead of quota errors.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+import requests
+from google.auth.exceptions import TransportError
+from gspread.exceptions import APIError
+
+from metrics import ERRORS, RETRIES, SHEETS_CALLS, SHEETS_LATENCY
+
+logger = logging.getLogger("streakkeeper.sheets")
+
+# Google allows 60 read and 60 write requests per minute per user (our service account); 0 turns pacing off
+SHEETS_READS_PER_MINUTE = float(os.getenv("SHEETS_READS_PER_MINUTE", "60"))
+SHEETS_WRITES_PER_MINUTE = float(os.getenv("SHEETS_WRITES_PER_MINUTE", "60"))
+SHEETS_BURST = int(os.getenv("SHEETS_BURST", "10"))  # requests allowed back to back before pacing kicks in
+SHEETS_MAX_RETRIES = int(os.getenv("SHEETS_MAX_RETRIES", "5"))
+RETRY_BASE_DELAY = 1.0  # seconds; doubles on each attempt
+RETRY_MAX_DELAY = 32.0
+
+READ_METHODS = {"row_values", "get_all_records", "get_all_values", "col_values", "get", "batch_get", "worksheets", "values_batch_get"}
+# writes that set absolute values can be sent again safely; an append that may have landed cannot
+IDEMPOTENT_WRITES = {"update", "batch_update", "batch_clear", "values_batch_update", "values_batch_clear"}
+
+
+###### TOKEN BUCKET ##################
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, and up to `capacity` back to back."""
+
+    def __init__(self, per_minute, capacity):
+        self.rate = per_minute / 60
+        self.capacity = max(capacity, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block the calling (storage) thread until a request may be sent."""
+        if self.rate <= 0:
+            return  # pacing turned off
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+# the quota belongs to the service account, so every spreadsheet and server shares these
+read_bucket = TokenBucket(SHEETS_READS_PER_MINUTE, SHEETS_BURST)
+write_bucket = TokenBucket(SHEETS_WRITES_PER_MINUTE, SHEETS_BURST)
+
+
+###### RETRIES ##################
+
+def _status(error):
+    if isinstance(error, APIError):
+        response = getattr(error, "response", None)
+        return getattr(response, "status_code", None) or error.code
+    return None
+
+def is_retryable(error, method):
+    """429s were never applied, so anything can retry them; 5xx and dropped connections only if resending is safe."""
+    status = _status(error)
+    if status == 429:
+        return True
+    safe = method in READ_METHODS or method in IDEMPOTENT_WRITES
+    if status is not None:
+        return safe and 500 <= status < 600
+    # TransportError: the access token couldn't be renewed because Google's auth server was unreachable
+    return safe and isinstance(error, (requests.ConnectionError, requests.Timeout, TransportError))
+
+def backoff_delay(attempt, error=None):
+    """Full-jitter exponential backoff, or the server's Retry-After if it sent one."""
+    response = getattr(error, "response", None)
+    retry_after = getattr(response, "headers", {}).get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), RETRY_MAX_DELAY)
+        except ValueError:
+            pass  # an HTTP date; fall back to our own schedule
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+###### SHEETS CLIENT ##################
+
+class SheetsClient:
+    """Wraps a gspread worksheet (or spreadsheet); call its methods exactly as you would the original's."""
+
+    def __init__(self, worksheet):
+        self.worksheet = worksheet
+        self._lock = threading.Lock()
+        self._in_flight = {}  # (method, args) -> (write generation, Future) for reads being fetched
+        self._generation = 0  # bumped by every write, so reads started before it aren't shared after it
+
+    def __getattr__(self, name):
+        attr = getattr(self.worksheet, name)
+        if not callable(attr):
+            return attr
+        if name in READ_METHODS:
+            return lambda *args, **kwargs: self._read(name, attr, args, kwargs)
+        return lambda *args, **kwargs: self._write(name, attr, args, kwargs)
+
+    def _read(self, name, func, args, kwargs):
+        key = (name, repr(args), repr(sorted(kwargs.items())))
+        with self._lock:
+            entry = self._in_flight.get(key)
+            if entry and entry[0] == self._generation:
+                future = entry[1]
+                leader = False
+            else:
+                future = Future()
+                self._in_flight[key] = (self._generation, future)
+                leader = True
+        if not leader:
+            return future.result()  # someone else is already fetching exactly this
+
+        try:
+            future.set_result(self._send(name, func, args, kwargs, read_bucket))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                if self._in_flight.get(key, (None, None))[1] is future:
+                    del self._in_flight[key]
+        return future.result()
+
+    def _write(self, name, func, args, kwargs):
+        with self._lock:
+            self._generation += 1
+        return self._send(name, func, args, kwargs, write_bucket)
+
+    def _send(self, name, func, args, kwargs, bucket):
+        attempt = 0
+        while True:
+            bucket.acquire()
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                ERRORS.inc(source="sheets", error=type(e).__name__)
+                if attempt >= SHEETS_MAX_RETRIES or not is_retryable(e, name):
+                    raise
+                delay = backoff_delay(attempt, e)
+                RETRIES.inc(operation=f"sheets:{name}")
+                logger.warning("[SHEETS] %s failed (%s), retrying in %.1fs (attempt %d of %d)",
+                               name, _status(e) or type(e).__name__, delay, attempt + 1, SHEETS_MAX_RETRIES)
+                time.sleep(delay)
+                attempt += 1
+            finally:
+                SHEETS_CALLS.inc(method=name)
+                SHEETS_LATENCY.observe(time.perf_counter() - start, method=name)
@@ -0,0 +1,836 @@
+"""
+Storage backends for StreakKeeper.
+
+Every backend stores the same two things: the streak summary (one record) and the
+per-user contribution table. Methods are blocking; the bot runs them on its storage
+thread pool so they never stall the Discord event loop.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import gspread
+from google.oauth2.service_account import Credentials
+
+from metrics import ERRORS
+from sheets_client import SheetsClient
+
+logger = logging.getLogger("streakkeeper.storage")
+
+# set up Google Sheets API credentials
+SCOPE = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+SHEET_NAME = "UMD Womxn's Club Ultimate Throwing Streak"
+
+# streak summary fields, in Sheet1 column order (A-K)
+STREAK_FIELDS = [
+    "streak_count",
+    "start_date",
+    "last_logged_date",
+    "reminder_time",
+    "log_message_id_today",
+    "log_message_date_today",
+    "log_message_id_yesterday",
+    "log_message_date_yesterday",
+    "longest_streak",
+    "longest_streak_end_date",
+    "last_reminder_sent"
+]
+
+
+###### STREAK ROW HELPERS ##################
+
+def parse_streak_row(data):
+    """Turn a raw streak row (Sheet1 row 2) into the streak data dict, handling empty values."""
+    # treat message IDs as strings
+    log_message_id_today = data[4] if len(data) > 4 and data[4] else None
+    log_message_id_today = str(log_message_id_today) if log_message_id_today else None
+
+    log_message_id_yesterday = data[6] if len(data) > 6 and data[6] else None
+    log_message_id_yesterday = str(log_message_id_yesterday) if log_message_id_yesterday else None
+
+    # safeguard for empty cells
+    return {
+        "streak_count": int(data[0]) if data and data[0].isdigit() else 0,
+        "start_date": data[1] if len(data) > 1 and data[1] else "N/A",
+        "last_logged_date": data[2] if len(data) > 2 and data[2] else "N/A",
+        "reminder_time": data[3] if len(data) > 3 and data[3] else "N/A",
+        "log_message_id_today": log_message_id_today,
+        "log_message_date_today": data[5] if len(data) > 5 and data[5] else "N/A",
+        "log_message_id_yesterday": log_message_id_yesterday,
+        "log_message_date_yesterday": data[7] if len(data) > 7 and data[7] else "N/A",
+        "longest_streak": int(data[8]) if len(data) > 8 and data[8].isdigit() else 0,
+        "longest_streak_end_date": data[9] if len(data) > 9 and data[9] else "N/A",
+        "last_reminder_sent": data[10] if len(data) > 10 and data[10] else "N/A"
+    }
+
+def streak_row(data):
+    """Turn the streak data dict into a row of strings, in Sheet1 column order."""
+    row = [
+        data["streak_count"],
+        data["start_date"],
+        data["last_logged_date"],
+        data["reminder_time"],
+        str(data["log_message_id_today"]) if data.get("log_message_id_today") else "",
+        data.get("log_message_date_today", ""),
+        str(data["log_message_id_yesterday"]) if data.get("log_message_id_yesterday") else "",
+        data.get("log_message_date_yesterday", ""),
+        data["longest_streak"],
+        data["longest_streak_end_date"],
+        data.get("last_reminder_sent", "")
+    ]
+    return [str(value) if value is not None else "" for value in row]
+
+def normalize_streak(data):
+    """Return the streak data exactly as a backend would hand it back after saving it."""
+    return parse_streak_row(streak_row(data))
+
+
+###### BACKEND INTERFACE ##################
+
+class StorageBackend:
+    """Interface every storage engine implements.
+
+    User records are dicts with "user_id", "username", "contributions" and "last_log".
+    """
+
+    name = "base"
+
+    def load_streak(self):
+        """Return the streak data dict."""
+        raise NotImplementedError
+
+    def save_streak(self, data):
+        """Overwrite the streak record."""
+        raise NotImplementedError
+
+    def load_users(self):
+        """Return every user record."""
+        raise NotImplementedError
+
+    def save_users(self, records):
+        """Insert or overwrite the given user records (absolute values, not increments) in one batch."""
+        raise NotImplementedError
+
+    def clear_users(self):
+        """Delete every user record."""
+        raise NotImplementedError
+
+    def archive_users(self, month):
+        """Move every user record into the history partition for month ("YYYY-MM") in one bulk copy, leaving the table empty.
+
+        If that month was already archived (a manual reset earlier in the month), the contributions are added to it.
+        """
+        raise NotImplementedError
+
+    def load_history(self):
+        """Return every archived month as {"YYYY-MM": [user records]}."""
+        raise NotImplementedError
+
+    def save_history(self, month, records):
+        """Overwrite one month's history partition."""
+        raise NotImplementedError
+
+    def load_proofs(self, limit):
+        """Return the latest `limit` proof hashes, oldest first, as {"hash", "date", "user_id", "message_id"} dicts."""
+        raise NotImplementedError
+
+    def save_proof(self, record):
+        """Remember one proof hash (see proofs.py)."""
+        raise NotImplementedError
+
+    def load_days(self):
+        """Return every user's day bitmap as {User ID: hex string} (see days.py). Unlike the contributions, these are never reset."""
+        raise NotImplementedError
+
+    def save_days(self, days):
+        """Insert or overwrite the given users' day bitmaps ({User ID: hex string}) in one batch."""
+        raise NotImplementedError
+
+    def save_contributions(self, records, days):
+        """save_users(records) and save_days(days) together; engines that can write both in one request or transaction override this."""
+        if days:
+            self.save_days(days)
+        if records:
+            self.save_users(records)
+
+    def restore(self, streak, users, history, days=None):
+        """Overwrite the streak record, the whole contribution table and the given archived months ({"YYYY-MM": [user records]}) in one batch.
+
+        With days ({User ID: hex string}), every day bitmap is replaced by them in the same batch.
+        Used to rebuild storage from the channel history and to copy data between backends; other archived months are left alone.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def merge_history(existing, records):
+    """Add records to an archived month's records, summing contributions per user."""
+    merged = {record["user_id"]: dict(record) for record in existing}
+    for record in records:
+        user = merged.get(record["user_id"])
+        if user is None:
+            merged[record["user_id"]] = dict(record)
+        else:
+            user.update(username=record["username"], contributions=user["contributions"] + record["contributions"],
+                        last_log=max(user["last_log"], record["last_log"]))
+    return list(merged.values())
+
+
+###### GOOGLE SHEETS BACKEND ##################
+
+HISTORY_PREFIX = "History "  # archived months live in worksheets named "History YYYY-MM"
+USER_HEADERS = ["User ID", "Username", "Contributions", "Last Log"]
+PROOFS_SHEET = "Proofs"  # hashes of logged photos, created on first use
+PROOF_FIELDS = ["hash", "date", "user_id", "message_id"]
+PROOF_HEADERS = ["Hash", "Date", "User ID", "Message ID"]
+DAYS_SHEET = "Days"  # one row per user: the days they contributed on, as a hex bitmap; created on first use
+DAYS_HEADERS = ["User ID", "Days"]
+
+def parse_contributions(value):
+    """A Contributions cell as an int; blanks and hand-edited text that isn't a whole number count as 0."""
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+def parse_user_rows(rows):
+    """User records from raw Sheet2-style rows (User ID, Username, Contributions, Last Log), skipping blank rows."""
+    users = []
+    for row in rows:
+        row = list(row) + [""] * (4 - len(row))
+        user_id = str(row[0]).strip()
+        if not user_id:
+            continue
+        users.append({"user_id": user_id, "username": str(row[1]), "contributions": parse_contributions(row[2]), "last_log": str(row[3]).strip()})
+    return users
+
+def user_row(record):
+    return [record["user_id"], record["username"], record["contributions"], record["last_log"]]
+
+def appended_start_row(response):
+    """Return the first row number of an append, as reported back by the sheet (or None)."""
+    match = re.search(r"![A-Z]+(\d+)", response.get("updates", {}).get("updatedRange", "")) if response else None
+    return int(match.group(1)) if match else None
+
+class SheetsBackend(StorageBackend):
+    """Sheet1 row 2 holds the streak summary; Sheet2 holds one row per user (User ID, Username, Contributions, Last Log)."""
+
+    name = "sheets"
+
+    def __init__(self, spreadsheet):
+        # one metadata request for both worksheets; every call then goes through SheetsClient for pacing, retries and shared reads
+        self.spreadsheet = SheetsClient(spreadsheet)
+        worksheets = {worksheet.title: worksheet for worksheet in self.spreadsheet.worksheets()}
+        self.sheet1 = SheetsClient(worksheets["Sheet1"])  # streak summary
+        self.sheet2 = SheetsClient(worksheets["Sheet2"])  # user contributions
+        self.proofs = SheetsClient(worksheets[PROOFS_SHEET]) if PROOFS_SHEET in worksheets else None
+        self.days = SheetsClient(worksheets[DAYS_SHEET]) if DAYS_SHEET in worksheets else None
+        self._rows = None  # User ID -> Sheet2 row number, filled by load_users
+        self._next_row = 2
+        self._rows_lock = threading.Lock()
+        self._day_rows = None  # User ID -> Days row number, filled by load_days
+        self._next_day_row = 2
+
+    def load_streak(self):
+        return parse_streak_row(self.sheet1.row_values(2)) # load row 2
+
+    def save_streak(self, data):
+        self.sheet1.update([streak_row(data)], 'A2:K2')
+
+    def load_users(self):
+        records = self.sheet2.get_all_records()
+        users = []
+        rows = {}
+        for row, user in enumerate(records, start=2):  # row 2 onwards (after headers)
+            user_id = str(user["User ID"]).strip()
+            if not user_id:
+                continue  # skip blank rows left behind by manual edits
+            rows[user_id] = row
+            users.append({
+                "user_id": user_id,
+                "username": str(user["Username"]),
+                "contributions": parse_contributions(user["Contributions"]),
+                "last_log": str(user["Last Log"]).strip()
+            })
+        with self._rows_lock:
+            self._rows = rows
+            self._next_row = len(records) + 2
+        return users
+
+    def save_users(self, records):
+        if self._rows is None:
+            self.load_users()  # need the row numbers before updating in place
+
+        with self._rows_lock:
+            # existing users: one batch_update of their B:D cells
+            updates = []
+            new_records = []
+            for record in records:
+                row = self._rows.get(record["user_id"])
+                if row:
+                    updates.append({"range": f"B{row}:D{row}", "values": [[record["username"], record["contributions"], record["last_log"]]]})
+                else:
+                    new_records.append(record)
+            if updates:
+                self.sheet2.batch_update(updates)
+
+            # new users: one append, then remember the rows the sheet reports back
+            if new_records:
+                try:
+                    response = self.sheet2.append_rows([
+                        [record["user_id"], record["username"], record["contributions"], record["last_log"]]
+                        for record in new_records
+                    ])
+                except Exception:
+                    self._rows = None  # the rows may have landed anyway: look them up again before the next write
+                    raise
+                row = appended_start_row(response) or self._next_row
+                for record in new_records:
+                    self._rows[record["user_id"]] = row
+                    row += 1
+                self._next_row = max(self._next_row, row)
+
+    def clear_users(self):
+        self.sheet2.batch_clear(["A2:D"])  # open-ended, so it clears every row however long the roster is
+        with self._rows_lock:
+            self._rows = {}
+            self._next_row = 2
+
+    def _history_sheets(self):
+        """Archived months, "YYYY-MM" -> worksheet (one metadata request)."""
+        return {
+            worksheet.title[len(HISTORY_PREFIX):]: SheetsClient(worksheet)
+            for worksheet in self.spreadsheet.worksheets() if worksheet.title.startswith(HISTORY_PREFIX)
+        }
+
+    def archive_users(self, month):
+        sheets = self._history_sheets()
+        existing = sheets.get(month)
+        if existing is None:
+            # a server-side copy of the whole sheet: one request, whatever the roster size
+            self.spreadsheet.duplicate_sheet(self.sheet2.id, new_sheet_name=HISTORY_PREFIX + month, insert_sheet_index=len(sheets) + 2)
+        else:
+            archived = parse_user_rows(existing.get_all_values()[1:])
+            current = parse_user_rows(self.sheet2.get_all_values()[1:])
+            # identical tables mean the copy landed but the clear didn't, so this is a retry, not a second reset
+            if sorted(map(str, archived)) != sorted(map(str, current)):
+                self._write_history(existing, merge_history(archived, current))
+        self.clear_users()
+
+    def _add_worksheet(self, title, rows, cols):
+        """Add a tab, or open it if an earlier attempt added it but the response was lost."""
+        try:
+            return SheetsClient(self.spreadsheet.add_worksheet(title, rows=rows, cols=cols))
+        except gspread.exceptions.APIError:
+            worksheet = next((worksheet for worksheet in self.spreadsheet.worksheets() if worksheet.title == title), None)
+            if worksheet is None:
+                raise
+            return SheetsClient(worksheet)
+
+    def load_history(self):
+        sheets = self._history_sheets()
+        if not sheets:
+            return {}
+        months = sorted(sheets)
+        # every month in a single request
+        response = self.spreadsheet.values_batch_get([f"'{HISTORY_PREFIX}{month}'!A2:D" for month in months])
+        return {month: parse_user_rows(value_range.get("values", [])) for month, value_range in zip(months, response.get("valueRanges", []))}
+
+    def save_history(self, month, records):
+        worksheet = self._history_sheets().get(month)
+        if worksheet is None:
+            worksheet = self._add_worksheet(HISTORY_PREFIX + month, rows=len(records) + 1, cols=4)
+        self._write_history(worksheet, records)
+
+    def _write_history(self, worksheet, records):
+        if worksheet.row_count < len(records) + 1:
+            worksheet.add_rows(len(records) + 1 - worksheet.row_count)  # updates can't write past the grid
+        worksheet.batch_clear(["A2:D"])
+        worksheet.update([USER_HEADERS] + [
+            [record["user_id"], record["username"], record["contributions"], record["last_log"]] for record in records
+        ], "A1")
+
+    def load_proofs(self, limit):
+        if self.proofs is None:
+            return []
+        rows = self.proofs.get_all_values()[1:]
+        return [dict(zip(PROOF_FIELDS, row)) for row in rows[-limit:] if row and row[0]]
+
+    def save_proof(self, record):
+        if self.proofs is None:
+            self.proofs = self._add_worksheet(PROOFS_SHEET, rows=1000, cols=len(PROOF_FIELDS))
+            self.proofs.update([PROOF_HEADERS], "A1")
+        self.proofs.append_row([str(record[field]) for field in PROOF_FIELDS])
+
+    def load_days(self):
+        rows = self.days.get_all_values()[1:] if self.days is not None else []
+        days = {}
+        with self._rows_lock:
+            self._day_rows = {}
+            for row, values in enumerate(rows, start=2):
+                if values and str(values[0]).strip():
+                    user_id = str(values[0]).strip()
+                    days[user_id] = values[1] if len(values) > 1 else ""
+                    self._day_rows[user_id] = row
+            self._next_day_row = len(rows) + 2
+        return days
+
+    def save_days(self, days):
+        if self.days is None:
+            self.days = self._add_worksheet(DAYS_SHEET, rows=1000, cols=len(DAYS_HEADERS))
+            self.days.update([DAYS_HEADERS], "A1")
+        if self._day_rows is None:
+            self.load_days()
+
+        # like save_users: one batch_update for the users who have a row, one append for the rest
+        with self._rows_lock:
+            updates = [{"range": f"B{self._day_rows[user_id]}", "values": [[value]]} for user_id, value in days.items() if user_id in self._day_rows]
+            new_days = [[user_id, value] for user_id, value in days.items() if user_id not in self._day_rows]
+            if updates:
+                self.days.batch_update(updates)
+            if new_days:
+                try:
+                    response = self.days.append_rows(new_days)
+                except Exception:
+                    self._day_rows = None
+                    raise
+                row = appended_start_row(response) or self._next_day_row
+                for user_id, _ in new_days:
+                    self._day_rows[user_id] = row
+                    row += 1
+                self._next_day_row = max(self._next_day_row, row)
+
+    def save_contributions(self, records, days):
+        if days and self.days is None:
+            self.days = self._add_worksheet(DAYS_SHEET, rows=1000, cols=len(DAYS_HEADERS))
+            self.days.update([DAYS_HEADERS], "A1")
+        if records and self._rows is None:
+            self.load_users()
+        if days and self._day_rows is None:
+            self.load_days()
+
+        with self._rows_lock:
+            # step 1: one values_batch_update for both tabs: the users and bitmaps that have a row, and new bitmaps
+            # written below the last row (the Days tab is the bot's own, so nothing else adds rows to it)
+            data = []
+            new_records = []
+            for record in records:
+                row = self._rows.get(record["user_id"])
+                if row:
+                    data.append({"range": f"'Sheet2'!B{row}:D{row}", "values": [[record["username"], record["contributions"], record["last_log"]]]})
+                else:
+                    new_records.append(record)
+            new_day_rows = {}
+            row = self._next_day_row
+            for user_id, value in days.items():
+                if user_id in self._day_rows:
+                    data.append({"range": f"'{DAYS_SHEET}'!B{self._day_rows[user_id]}", "values": [[value]]})
+                else:
+                    data.append({"range": f"'{DAYS_SHEET}'!A{row}:B{row}", "values": [[user_id, value]]})
+                    new_day_rows[user_id] = row
+                    row += 1
+            if new_day_rows and self.days.row_count < row - 1:
+                self.days.add_rows(max(row - 1 - self.days.row_count, 1000))  # updates can't write past the grid
+            if data:
+                self.spreadsheet.values_batch_update({"valueInputOption": "RAW", "data": data})
+            self._day_rows.update(new_day_rows)
+            self._next_day_row = row
+
+            # step 2: Sheet2 can be edited by hand, so new users are still appended after whatever is there
+            if new_records:
+                try:
+                    response = self.sheet2.append_rows([user_row(record) for record in new_records])
+                except Exception:
+                    self._rows = None  # the rows may have landed anyway: look them up again before the next write
+                    raise
+                row = appended_start_row(response) or self._next_row
+                for record in new_records:
+                    self._rows[record["user_id"]] = row
+                    row += 1
+                self._next_row = max(self._next_row, row)
+
+    def restore(self, streak, users, history, days=None):
+        sheets = self._history_sheets()
+        tables = {"Sheet2": (self.sheet2, [USER_HEADERS] + [user_row(record) for record in users])}
+        tables.update((HISTORY_PREFIX + month, (sheets.get(month), [USER_HEADERS] + [user_row(record) for record in records]))
+                      for month, records in sorted(history.items()))
+        if days is not None:
+            tables[DAYS_SHEET] = (self.days, [DAYS_HEADERS] + [[user_id, value] for user_id, value in days.items()])
+
+        # step 1: one request to add the missing tabs and grow any grid too small for its table
+        requests = []
+        for title, (worksheet, rows) in tables.items():
+            if worksheet is None:
+                requests.append({"addSheet": {"properties": {"title": title, "gridProperties": {"rowCount": len(rows), "columnCount": len(rows[0])}}}})
+            elif worksheet.row_count < len(rows):
+                requests.append({"updateSheetProperties": {"properties": {"sheetId": worksheet.id, "gridProperties": {"rowCount": len(rows)}},
+                                                           "fields": "gridProperties.rowCount"}})
+        if requests:
+            self.spreadsheet.batch_update({"requests": requests})
+
+        # step 2: one request to clear every table, and one to write the streak row and every table
+        self.spreadsheet.values_batch_clear(body={"ranges": [f"'{title}'!A2:D" for title in tables]})
+        data = [{"range": "'Sheet1'!A2:K2", "values": [streak_row(streak)]}]
+        data += [{"range": f"'{title}'!A1", "values": rows} for title, (_, rows) in tables.items()]
+        self.spreadsheet.values_batch_update({"valueInputOption": "RAW", "data": data})
+
+        with self._rows_lock:
+            self._rows = {record["user_id"]: row for row, record in enumerate(users, start=2)}
+            self._next_row = len(users) + 2
+            if days is not None:
+                self._day_rows = {user_id: row for row, user_id in enumerate(days, start=2)}
+                self._next_day_row = len(days) + 2
+        if days is not None and self.days is None:
+            self.days = SheetsClient(next(worksheet for worksheet in self.spreadsheet.worksheets() if worksheet.title == DAYS_SHEET))
+
+_client = None
+_client_lock = threading.Lock()
+
+def sheets_client():
+    """The process-wide gspread client, authorized on first use with the service account in GOOGLE_CREDENTIALS.
+
+    The google-auth credentials renew their access token on their own when it expires (or a request
+    comes back 401), so the client can be kept for the life of the process.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            # load Google credentials from environment variable
+            google_credentials = os.getenv("GOOGLE_CREDENTIALS")
+            if not google_credentials:
+                raise ValueError("Google credentials not set in environment variables.")
+
+            # parse the credentials and authenticate
+            creds = Credentials.from_service_account_info(json.loads(google_credentials), scopes=SCOPE)
+            _client = gspread.authorize(creds)
+        return _client
+
+def connect_sheets(sheet_name=SHEET_NAME, sheet_key=None):
+    """Open the spreadsheet by key if one is given (one request), otherwise by title (a Drive search first)."""
+    client = sheets_client()
+    if sheet_key:
+        return SheetsBackend(client.open_by_key(sheet_key))
+    return SheetsBackend(client.open(sheet_name))
+
+
+###### SQLITE BACKEND ##################
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS streak (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    streak_count INTEGER,
+    start_date TEXT,
+    last_logged_date TEXT,
+    reminder_time TEXT,
+    log_message_id_today TEXT,
+    log_message_date_today TEXT,
+    log_message_id_yesterday TEXT,
+    log_message_date_yesterday TEXT,
+    longest_streak INTEGER,
+    longest_streak_end_date TEXT,
+    last_reminder_sent TEXT
+);
+CREATE TABLE IF NOT EXISTS contributions (
+    user_id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    contributions INTEGER NOT NULL DEFAULT 0,
+    last_log TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS contributions_last_log ON contributions (last_log);
+CREATE TABLE IF NOT EXISTS history (
+    month TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    username TEXT NOT NULL,
+    contributions INTEGER NOT NULL DEFAULT 0,
+    last_log TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (month, user_id)
+);
+CREATE TABLE IF NOT EXISTS days (
+    user_id TEXT PRIMARY KEY,
+    days TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS proofs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hash TEXT NOT NULL,
+    date TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    message_id TEXT NOT NULL
+);
+"""
+
+class SQLiteBackend(StorageBackend):
+    """Local SQLite database in WAL mode. Needs a persistent disk (not Heroku's ephemeral filesystem)."""
+
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        # one shared connection; the lock serializes access from the storage thread pool
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")  # durable across app crashes, fast enough per write
+            self.conn.executescript(SQLITE_SCHEMA)
+            self._add_missing_columns()
+
+    def _add_missing_columns(self):
+        # databases created by older versions lack the newer streak columns
+        existing = {row[1] for row in self.conn.execute("PRAGMA table_info(streak)")}
+        for field in STREAK_FIELDS:
+            if field not in existing:
+                self.conn.execute(f"ALTER TABLE streak ADD COLUMN {field} TEXT")
+
+    def load_streak(self):
+        with self.lock:
+            row = self.conn.execute(f"SELECT {', '.join(STREAK_FIELDS)} FROM streak WHERE id = 1").fetchone()
+        return parse_streak_row(["" if value is None else str(value) for value in row] if row else [])
+
+    def save_streak(self, data):
+        columns = ", ".join(STREAK_FIELDS)
+        placeholders = ", ".join("?" for _ in STREAK_FIELDS)
+        with self.lock:
+            self.conn.execute(f"INSERT OR REPLACE INTO streak (id, {columns}) VALUES (1, {placeholders})", streak_row(data))
+
+    def load_users(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT user_id, username, contributions, last_log FROM contributions ORDER BY rowid").fetchall()
+        return [
+            {"user_id": user_id, "username": username, "contributions": contributions, "last_log": last_log}
+            for user_id, username, contributions, last_log in rows
+        ]
+
+    def save_users(self, records):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO contributions (user_id, username, contributions, last_log) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (user_id) DO UPDATE SET username = excluded.username, "
+                "contributions = excluded.contributions, last_log = excluded.last_log",
+                [(record["user_id"], record["username"], record["contributions"], record["last_log"]) for record in records]
+            )
+
+    def clear_users(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM contributions")
+
+    def archive_users(self, month):
+        # copy and clear in one transaction, so a crash can't archive a month twice or lose it
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute(
+                    "INSERT INTO history (month, user_id, username, contributions, last_log) "
+                    "SELECT ?, user_id, username, contributions, last_log FROM contributions WHERE true "
+                    "ON CONFLICT (month, user_id) DO UPDATE SET username = excluded.username, "
+                    "contributions = history.contributions + excluded.contributions, last_log = max(history.last_log, excluded.last_log)",
+                    (month,)
+                )
+                self.conn.execute("DELETE FROM contributions")
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def load_history(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT month, user_id, username, contributions, last_log FROM history ORDER BY month, rowid").fetchall()
+        history = {}
+        for month, user_id, username, contributions, last_log in rows:
+            history.setdefault(month, []).append({"user_id": user_id, "username": username, "contributions": contributions, "last_log": last_log})
+        return history
+
+    def save_history(self, month, records):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("DELETE FROM history WHERE month = ?", (month,))
+                self.conn.executemany(
+                    "INSERT INTO history (month, user_id, username, contributions, last_log) VALUES (?, ?, ?, ?, ?)",
+                    [(month, record["user_id"], record["username"], record["contributions"], record["last_log"]) for record in records]
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def load_proofs(self, limit):
+        with self.lock:
+            rows = self.conn.execute("SELECT hash, date, user_id, message_id FROM proofs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(zip(PROOF_FIELDS, row)) for row in reversed(rows)]
+
+    def save_proof(self, record):
+        with self.lock:
+            self.conn.execute("INSERT INTO proofs (hash, date, user_id, message_id) VALUES (?, ?, ?, ?)",
+                              [str(record[field]) for field in PROOF_FIELDS])
+
+    def load_days(self):
+        with self.lock:
+            return dict(self.conn.execute("SELECT user_id, days FROM days").fetchall())
+
+    def save_days(self, days):
+        with self.lock:
+            self.conn.executemany("INSERT INTO days (user_id, days) VALUES (?, ?) ON CONFLICT (user_id) DO UPDATE SET days = excluded.days",
+                                  list(days.items()))
+
+    def save_contributions(self, records, days):
+        # one transaction for both tables (the connection autocommits otherwise)
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany(
+                    "INSERT INTO contributions (user_id, username, contributions, last_log) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (user_id) DO UPDATE SET username = excluded.username, "
+                    "contributions = excluded.contributions, last_log = excluded.last_log",
+                    [user_row(record) for record in records]
+                )
+                self.conn.executemany("INSERT INTO days (user_id, days) VALUES (?, ?) ON CONFLICT (user_id) DO UPDATE SET days = excluded.days",
+                                      list(days.items()))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def restore(self, streak, users, history, days=None):
+        columns = ", ".join(STREAK_FIELDS)
+        placeholders = ", ".join("?" for _ in STREAK_FIELDS)
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute(f"INSERT OR REPLACE INTO streak (id, {columns}) VALUES (1, {placeholders})", streak_row(streak))
+                self.conn.execute("DELETE FROM contributions")
+                self.conn.executemany("INSERT INTO contributions (user_id, username, contributions, last_log) VALUES (?, ?, ?, ?)",
+                                      [user_row(record) for record in users])
+                for month, records in history.items():
+                    self.conn.execute("DELETE FROM history WHERE month = ?", (month,))
+                    self.conn.executemany("INSERT INTO history (month, user_id, username, contributions, last_log) VALUES (?, ?, ?, ?, ?)",
+                                          [[month] + user_row(record) for record in records])
+                if days is not None:
+                    self.conn.execute("DELETE FROM days")
+                    self.conn.executemany("INSERT INTO days (user_id, days) VALUES (?, ?)", list(days.items()))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+###### SHEETS MIRROR ##################
+
+class MirroredBackend(StorageBackend):
+    """Reads and writes go to the primary backend; writes are then copied to the mirror in the background.
+
+    The mirror (Google Sheets, for the club admins) is updated in order on its own thread, and
+    its failures are logged instead of failing the command that made the change.
+    """
+
+    def __init__(self, primary, mirror):
+        self.primary = primary
+        self.mirror = mirror
+        self.name = f"{primary.name}+{mirror.name}"
+        self._mirror_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mirror")
+
+    def _copy(self, method, *args):
+        def run():
+            try:
+                getattr(self.mirror, method)(*args)
+            except Exception as e:
+                ERRORS.inc(source="mirror", error=type(e).__name__)
+                logger.warning("[MIRROR] %s to %s failed: %r", method, self.mirror.name, e)
+        self._mirror_executor.submit(run)
+
+    @property
+    def pending(self):
+        """Mirror writes still waiting for their turn."""
+        return self._mirror_executor._work_queue.qsize()
+
+    def load_streak(self):
+        return self.primary.load_streak()
+
+    def save_streak(self, data):
+        self.primary.save_streak(data)
+        self._copy("save_streak", dict(data))
+
+    def load_users(self):
+        return self.primary.load_users()
+
+    def save_users(self, records):
+        self.primary.save_users(records)
+        self._copy("save_users", [dict(record) for record in records])
+
+    def clear_users(self):
+        self.primary.clear_users()
+        self._copy("clear_users")
+
+    def archive_users(self, month):
+        self.primary.archive_users(month)
+        self._copy("archive_users", month)
+
+    def load_history(self):
+        return self.primary.load_history()
+
+    def save_history(self, month, records):
+        self.primary.save_history(month, records)
+        self._copy("save_history", month, [dict(record) for record in records])
+
+    def load_proofs(self, limit):
+        return self.primary.load_proofs(limit)
+
+    def save_proof(self, record):
+        self.primary.save_proof(record)
+        self._copy("save_proof", dict(record))
+
+    def load_days(self):
+        return self.primary.load_days()
+
+    def save_days(self, days):
+        self.primary.save_days(days)
+        self._copy("save_days", dict(days))
+
+    def save_contributions(self, records, days):
+        self.primary.save_contributions(records, days)
+        self._copy("save_contributions", [dict(record) for record in records], dict(days))
+
+    def restore(self, streak, users, history, days=None):
+        self.primary.restore(streak, users, history, days)
+        self._copy("restore", dict(streak), [dict(record) for record in users],
+                   {month: [dict(record) for record in records] for month, records in history.items()}, None if days is None else dict(days))
+
+    def close(self):
+        self._mirror_executor.shutdown(wait=True)  # let queued mirror writes finish
+        self.primary.close()
+        self.mirror.close()
+
+
+###### BACKEND SELECTION ##################
+
+def open_backend(kind=None, mirror=True, sheet_name=None, sqlite_path=None, sheet_key=None):
+    """Open the backend named by kind (default STORAGE_BACKEND): "sheets" or "sqlite".
+
+    With SQLite, SHEETS_MIRROR=1 also copies every write to the Google Sheet (unless mirror=False).
+    """
+    kind = kind or os.getenv("STORAGE_BACKEND", "sheets")
+    sheet_name = sheet_name or SHEET_NAME
+    if kind == "sheets":
+        return connect_sheets(sheet_name, sheet_key)
+    if kind == "sqlite":
+        backend = SQLiteBackend(sqlite_path or os.getenv("SQLITE_PATH", "streak.db"))
+        if mirror and os.getenv("SHEETS_MIRROR") == "1":
+            return MirroredBackend(backend, connect_sheets(sheet_name, sheet_key))
+        return backend
+    raise ValueError(f"Unknown storage backend: {kind!r} (expected 'sheets' or 'sqlite')")
+
+def copy_data(source, target):
+    """Copy the streak record, the full contribution table, every archived month and the day bitmaps from one backend to another."""
+    users = source.load_users()
+    target.restore(source.load_streak(), users, source.load_history(), source.load_days())
+    return len(users)
@@ -0,0 +1,233 @@
+"""
+Date boundaries, milestones and streak expiry for a server, worked out once per local day.
+
+Commands used to derive all of this from the time zone on every call. StreakCalendar keeps the
+current local day (its date, the instants it starts and ends) and only recomputes it once the
+end has passed; milestones and the expiry instant are cached for the streak record they were
+computed from, which changes at most once a day.
+
+Monthly and yearly milestones follow one end-of-month rule: an anniversary on a day the month
+doesn't have (the 29th to 31st, or February 29 in a common year) falls on that month's last day.
+A streak started on January 31 reaches 1 month on February 28 (29 in a leap year) and 2 months
+on March 31; one started on February 29, 2024 reaches 1 year on February 28, 2025.
+"""
+
+import asyncio
+import calendar
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+
+from scheduler import MAX_SLEEP
+
+logger = logging.getLogger("streakkeeper.calendar")
+
+# hours before the streak breaks to post a warning if nobody has logged yet (0 turns warnings off)
+STREAK_WARNING_HOURS = float(os.getenv("STREAK_WARNING_HOURS", "3"))
+
+
+###### DATE MATH ##################
+
+def local_midnight(tz, day):
+    """The instant a local day starts (an aware datetime); normalize() moves a midnight that doesn't exist (DST) to the first valid instant."""
+    return tz.normalize(tz.localize(datetime(day.year, day.month, day.day)))
+
+def add_months(day, months):
+    """The same day of the month, months later, or that month's last day if it's shorter (see the end-of-month rule above)."""
+    index = day.month - 1 + months
+    year, month = day.year + index // 12, index % 12 + 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+def months_since(start, day):
+    """Whole months from start to day, counting each month on its anniversary."""
+    months = (day.year - start.year) * 12 + (day.month - start.month)
+    if months > 0 and add_months(start, months) > day:
+        months -= 1
+    return max(months, 0)
+
+def parse_date(value):
+    """A stored "YYYY-MM-DD" as a date, or None for "N/A", blanks and typos."""
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+def is_day_milestone(count):
+    return count in (1, 7) or (count > 0 and count % 50 == 0)
+
+def next_day_milestone(count):
+    """The first day count after count that's a milestone."""
+    if count < 1:
+        return 1
+    if count < 7:
+        return 7
+    return (count // 50 + 1) * 50
+
+def plural(count, unit):
+    return f"{count} {unit}{'s' if count > 1 else ''}"
+
+def milestones_on(day, streak_count, start):
+    """The milestone messages for a streak of streak_count days that started on start (a date or None), as of day.
+
+    A year anniversary replaces the month one that falls on the same day.
+    """
+    milestones = []
+    if is_day_milestone(streak_count):
+        milestones.append(f"🎯 **Day {streak_count}!**")
+    if start is not None:
+        months = months_since(start, day)
+        if months > 0 and add_months(start, months) == day:
+            if months % 12 == 0:
+                milestones.append(f"🏆 **{plural(months // 12, 'year')} streak!**")
+            else:
+                milestones.append(f"📅 **{plural(months, 'month')} streak!**")
+    return milestones
+
+def upcoming_milestones(today, streak_count, start, last_logged):
+    """[(date, label)] of the next day count and the next month or year anniversary, if the streak keeps going every day."""
+    if last_logged is None or start is None:
+        return []
+    count = next_day_milestone(streak_count)
+    upcoming = [(last_logged + timedelta(days=count - streak_count), f"Day {count}")]
+    # the first day the streak can still be extended: tomorrow if today is already logged
+    first = max(today, last_logged + timedelta(days=1))
+    months = months_since(start, first - timedelta(days=1)) + 1
+    label = plural(months // 12, "year") if months % 12 == 0 else plural(months, "month")
+    upcoming.append((add_months(start, months), label))
+    return sorted(upcoming)
+
+
+###### CALENDAR ##################
+
+class Day:
+    """One local day: its date (also as "YYYY-MM-DD"), yesterday's, and the instants it starts and ends."""
+
+    __slots__ = ("date", "iso", "yesterday", "start", "end")
+
+    def __init__(self, tz, day):
+        self.date = day
+        self.iso = str(day)
+        self.yesterday = str(day - timedelta(days=1))
+        self.start = local_midnight(tz, day)
+        self.end = local_midnight(tz, day + timedelta(days=1))
+
+    def status(self, last_logged_date):
+        """Where a streak last logged on last_logged_date stands today.
+
+        "logged" today, "due" (logged yesterday, so it breaks when today ends), "broken" (a day was
+        missed) or "new" (never logged, or the date can't be read, so there's nothing to break).
+        """
+        if last_logged_date == self.iso:
+            return "logged"
+        if last_logged_date == self.yesterday:
+            return "due"
+        last_logged = parse_date(last_logged_date)
+        if last_logged is None:
+            return "new"
+        return "broken" if last_logged < self.date else "logged"
+
+
+class StreakCalendar:
+    """A server's current day, plus the milestones and expiry instant of its streak record, each computed once.
+
+    Call update() with every streak record loaded or saved. If given a `warn(expires_at)` callback,
+    it's called STREAK_WARNING_HOURS before the streak would break (once started, see start_warnings);
+    the callback should check nobody has logged since.
+    """
+
+    def __init__(self, tz, warn=None, warn_before=timedelta(hours=STREAK_WARNING_HOURS)):
+        self.tz = tz
+        self.warn = warn
+        self.warn_before = warn_before
+        self._day = None
+        self._day_ends = 0.0  # time.time() at which _day is over
+        self._record = None  # (streak count, start date, last logged date) from the latest update
+        self._cache_key = None  # (day, record) the results below are for
+        self._milestones = []
+        self._upcoming = []
+        self.expires_at = None  # when the streak breaks if nobody logs, or None if it's already broken
+        self._warnings = False
+        self._task = None
+
+    def day(self):
+        """Today; the day boundary is only worked out again once it has passed."""
+        if time.time() >= self._day_ends:
+            self._day = Day(self.tz, datetime.now(self.tz).date())
+            self._day_ends = self._day.end.timestamp()
+        return self._day
+
+    def update(self, streak_data):
+        """Take in the current streak record, moving the warning if its expiry changed."""
+        record = (streak_data["streak_count"], streak_data["start_date"], streak_data["last_logged_date"])
+        if record == self._record:
+            return
+        self._record = record
+        last_logged = parse_date(record[2])
+        # a streak last logged on day D survives D + 1 and breaks when D + 2 starts
+        expires_at = local_midnight(self.tz, last_logged + timedelta(days=2)) if last_logged else None
+        if expires_at != self.expires_at:
+            self.expires_at = expires_at
+            if self._warnings:
+                self._schedule()
+
+    def _results(self):
+        day = self.day()
+        key = (day.date, self._record)
+        if key != self._cache_key and self._record is not None:
+            count, start, last_logged = self._record
+            self._milestones = milestones_on(day.date, count, parse_date(start))
+            self._upcoming = upcoming_milestones(day.date, count, parse_date(start), parse_date(last_logged)) if day.status(last_logged) in ("logged", "due") else []
+            self._cache_key = key
+        return self._milestones, self._upcoming
+
+    def milestones(self):
+        """Milestone messages the current streak reaches today."""
+        return self._results()[0]
+
+    def upcoming(self):
+        """[(date, label)] of the streak's next milestones, if it isn't broken."""
+        return self._results()[1]
+
+    def hours_left(self):
+        """Whole hours (at least 1) until the streak breaks, or None if there's no expiry."""
+        if self.expires_at is None:
+            return None
+        return max(1, round((self.expires_at - datetime.now(self.tz)).total_seconds() / 3600))
+
+    def start_warnings(self):
+        """Start warning before the streak breaks. A warning due while the bot was down isn't sent late."""
+        if self.warn is None or self.warn_before <= timedelta(0):
+            return
+        self._warnings = True
+        self._schedule()
+
+    def stop(self):
+        self._warnings = False
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def _schedule(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self.expires_at is None:
+            return
+        warn_at = self.expires_at - self.warn_before
+        if warn_at <= datetime.now(self.tz):
+            return  # too late to warn about this one; the next log moves the expiry
+        self._task = asyncio.create_task(self._run(self.expires_at, warn_at))
+
+    async def _run(self, expires_at, warn_at):
+        while True:
+            delay = (warn_at - datetime.now(self.tz)).total_seconds()
+            if delay <= 0:
+                break
+            await asyncio.sleep(min(delay, MAX_SLEEP))  # wake up now and then, in case the clock moved
+        try:
+            await self.warn(expires_at)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("[CALENDAR] Streak expiry warning failed: %r", e)
@@ -0,0 +1,192 @@
+"""
+Tests for the write-ahead journal: collapsing, reading a damaged file back, compaction and replay.
+
+Run with `python -m pytest tests` (or `python -m unittest`) from the repository root.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import journal
+from journal import Journal, JournaledBackend, collapse
+
+
+def entry(seq, method, *args):
+    return {"seq": seq, "method": method, "args": list(args)}
+
+def user(user_id, contributions):
+    return {"user_id": user_id, "username": user_id, "contributions": contributions, "last_log": "2026-01-01"}
+
+
+class RecordingBackend:
+    """Records the writes replayed to it; fail_times makes the first writes raise."""
+
+    name = "recording"
+
+    def __init__(self, fail_times=0):
+        self.calls = []
+        self.fail_times = fail_times
+        self.release = threading.Event()
+        self.release.set()
+        self.started = threading.Event()
+
+    def __getattr__(self, method):
+        def write(*args):
+            self.started.set()
+            self.release.wait(5)
+            if self.fail_times:
+                self.fail_times -= 1
+                raise ConnectionError("storage is down")
+            self.calls.append((method, args))
+        return write
+
+    def close(self):
+        pass
+
+
+class CollapseTest(unittest.TestCase):
+
+    def test_only_the_latest_streak_record_is_kept(self):
+        entries = [entry(1, "save_streak", {"streak_count": 1}), entry(2, "save_proof", {}), entry(3, "save_streak", {"streak_count": 2})]
+        self.assertEqual([e["seq"] for e in collapse(entries)], [2, 3])
+
+    def test_consecutive_contribution_batches_merge_into_the_last(self):
+        entries = [entry(1, "save_users", [user("a", 1), user("b", 1)]), entry(2, "save_users", [user("a", 2)])]
+        collapsed = collapse(entries)
+        self.assertEqual(len(collapsed), 1)
+        self.assertEqual(collapsed[0]["seq"], 2)
+        self.assertEqual({r["user_id"]: r["contributions"] for r in collapsed[0]["args"][0]}, {"a": 2, "b": 1})
+
+    def test_save_contributions_merges_records_and_bitmaps(self):
+        entries = [entry(1, "save_contributions", [user("a", 1)], {"a": "01"}),
+                   entry(2, "save_contributions", [user("a", 2), user("b", 1)], {"b": "01"})]
+        collapsed = collapse(entries)
+        self.assertEqual(len(collapsed), 1)
+        records, days = collapsed[0]["args"]
+        self.assertEqual({r["user_id"]: r["contributions"] for r in records}, {"a": 2, "b": 1})
+        self.assertEqual(days, {"a": "01", "b": "01"})
+
+    def test_nothing_merges_across_a_reset(self):
+        entries = [entry(1, "save_users", [user("a", 5)]), entry(2, "archive_users", "2026-01"), entry(3, "save_users", [user("a", 1)])]
+        self.assertEqual([e["seq"] for e in collapse(entries)], [1, 2, 3])
+
+    def test_save_days_is_a_barrier_for_save_contributions(self):
+        entries = [entry(1, "save_contributions", [], {"a": "03"}), entry(2, "save_days", {"a": "00"}),
+                   entry(3, "save_contributions", [], {"b": "01"})]
+        self.assertEqual([e["seq"] for e in collapse(entries)], [1, 2, 3])
+
+
+class JournalFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "journal-1.jsonl")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_lines(self, *lines):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("".join(lines))
+
+    def file_entries(self):
+        with open(self.path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_a_torn_last_line_is_skipped(self):
+        self.write_lines(json.dumps(entry(1, "save_proof", {"hash": "ab"})) + "\n", '{"seq": 2, "method": "save_pro')
+        j = Journal(self.path)
+        self.assertEqual([e["seq"] for e in j.pending], [1])
+        self.assertEqual(self.file_entries(), [entry(1, "save_proof", {"hash": "ab"})])  # rewritten without the torn line
+        j.close()
+
+    def test_replayed_writes_are_not_pending_again(self):
+        self.write_lines(*(json.dumps(line) + "\n" for line in [entry(1, "save_proof", {}), entry(2, "save_proof", {}), {"done": 1}]))
+        j = Journal(self.path)
+        self.assertEqual([e["seq"] for e in j.pending], [2])
+        self.assertEqual(j.append("save_proof", [{}])["seq"], 3)  # sequence numbers carry on
+        j.close()
+
+    def test_appends_compact_while_nothing_is_confirmed(self):
+        with mock.patch.object(journal, "JOURNAL_COMPACT_AT", 10):
+            j = Journal(self.path)
+            head = j.append("save_streak", [{"streak_count": 0}])
+            for count in range(1, 100):
+                j.append("save_streak", [{"streak_count": count}])
+                self.assertLess(j.lines, 12)
+            # the head may be replaying, so it's kept as it is; the records overwritten since are gone
+            self.assertIs(j.pending[0], head)
+            counts = [e["args"][0]["streak_count"] for e in j.pending]
+            self.assertEqual(counts, sorted(counts))
+            self.assertLess(len(counts), 12)
+            self.assertEqual(counts[-1], 99)
+            self.assertEqual(self.file_entries(), list(j.pending))
+            j.confirm(head)
+            j.close()
+
+    def test_writes_that_dont_merge_dont_compact_on_every_append(self):
+        with mock.patch.object(journal, "JOURNAL_COMPACT_AT", 10), \
+                mock.patch.object(Journal, "compact", autospec=True, side_effect=Journal.compact) as compact:
+            j = Journal(self.path)
+            for _ in range(1000):
+                j.append("save_proof", [{}])
+            self.assertEqual(len(j.pending), 1000)
+            self.assertLess(compact.call_count, 15)  # the threshold doubles with the backlog
+            j.close()
+
+
+class ReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "journal-1.jsonl")
+        patcher = mock.patch.object(journal, "REPLAY_MAX_DELAY", 0.01)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_writes_are_replayed_in_order_after_failures(self):
+        backend = RecordingBackend(fail_times=3)
+        journaled = JournaledBackend(backend, self.path)
+        journaled.save_proof({"hash": "a"})
+        journaled.clear_users()
+        journaled.save_proof({"hash": "b"})
+        journaled.close(timeout=5)
+        self.assertEqual(backend.calls, [("save_proof", ({"hash": "a"},)), ("clear_users", ()), ("save_proof", ({"hash": "b"},))])
+        self.assertEqual(journaled.unreplayed, 0)
+
+    def test_a_restart_replays_what_was_left(self):
+        j = Journal(self.path)
+        j.append("save_users", [[user("a", 1)]])
+        j.append("save_users", [[user("a", 2)]])
+        j.append("save_streak", [{"streak_count": 3}])
+        j.close()  # the bot stops before anything is replayed
+
+        backend = RecordingBackend()
+        journaled = JournaledBackend(backend, self.path)
+        journaled.close(timeout=5)
+        self.assertEqual(backend.calls, [("save_users", ([user("a", 2)],)), ("save_streak", ({"streak_count": 3},))])
+
+    def test_compacting_during_an_outage_keeps_the_write_being_replayed(self):
+        backend = RecordingBackend()
+        backend.release.clear()
+        with mock.patch.object(journal, "JOURNAL_COMPACT_AT", 5):
+            journaled = JournaledBackend(backend, self.path)
+            journaled.save_streak({"streak_count": 0})
+            backend.started.wait(5)  # the replay is now sending the first record
+            for count in range(1, 50):
+                journaled.save_streak({"streak_count": count})
+            self.assertLessEqual(journaled.unreplayed, 2)
+            backend.release.set()
+            journaled.close(timeout=5)
+        self.assertEqual([args[0]["streak_count"] for _, args in backend.calls], [0, 49])
+
+
+if __name__ == "__main__":
+    unittest.main()
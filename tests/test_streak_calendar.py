@@ -0,0 +1,119 @@
+"""
+Tests for the streak calendar's date math: the end-of-month rule, milestones and where a streak stands on a day.
+
+Run with `python -m pytest tests` (or `python -m unittest`) from the repository root.
+"""
+
+import unittest
+from datetime import date
+
+import pytz
+
+from streak_calendar import Day, add_months, milestones_on, months_since, upcoming_milestones
+
+TZ = pytz.timezone("America/New_York")
+
+
+class AddMonthsTest(unittest.TestCase):
+
+    def test_same_day_of_the_month(self):
+        self.assertEqual(add_months(date(2025, 1, 15), 1), date(2025, 2, 15))
+        self.assertEqual(add_months(date(2025, 11, 15), 3), date(2026, 2, 15))  # across the year
+
+    def test_a_day_the_month_doesnt_have_falls_on_its_last_day(self):
+        self.assertEqual(add_months(date(2025, 1, 31), 1), date(2025, 2, 28))
+        self.assertEqual(add_months(date(2024, 1, 31), 1), date(2024, 2, 29))
+        self.assertEqual(add_months(date(2025, 1, 31), 2), date(2025, 3, 31))  # counted from the start, not from February 28
+        self.assertEqual(add_months(date(2025, 3, 31), 1), date(2025, 4, 30))
+
+    def test_leap_day_anniversary_in_a_common_year(self):
+        self.assertEqual(add_months(date(2024, 2, 29), 12), date(2025, 2, 28))
+        self.assertEqual(add_months(date(2024, 2, 29), 48), date(2028, 2, 29))
+
+
+class MonthsSinceTest(unittest.TestCase):
+
+    def test_a_month_counts_on_its_anniversary(self):
+        self.assertEqual(months_since(date(2025, 1, 15), date(2025, 2, 14)), 0)
+        self.assertEqual(months_since(date(2025, 1, 15), date(2025, 2, 15)), 1)
+        self.assertEqual(months_since(date(2024, 12, 15), date(2026, 1, 20)), 13)
+
+    def test_end_of_month_anniversaries(self):
+        self.assertEqual(months_since(date(2025, 1, 31), date(2025, 2, 27)), 0)
+        self.assertEqual(months_since(date(2025, 1, 31), date(2025, 2, 28)), 1)
+        self.assertEqual(months_since(date(2025, 1, 31), date(2025, 3, 30)), 1)
+        self.assertEqual(months_since(date(2025, 1, 31), date(2025, 3, 31)), 2)
+        self.assertEqual(months_since(date(2024, 2, 29), date(2025, 2, 27)), 11)
+        self.assertEqual(months_since(date(2024, 2, 29), date(2025, 2, 28)), 12)
+
+    def test_never_negative(self):
+        self.assertEqual(months_since(date(2025, 3, 1), date(2025, 1, 1)), 0)
+
+
+class MilestonesOnTest(unittest.TestCase):
+
+    def test_day_milestones(self):
+        self.assertEqual(milestones_on(date(2025, 5, 10), 1, None), ["🎯 **Day 1!**"])
+        self.assertEqual(milestones_on(date(2025, 5, 10), 7, None), ["🎯 **Day 7!**"])
+        self.assertEqual(milestones_on(date(2025, 5, 10), 150, None), ["🎯 **Day 150!**"])
+        self.assertEqual(milestones_on(date(2025, 5, 10), 8, None), [])
+
+    def test_month_milestones_follow_the_end_of_month_rule(self):
+        start = date(2025, 1, 31)
+        self.assertEqual(milestones_on(date(2025, 2, 28), 29, start), ["📅 **1 month streak!**"])
+        self.assertEqual(milestones_on(date(2025, 3, 30), 59, start), [])
+        self.assertEqual(milestones_on(date(2025, 3, 31), 60, start), ["📅 **2 months streak!**"])
+        self.assertEqual(milestones_on(date(2024, 2, 29), 30, date(2024, 1, 31)), ["📅 **1 month streak!**"])
+
+    def test_a_year_replaces_the_month_on_the_same_day(self):
+        self.assertEqual(milestones_on(date(2025, 2, 28), 366, date(2024, 2, 29)), ["🏆 **1 year streak!**"])
+        self.assertEqual(milestones_on(date(2027, 3, 10), 730, date(2025, 3, 10)), ["🏆 **2 years streak!**"])
+
+    def test_day_and_month_milestones_together(self):
+        self.assertEqual(milestones_on(date(2025, 3, 1), 1, date(2025, 2, 1)), ["🎯 **Day 1!**", "📅 **1 month streak!**"])
+
+
+class UpcomingMilestonesTest(unittest.TestCase):
+
+    def test_next_day_count_and_month_in_date_order(self):
+        upcoming = upcoming_milestones(date(2025, 1, 30), 30, date(2024, 12, 31), date(2025, 1, 30))
+        self.assertEqual(upcoming, [(date(2025, 1, 31), "1 month"), (date(2025, 2, 19), "Day 50")])
+
+    def test_a_year_anniversary_on_a_leap_day_start(self):
+        upcoming = upcoming_milestones(date(2025, 2, 27), 365, date(2024, 2, 29), date(2025, 2, 27))
+        self.assertEqual(upcoming, [(date(2025, 2, 28), "1 year"), (date(2025, 4, 3), "Day 400")])
+
+    def test_an_anniversary_due_today_is_still_upcoming_until_logged(self):
+        start = date(2025, 1, 31)
+        self.assertEqual(upcoming_milestones(date(2025, 2, 28), 28, start, date(2025, 2, 27))[0], (date(2025, 2, 28), "1 month"))
+        self.assertEqual(upcoming_milestones(date(2025, 2, 28), 29, start, date(2025, 2, 28)),
+                         [(date(2025, 3, 21), "Day 50"), (date(2025, 3, 31), "2 months")])
+
+    def test_nothing_without_a_start_or_last_log(self):
+        self.assertEqual(upcoming_milestones(date(2025, 1, 30), 0, None, None), [])
+        self.assertEqual(upcoming_milestones(date(2025, 1, 30), 3, date(2025, 1, 27), None), [])
+
+
+class DayStatusTest(unittest.TestCase):
+
+    def setUp(self):
+        self.day = Day(TZ, date(2025, 3, 10))
+
+    def test_statuses(self):
+        self.assertEqual(self.day.status("2025-03-10"), "logged")
+        self.assertEqual(self.day.status("2025-03-09"), "due")
+        self.assertEqual(self.day.status("2025-03-08"), "broken")
+        self.assertEqual(self.day.status("2025-03-11"), "logged")  # a date after today isn't a missed day
+
+    def test_unreadable_dates_are_new(self):
+        for value in ("N/A", "", None, "2025-3-8x"):
+            self.assertEqual(self.day.status(value), "new")
+
+    def test_day_boundaries_across_a_dst_change(self):
+        self.assertEqual(self.day.yesterday, "2025-03-09")
+        spring_forward = Day(TZ, date(2025, 3, 9))
+        self.assertEqual((spring_forward.end - spring_forward.start).total_seconds(), 23 * 3600)
+
+
+if __name__ == "__main__":
+    unittest.main()
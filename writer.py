@@ -0,0 +1,62 @@
+"""
+Single-writer actor for a server's streak and contribution state.
+
+Every change to a server's streak record, and every archive, reload or rebuild of its
+contributions, is submitted to its SingleWriter, which runs them one at a time, in the order
+they were submitted, on one background task. Logs and ➕s don't go through it: they only change
+memory, and main.flush_contributions writes them in batches.
+A change can therefore read the state, decide and write without anything else changing it
+in between, and no lock is needed around the (much more frequent) reads.
+"""
+
+import asyncio
+import logging
+
+logger = logging.getLogger("streakkeeper.writer")
+
+
+class SingleWriter:
+    """Runs submitted coroutine functions one after another on a single task."""
+
+    def __init__(self):
+        self._queue = None  # created on first use, inside the running event loop
+        self._task = None
+
+    @property
+    def pending(self):
+        """Changes waiting for their turn."""
+        return self._queue.qsize() if self._queue else 0
+
+    async def submit(self, func, *args):
+        """Run func(*args) on the writer once every earlier change is done, and return its result.
+
+        A change that submits another change (e.g. archiving flushes queued contributions first)
+        runs it inline, since waiting for its own turn would never end.
+        """
+        if self._task is not None and asyncio.current_task() is self._task:
+            return await func(*args)
+
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((func, args, future))
+        # shield: a command that gives up waiting doesn't cancel a change that may be half written
+        return await asyncio.shield(future)
+
+    async def _run(self):
+        while True:
+            func, args, future = await self._queue.get()
+            try:
+                result = await func(*args)
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            else:
+                if not future.cancelled():
+                    future.set_result(result)
+
+    def stop(self):
+        """Stop the writer task (changes still queued are dropped)."""
+        if self._task:
+            self._task.cancel()